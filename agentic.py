@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Prompt building and response handling for the Agentic AI mode.
+
+Shared by the /agentic-summary endpoint (blocking and streaming) so every
+path builds the same prompt and applies the same fallback.
+"""
+
+import json
+
+# Completion settings for the pros/cons + recommendation call
+AGENTIC_COMPLETION_OPTIONS = {
+    "model": "gpt-3.5-turbo",
+    "max_tokens": 800,
+    "temperature": 0.3,
+    "response_format": {"type": "json_object"}
+}
+
+# System prompt shared by every user, so each agentic prompt opens with the
+# same text; the per-user recommendation guidance comes after the reviews
+AGENTIC_SYSTEM_PROMPT = """You are an expert product analyst and personal shopping advisor. Analyze all the provided reviews and user profile to:
+1. Extract EXACTLY 3 main pros and EXACTLY 3 main cons about the Apple Watch Series 10
+2. Provide a personalized recommendation based on the user's financial situation and needs
+
+Your response must be in this exact JSON format:
+{
+    "pros": [
+        "First pro point - be specific and mention the feature",
+        "Second pro point - be specific and mention the feature",
+        "Third pro point - be specific and mention the feature"
+    ],
+    "cons": [
+        "First con point - be specific and mention the issue",
+        "Second con point - be specific and mention the issue",
+        "Third con point - be specific and mention the issue"
+    ],
+    "personalized_recommendation": "A detailed recommendation (80-120 words) that follows the recommendation guidance given after the user profile"
+}
+
+Rules:
+1. Each pro/con should be a complete sentence (15-25 words)
+2. Focus on the most frequently mentioned positives and negatives
+3. The personalized recommendation MUST follow the recommendation guidance"""
+
+# Recommendation guidance for high-income, low price sensitivity users (TechUser92)
+PREMIUM_GUIDANCE = """Recommendation guidance:
+- Acknowledge their tech enthusiasm and disposable income
+- Consider the user's high income and low price sensitivity
+- Recommend the highest-end model with all premium features and accessories, explaining why the investment is worth it for their lifestyle and career
+- Emphasize cutting-edge features and ecosystem benefits"""
+
+# Default guidance (Student2025 and anyone else)
+BUDGET_GUIDANCE = """Recommendation guidance:
+- Acknowledge the product quality but consider the user's limited budget
+- Recommend a more budget-friendly alternative like the Xiaomi Mi Band 7, Amazfit Band 7, or Fitbit Inspire 3, explaining why it's better for their budget and still meets their core needs
+- Be empathetic but direct about the financial reality for a college student
+- Suggest specific alternative products with much lower total cost of ownership"""
+
+
+def render_review(number, source):
+    """Render one review as it appears in the numbered block sent to the LLM"""
+    return (
+        f"Review {number}:\n"
+        f"Title: {source.get('title', '')}\n"
+        f"Rating: {source.get('stars', 0)}/5 stars\n"
+        f"Review: {source.get('review_text', '')}\n\n"
+    )
+
+
+def build_reviews_text(hits):
+    """Render review hits as the numbered block sent to the LLM"""
+    return "".join(render_review(i, hit['_source']) for i, hit in enumerate(hits, 1))
+
+
+def build_user_context(user_profile):
+    """Render the user profile section of the prompt ("" when no profile)"""
+    if not user_profile:
+        return ""
+
+    # Calculate average past purchase price
+    past_purchases = user_profile.get('past_purchases', [])
+    avg_price = sum([p.get('price', 0) for p in past_purchases]) / len(past_purchases) if past_purchases else 0
+
+    return f"""
+User Profile:
+- Username: {user_profile.get('username')}
+- Occupation: {user_profile.get('occupation')}
+- Annual Income: ${user_profile.get('annual_income', 0):,}
+- Credit Limit: ${user_profile.get('credit_limit', 0):,}
+- Past Purchases Average Price: ${avg_price:,.2f}
+- Their Own Review: "{user_profile.get('past_reviews', [{}])[0].get('review_text', '')}"
+- Price Sensitivity: {user_profile.get('preferences', {}).get('price_sensitivity', 'unknown')}
+- Feature Priorities: {', '.join(user_profile.get('preferences', {}).get('feature_priorities', []))}
+"""
+
+
+def select_guidance(username):
+    """Different recommendation guidance based on user profile"""
+    return PREMIUM_GUIDANCE if username == 'TechUser92' else BUDGET_GUIDANCE
+
+
+def build_agentic_messages(username, user_profile, reviews_text, review_count, stats_text=""):
+    """Chat messages for the pros/cons + personalized recommendation call.
+
+    reviews_text is the rendered review block (build_reviews_text or a
+    ContextBuilder), review_count the number of reviews in it. stats_text,
+    when given, is the review statistics block for the whole index and goes
+    first. Everything user-specific (profile, recommendation guidance) comes
+    after the shared system prompt and review block, so prompts built from
+    the same reviews start with the same text, which the provider's prompt
+    prefix cache can reuse.
+    """
+    user_context = build_user_context(user_profile)
+
+    return [
+        {
+            "role": "system",
+            "content": AGENTIC_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": f"Analyze these {review_count} Apple Watch Series 10 reviews and provide pros, cons, and a personalized recommendation for the user described after them:\n\n{stats_text}{reviews_text}{user_context}\n{select_guidance(username)}"
+        }
+    ]
+
+
+def parse_agentic_response(content):
+    """Parse the LLM JSON answer, raising ValueError if any field is missing"""
+    ai_response = json.loads(content.strip())
+    pros = ai_response.get("pros", [])[:3]
+    cons = ai_response.get("cons", [])[:3]
+    personalized_recommendation = ai_response.get("personalized_recommendation", "")
+
+    if not pros or not cons or not personalized_recommendation:
+        raise ValueError("Invalid response format from OpenAI")
+
+    return {
+        "pros": pros,
+        "cons": cons,
+        "personalized_recommendation": personalized_recommendation
+    }
+
+
+def fallback_agentic_summary(username):
+    """Static pros/cons/recommendation used when the LLM call fails"""
+    if username == 'TechUser92':
+        pros = [
+            "Display quality and size improvements make everything more readable",
+            "S10 chip delivers exceptional performance for demanding apps",
+            "Advanced health sensors including temperature and blood oxygen monitoring"
+        ]
+        cons = [
+            "Battery life still requires daily charging with heavy usage",
+            "Some advanced features require iPhone 15 Pro or newer",
+            "Titanium edition significantly more expensive than aluminum"
+        ]
+        personalized_recommendation = "For someone with your tech expertise and income, the Apple Watch Series 10 Titanium with Cellular is the perfect choice. The $799 investment delivers cutting-edge health monitoring, seamless ecosystem integration, and premium materials that match your professional image. Add the Milanese Loop ($99) for versatility. The productivity gains alone justify the cost for your $185k salary."
+    else:
+        pros = [
+            "Display quality and size improvements make everything more readable",
+            "Health tracking features including heart rate and sleep monitoring",
+            "Seamless integration with iPhone and Apple ecosystem"
+        ]
+        cons = [
+            "Battery life concerns with heavy usage and GPS tracking",
+            "Premium pricing may not justify upgrade from recent models",
+            "Many features require additional subscriptions adding to cost"
+        ]
+        personalized_recommendation = "While the Apple Watch Series 10 is an excellent device, given your student budget and $500 credit limit, I'd recommend the Xiaomi Mi Band 7 ($50) or Amazfit Band 7 ($50). These alternatives offer essential features you need - step tracking, sleep monitoring, and study timers - without the financial strain. You'll save over $300 and avoid costly subscriptions while still getting reliable fitness tracking for campus life."
+
+    return {
+        "pros": pros,
+        "cons": cons,
+        "personalized_recommendation": personalized_recommendation
+    }
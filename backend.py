@@ -9,35 +9,650 @@ Enhanced Flask backend with four search experiences:
 Usage: python3 appv2.py
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, has_request_context, jsonify, request, stream_with_context
 from flask_cors import CORS
 import requests
-import json
+import logging
 import os
-from datetime import datetime
+import random
+import threading
 import time
-from openai import OpenAI
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from openai import APIConnectionError, BadRequestError, InternalServerError, OpenAI, RateLimitError
+
+from agentic import (
+    AGENTIC_COMPLETION_OPTIONS,
+    build_agentic_messages,
+    fallback_agentic_summary,
+    parse_agentic_response,
+    render_review
+)
+from context_builder import ContextBuilder, get_token_counter
+from es_client import ESClient
+from extractive import summarize_points, summarize_reviews
+from fastjson import JSON_ENGINE, FastJSONProvider, dumps
+from hybrid import FUSION_METHODS, HybridSearcher
+from job_queue import PRIORITIES, JobQueue, JobWorkers, QueueFull
+from llm_gateway import GatewayRejected, LLMGateway, reset_current_flow, set_current_flow
+from mapreduce import MapReduceSummarizer
+from pagination import CursorError, decode_cursor, page_size_from, paged_search
+from materializer import DEFAULT_PRODUCT, ProsConsMaterializer
+from observability import MetricsRegistry, setup_logging
+from profile_cache import ProfileCache
+from query_expansion import ElserExpander
+from resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ContextThreadPoolExecutor,
+    Deadline,
+    DeadlineExceeded,
+    current_deadline,
+    deadline_error,
+    deadline_exceeded,
+    deadline_scope,
+    deadline_timeout,
+    reset_current_deadline,
+    set_current_deadline,
+    sleep_before_retry
+)
+from result_cache import ResultCache, build_backend, fingerprint, make_key, normalize_query
+from review_replica import ReviewReplica
+from review_stats import INTERVALS, ReviewStats
+from singleflight import SingleFlight
+from streaming import JsonFieldStreamer, iter_completion_text, sse_event
+
+# Start of module setup, the cold-start origin when no server passes its own
+MODULE_LOAD_STARTED = time.time()
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)  # orjson-backed jsonify when orjson is installed
 CORS(app)  # Enable CORS for all domains on all routes
 
 # Elasticsearch configuration
-ES_URL = "<YOUR ES URL>"
-ES_API_KEY = "<YOUR ES API KEY>"
+ES_URL = os.environ.get("ES_URL", "<YOUR ES URL>")
+ES_API_KEY = os.environ.get("ES_API_KEY", "<YOUR ES API KEY>")
+
+# Every request must be answered within REQUEST_DEADLINE_MS; upstream call
+# timeouts are cut to whatever is left of it (see resilience.py)
+REQUEST_DEADLINE_MS = int(os.environ.get("REQUEST_DEADLINE_MS", "30000"))
+# Share of the remaining deadline the ES lookups of an LLM endpoint may use
+ES_STAGE_SHARE = float(os.environ.get("ES_STAGE_SHARE", "0.4"))
+# Streaming exports and batch jobs run without a request deadline
+NO_DEADLINE_ENDPOINTS = ("/search-reviews/export", "/agentic-summary/batch")
+
+# Fail fast while an upstream keeps failing instead of piling up workers on it
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("BREAKER_RESET_SECONDS", "30"))
+es_breaker = CircuitBreaker("elasticsearch", BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS)
+openai_breaker = CircuitBreaker(
+    "openai", BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS, ignored=(BadRequestError,)
+)
+
+# Shared pooled client - keep-alive connections are reused across all endpoints
+es = ESClient(
+    ES_URL,
+    ES_API_KEY,
+    pool_size=int(os.environ.get("ES_POOL_SIZE", "20")),
+    timeouts={
+        "health": float(os.environ.get("ES_HEALTH_TIMEOUT", "10")),
+        "get": float(os.environ.get("ES_GET_TIMEOUT", "10")),
+        "search": float(os.environ.get("ES_SEARCH_TIMEOUT", "30"))
+    },
+    # Reads are retried with jittered backoff; ES_HEDGE_AFTER_MS > 0 also
+    # sends a second copy of reads slower than that
+    retries=int(os.environ.get("ES_READ_RETRIES", "2")),
+    hedge_after=float(os.environ.get("ES_HEDGE_AFTER_MS", "0")) / 1000 or None,
+    breaker=es_breaker
+)
 
 # OpenAI configuration
-OPENAI_API_KEY = "<YOUR OpenAI API KEY>"
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "<YOUR OpenAI API KEY>")
+OPENAI_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", "60"))
+OPENAI_RETRIES = int(os.environ.get("OPENAI_RETRIES", "1"))
+# OPENAI_BASE_URL points the client at an OpenAI-compatible server (e.g. the bench.py stand-in).
+# The client's own retries are off: openai_create retries within the request deadline
+openai_client = OpenAI(
+    api_key=OPENAI_API_KEY,
+    base_url=os.environ.get("OPENAI_BASE_URL") or None,
+    max_retries=0
+)
+
+# Every OpenAI call waits for a permit from the gateway: at most OPENAI_RPM requests and
+# OPENAI_TPM estimated tokens per minute (set them to the account's limits; 0 = unlimited)
+# and OPENAI_MAX_IN_FLIGHT concurrent calls, queued fairly across endpoints and users.
+# Calls that could not start within OPENAI_MAX_QUEUE_WAIT_MS, or find OPENAI_MAX_QUEUE
+# calls already waiting, are rejected at once with GatewayRejected
+OPENAI_MAX_QUEUE_WAIT_MS = int(os.environ.get("OPENAI_MAX_QUEUE_WAIT_MS", "5000"))
+llm_gateway = LLMGateway(
+    requests_per_minute=int(os.environ.get("OPENAI_RPM", "500")),
+    tokens_per_minute=int(os.environ.get("OPENAI_TPM", "200000")),
+    max_in_flight=int(os.environ.get("OPENAI_MAX_IN_FLIGHT", "32")),
+    max_queue=int(os.environ.get("OPENAI_MAX_QUEUE", "200")),
+    burst_seconds=float(os.environ.get("OPENAI_BURST_SECONDS", "10"))
+)
+count_prompt_tokens, _ = get_token_counter()
 
 # Default user (in production, this would come from auth)
 DEFAULT_USER = "Student2025"
 
-# Logging
+# Bounded pool for running independent upstream calls (ES lookups) concurrently
+upstream_executor = ContextThreadPoolExecutor(
+    max_workers=int(os.environ.get("UPSTREAM_WORKERS", "16")),
+    thread_name_prefix="upstream"
+)
+
+# Agentic summary cache - keyed on profile fingerprint + review_index version,
+# so new reviews or profile edits invalidate entries automatically
+AGENTIC_CACHE_BACKEND = os.environ.get("AGENTIC_CACHE_BACKEND", "memory")  # memory | sqlite
+CACHE_DB_PATH = os.environ.get("CACHE_DB_PATH", "result_cache.sqlite3")
+agentic_cache = ResultCache(
+    build_backend(
+        AGENTIC_CACHE_BACKEND,
+        path=CACHE_DB_PATH,
+        table="agentic_summary",
+        max_entries=int(os.environ.get("AGENTIC_CACHE_MAX_ENTRIES", "1000"))
+    ),
+    ttl_seconds=int(os.environ.get("AGENTIC_CACHE_TTL", "3600")),
+    name="agentic_summary"
+)
+
+# Semantic search summary cache - keyed on the normalized query + ordered top hit ids,
+# so the LLM only runs again when ES returns a different top 5
+semantic_cache = ResultCache(
+    build_backend(
+        os.environ.get("SEMANTIC_CACHE_BACKEND", "memory"),
+        path=CACHE_DB_PATH,
+        table="semantic_summary",
+        max_entries=int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+    ),
+    ttl_seconds=int(os.environ.get("SEMANTIC_CACHE_TTL", "86400")),
+    name="semantic_summary"
+)
+
+# user_profile documents, revalidated by _seq_no/_primary_term in the background once stale
+profile_cache = ProfileCache(
+    es,
+    ttl_seconds=int(os.environ.get("PROFILE_CACHE_TTL", "60")),
+    stale_seconds=int(os.environ.get("PROFILE_CACHE_STALE", "600")),
+    negative_ttl_seconds=int(os.environ.get("PROFILE_CACHE_NEGATIVE_TTL", "30")),
+    max_entries=int(os.environ.get("PROFILE_CACHE_MAX_ENTRIES", "10000")),
+    executor=upstream_executor
+)
+
+# Lexical + semantic retrieval fused in one request (RRF or weighted linear)
+hybrid_searcher = HybridSearcher(
+    es,
+    rank_window_size=int(os.environ.get("HYBRID_RANK_WINDOW", "50")),
+    rank_constant=int(os.environ.get("HYBRID_RANK_CONSTANT", "60"))
+)
+
+# Concurrent identical upstream calls share one execution (see singleflight.py)
+es_flight = SingleFlight("elasticsearch")
+llm_flight = SingleFlight("openai")
+
+# ELSER expansions of /semantic-search text, so each distinct normalized query
+# runs model inference once and is then searched with a sparse_vector query
+ELSER_EXPANSION_ENABLED = os.environ.get("ELSER_EXPANSION", "1") == "1"
+elser_expander = ElserExpander(
+    es,
+    ResultCache(
+        build_backend(
+            os.environ.get("ELSER_CACHE_BACKEND", "memory"),
+            path=CACHE_DB_PATH,
+            table="elser_expansion",
+            max_entries=int(os.environ.get("ELSER_CACHE_MAX_ENTRIES", "10000"))
+        ),
+        ttl_seconds=int(os.environ.get("ELSER_CACHE_TTL", "604800")),
+        name="elser_expansion"
+    ),
+    es_flight,
+    inference_id=os.environ.get("ELSER_INFERENCE_ID", "elser-inference")
+)
+
+# Agentic AI modes: "direct" sends up to 100 reviews in one prompt,
+# "mapreduce" summarizes every review in review_index in parallel chunks,
+# "materialized" personalizes the precomputed pros/cons from review_summary_index,
+# "fast" extracts pros/cons locally from the reviews without calling OpenAI
+AGENTIC_MODES = ("direct", "mapreduce", "materialized", "fast")
+
+# The agentic OpenAI call gets this long before the local extractive answer is
+# returned instead, which bounds /agentic-summary response time
+AGENTIC_LLM_BUDGET_MS = int(os.environ.get("AGENTIC_LLM_BUDGET_MS", "10000"))
+# Time kept back from the request deadline to build the local answer
+LOCAL_FALLBACK_RESERVE_MS = 200
+# What the local extractive engine describes; the category adds its aspects (see extractive.py)
+EXTRACTIVE_PRODUCT = os.environ.get("EXTRACTIVE_PRODUCT", DEFAULT_PRODUCT)
+EXTRACTIVE_CATEGORY = os.environ.get("EXTRACTIVE_CATEGORY", "smartwatch")
+
+# Runs LLM calls that are awaited with a deadline; a call that misses it
+# finishes here in the background (and still fills the cache)
+llm_executor = ContextThreadPoolExecutor(
+    max_workers=int(os.environ.get("LLM_WORKERS", "32")),
+    thread_name_prefix="llm"
+)
+
+# /agentic-summary/batch limits: users per request and concurrent OpenAI calls per batch
+BATCH_MAX_USERS = int(os.environ.get("BATCH_MAX_USERS", "200"))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+
+# Reviews sent to the agentic prompt (direct and batch modes)
+AGENTIC_REVIEWS_QUERY = {
+    "query": {
+        "match_all": {}
+    },
+    "size": 100,  # Get more reviews for comprehensive analysis
+    "_source": ["date", "username", "title", "review_text", "stars", "product", "helpful_votes"]
+}
+
+def estimate_tokens(options):
+    """Tokens a completion may use: the prompt plus the most it may write"""
+    prompt = sum(count_prompt_tokens(message.get("content") or "") + 4 for message in options.get("messages", []))
+    return prompt + options.get("max_tokens", 512)
+
+def release_when_done(openai_stream, permit):
+    """Yield a streamed completion's chunks, keeping the gateway permit until the stream ends"""
+    try:
+        yield from openai_stream
+    finally:
+        permit.release()
+
+def openai_create(**options):
+    """chat.completions.create through the LLM gateway and the OpenAI circuit breaker,
+    with the request deadline as timeout and bounded retries on transient errors"""
+    cap = options.pop("timeout", OPENAI_TIMEOUT)
+    estimated_tokens = estimate_tokens(options)
+    for attempt in range(1 + OPENAI_RETRIES):
+        # Queue wait counts against the request deadline like the call itself
+        permit = llm_gateway.acquire(
+            estimated_tokens, deadline_timeout(OPENAI_MAX_QUEUE_WAIT_MS / 1000, "openai_queue")
+        )
+        try:
+            timeout = deadline_timeout(cap, "openai")
+            openai_response = openai_breaker.call(openai_client.chat.completions.create, timeout=timeout, **options)
+        except (APIConnectionError, RateLimitError, InternalServerError) as e:
+            permit.release()
+            deadline = current_deadline()
+            if deadline is not None and deadline.expired():
+                raise deadline_error("openai") from e
+            if attempt == OPENAI_RETRIES or not sleep_before_retry(attempt, base=0.5, cap=4.0):
+                raise
+            continue
+        except BaseException:
+            permit.release()
+            raise
+        if options.get("stream"):
+            return release_when_done(openai_response, permit)
+        usage = getattr(openai_response, "usage", None)
+        permit.release(getattr(usage, "total_tokens", None))
+        return openai_response
+
+def stage_deadline(share):
+    """Deadline for a stage that may use `share` of the time the request has left"""
+    deadline = current_deadline()
+    return deadline.split(share) if deadline is not None else None
+
+def elser_query(text):
+    """(query, report) for ELSER search on review_text.semantic - see query_expansion.py"""
+    if not ELSER_EXPANSION_ENABLED:
+        return {
+            "semantic": {
+                "field": "review_text.semantic",
+                "query": text
+            }
+        }, {"expansion": "disabled"}
+    return elser_expander.query(text)
+
+def complete_chat(messages, **options):
+    """Run one blocking chat completion and return its text"""
+    openai_response = openai_create(messages=messages, **options)
+    return openai_response.choices[0].message.content.strip()
+
+mapreduce_summarizer = MapReduceSummarizer(
+    complete_chat,
+    chunk_size=int(os.environ.get("MAPREDUCE_CHUNK_SIZE", "50")),
+    max_concurrency=int(os.environ.get("MAPREDUCE_CONCURRENCY", "8")),
+    fan_in=int(os.environ.get("MAPREDUCE_FAN_IN", "8"))
+)
+
+# Merged map-reduce pros/cons - user independent, keyed on the review_index
+# version, so the full pass runs once per corpus change, not once per user
+mapreduce_cache = ResultCache(
+    build_backend(
+        os.environ.get("MAPREDUCE_CACHE_BACKEND", "memory"),
+        path=CACHE_DB_PATH,
+        table="mapreduce_points",
+        max_entries=int(os.environ.get("MAPREDUCE_CACHE_MAX_ENTRIES", "16"))
+    ),
+    ttl_seconds=int(os.environ.get("MAPREDUCE_CACHE_TTL", "86400")),
+    name="mapreduce_points"
+)
+
+def mapreduce_points(content_version):
+    """(merged, stats) of the map-reduce pass over review_index at `content_version`.
+
+    Served from mapreduce_cache; on a miss, concurrent requests share one
+    pass, which runs under the caller's request deadline. Runs with failed
+    chunks are returned but not cached.
+    """
+    cache_key = make_key("mapreduce", content_version) if content_version else None
+    cached = mapreduce_cache.get(cache_key) if cache_key else None
+    if cached:
+        return cached["merged"], dict(cached["stats"], cached=True)
+
+    def run():
+        merged, stats = mapreduce_summarizer.summarize(
+            es.scan("review_index", source=["title", "review_text", "stars"])
+        )
+        if cache_key and not stats["failed_chunks"]:
+            mapreduce_cache.set(cache_key, {"merged": merged, "stats": stats})
+        return merged, dict(stats, cached=False)
+
+    return llm_flight.do(("mapreduce", content_version), run)
+
+# Incrementally maintained per-product pros/cons (background thread enabled
+# with MATERIALIZER_ENABLED=1, or run materializer.py as a separate process)
+materializer = ProsConsMaterializer(
+    es,
+    mapreduce_summarizer,
+    interval=int(os.environ.get("MATERIALIZER_INTERVAL", "300"))
+)
+
+# Structured logging - JSON lines written by a background thread. Info lines
+# are kept for a LOG_SAMPLE_RATE fraction of requests; errors, 5xx responses
+# and requests slower than LOG_SLOW_MS are always logged
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "0.1"))
+LOG_SLOW_MS = float(os.environ.get("LOG_SLOW_MS", "2000"))
+logger, log_listener = setup_logging("review_search", os.environ.get("LOG_LEVEL", "INFO"))
+
+class RequestLogFilter(logging.Filter):
+    """Tags records logged during a request (here or by any module's
+    ComponentLogger) with its request_id, and drops informational records of
+    requests that were not sampled"""
+
+    def filter(self, record):
+        if not has_request_context():
+            return True
+        if record.levelno < logging.WARNING and not g.get("log_sampled", True):
+            return False
+        record.fields = dict(getattr(record, "fields", {}), request_id=g.get("request_id"))
+        record.fields.setdefault("endpoint", request.path)
+        return True
+
+logger.addFilter(RequestLogFilter())
+
+def _log(level, message, fields):
+    logger.log(level, message, extra={"fields": fields})
+
+def log_info(message, **fields):
+    """Sampled informational log line"""
+    _log(logging.INFO, message, fields)
+
+def log_error(message, **fields):
+    """Error log line (never sampled)"""
+    _log(logging.ERROR, message, fields)
+
 def log_request(endpoint, method, data=None):
-    timestamp = datetime.now().isoformat()
-    print(f"[{timestamp}] {method} {endpoint}")
-    if data:
-        print(f"  Data: {json.dumps(data, indent=2)}")
+    log_info("request", endpoint=endpoint, method=method, params=data or {})
+
+# Metrics - served at /metrics in the Prometheus text format
+metrics = MetricsRegistry()
+request_latency = metrics.histogram(
+    "review_search_request_seconds",
+    "Time until the response object is returned (streamed bodies excluded)",
+    ["endpoint", "method", "status"]
+)
+stage_latency = metrics.histogram(
+    "review_search_stage_seconds",
+    "Time spent in each stage of a request",
+    ["endpoint", "stage"]
+)
+es_response_bytes = metrics.histogram(
+    "review_search_es_response_bytes",
+    "Size of Elasticsearch response bodies (wire = as sent, decoded = as parsed)",
+    ["endpoint", "encoding"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+)
+metrics.gauge_collector(
+    "review_search_cache_events",
+    "Result cache counters since start",
+    ["cache", "event"],
+    lambda: [
+        ((cache.name, event), cache.stats()[event])
+        for cache in (agentic_cache, semantic_cache, mapreduce_cache, profile_cache, elser_expander.cache)
+        for event in ("hits", "misses", "expired", "stores", "evictions", "entries")
+    ]
+)
+metrics.gauge_collector(
+    "review_search_elser_expansion",
+    "ELSER query expansion: inference calls, cache hits, fallbacks to semantic queries and inference time (ms)",
+    ["event"],
+    lambda: [
+        ((event,), elser_expander.stats()[event])
+        for event in ("inferences", "cache_hits", "errors", "semantic_queries", "inference_ms", "inference_ms_saved")
+    ]
+)
+metrics.gauge_collector(
+    "review_search_coalescing_events",
+    "Single-flight counters since start",
+    ["group", "event"],
+    lambda: [
+        ((flight.name, event), flight.stats()[event])
+        for flight in (es_flight, llm_flight)
+        for event in ("requests", "executions", "coalesced", "errors", "in_flight")
+    ]
+)
+metrics.gauge_collector(
+    "review_search_es_pool",
+    "Elasticsearch connection pool counters since start",
+    ["event"],
+    lambda: [((event,), es.pool_stats()[event]) for event in ("requests", "hits", "misses", "available_slots")]
+)
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+metrics.gauge_collector(
+    "review_search_breaker_state",
+    "Circuit breaker state (0 closed, 1 half open, 2 open)",
+    ["upstream"],
+    lambda: [((breaker.name,), BREAKER_STATES[breaker.state]) for breaker in (es_breaker, openai_breaker)]
+)
+metrics.gauge_collector(
+    "review_search_breaker_events",
+    "Circuit breaker counters since start",
+    ["upstream", "event"],
+    lambda: [
+        ((breaker.name, event), breaker.stats()[event])
+        for breaker in (es_breaker, openai_breaker)
+        for event in ("calls", "successes", "failures", "rejected", "opened")
+    ]
+)
+metrics.gauge_collector(
+    "review_search_deadline_exceeded",
+    "Upstream calls not made or cut short because the request deadline ran out, since start",
+    ["stage"],
+    lambda: [((stage,), count) for stage, count in sorted(deadline_exceeded.snapshot().items())]
+)
+metrics.gauge_collector(
+    "review_search_es_retries",
+    "Elasticsearch read retries and hedged requests since start",
+    ["event"],
+    lambda: [((event,), es.resilience_stats()[event]) for event in ("retries", "hedged", "hedge_wins")]
+)
+metrics.gauge_collector(
+    "review_search_llm_gateway",
+    "OpenAI admission control: queue depth, calls in flight, budget left and rejections by reason",
+    ["event"],
+    lambda: [
+        ((event,), value)
+        for stats in [llm_gateway.stats()]
+        for event, value in [
+            ("queue_depth", stats["queue_depth"]),
+            ("in_flight", stats["in_flight"]),
+            ("waiting_users", stats["waiting_users"]),
+            ("admitted", stats["admitted"]),
+            ("requests_available", stats["requests_available"]),
+            ("tokens_available", stats["tokens_available"]),
+            ("estimated_tokens", stats["estimated_tokens"]),
+            ("used_tokens", stats["used_tokens"])
+        ] + [(f"rejected_{reason}", count) for reason, count in stats["rejected"].items()]
+        if value is not None
+    ]
+)
+llm_queue_wait = metrics.histogram(
+    "review_search_llm_queue_seconds",
+    "Time OpenAI calls waited in the LLM gateway, by endpoint and outcome (admitted or rejected_<reason>)",
+    ["endpoint", "outcome"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+)
+llm_gateway.observer = lambda flow, waited, outcome: llm_queue_wait.observe(waited, flow[0], outcome)
+
+metrics.gauge_collector(
+    "review_search_review_stats",
+    "Review analytics rollup: reviews covered, refreshes (full and incremental) and refresh errors",
+    ["field"],
+    lambda: [
+        ((field,), value)
+        for field, value in review_stats.status().items()
+        if field in ("reviews", "refreshes", "full_rebuilds", "incremental_refreshes", "refresh_errors",
+                     "last_refresh_ms", "served")
+        and value is not None
+    ]
+)
+metrics.gauge_collector(
+    "review_search_replica",
+    "Local review replica size, memory use, sync lag and queries served vs. sent to Elasticsearch",
+    ["field"],
+    lambda: [
+        ((field,), value)
+        for field, value in review_replica.status().items()
+        if field in ("docs", "terms", "memory_bytes", "lag_seconds", "syncs", "sync_errors", "served", "fallbacks")
+        and value is not None
+    ]
+)
+
+def record_es_payload(wire_bytes, body_bytes, parse_seconds):
+    """ESClient observer: response size histograms plus the es_parse stage of the current request"""
+    if not has_request_context():
+        es_response_bytes.observe(wire_bytes, "background", "wire")
+        es_response_bytes.observe(body_bytes, "background", "decoded")
+        return
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    es_response_bytes.observe(wire_bytes, endpoint, "wire")
+    es_response_bytes.observe(body_bytes, endpoint, "decoded")
+    g.stage_timings["es_parse_ms"] = round(g.stage_timings.get("es_parse_ms", 0) + parse_seconds * 1000, 3)
+    g.es_response_bytes = g.get("es_response_bytes", 0) + wire_bytes
+
+es.observer = record_es_payload
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.request_id = os.urandom(6).hex()
+    g.log_sampled = random.random() < LOG_SAMPLE_RATE
+    # "<stage>_ms" -> milliseconds, observed into stage_latency after the request
+    g.stage_timings = {}
+    g.deadline = None
+    if request.environ.get(JOB_ENVIRON_KEY):
+        g.deadline = Deadline(JOB_DEADLINE_MS / 1000)
+    elif request.path not in NO_DEADLINE_ENDPOINTS:
+        g.deadline = Deadline(REQUEST_DEADLINE_MS / 1000)
+    g.deadline_token = set_current_deadline(g.deadline)
+    g.llm_flow_token = set_current_flow(llm_flow())
+
+def llm_flow():
+    """(endpoint, user) this request's OpenAI calls are queued under in the LLM gateway"""
+    data = request.get_json(silent=True) if request.method == "POST" else None
+    user = data.get("username") if isinstance(data, dict) else None
+    if not isinstance(user, str) or not user:
+        user = request.headers.get("X-Forwarded-For", request.remote_addr or "-").split(",")[0].strip()
+    # Queued jobs compete with each other, not with interactive requests
+    endpoint = "/agentic-summary/jobs" if request.environ.get(JOB_ENVIRON_KEY) else request.path
+    return endpoint, user
+
+@app.teardown_request
+def clear_request_deadline(error=None):
+    token = g.pop("deadline_token", None)
+    if token is not None:
+        reset_current_deadline(token)
+    token = g.pop("llm_flow_token", None)
+    if token is not None:
+        reset_current_flow(token)
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    duration = time.perf_counter() - g.request_start
+    request_latency.observe(duration, endpoint, request.method, str(response.status_code))
+    for key, ms in list(g.stage_timings.items()):
+        if key != "total_ms":
+            stage_latency.observe(ms / 1000, endpoint, key[:-3] if key.endswith("_ms") else key)
+    
+    fields = {
+        "endpoint": endpoint,
+        "method": request.method,
+        "status": response.status_code,
+        "duration_ms": round(duration * 1000, 2),
+        "es_response_bytes": g.get("es_response_bytes", 0),
+        "stages": g.stage_timings
+    }
+    if response.status_code >= 500 or fields["duration_ms"] >= LOG_SLOW_MS:
+        _log(logging.WARNING, "response", fields)
+    else:
+        log_info("response", **fields)
+    response.headers["X-Request-Id"] = g.request_id
+    if startup["first_request"] is None:
+        record_first_request(endpoint, response.status_code, duration)
+    return response
+
+@contextmanager
+def timed_stage(stage):
+    """Record the wall time of a block as g.stage_timings["<stage>_ms"]"""
+    stage_start = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.stage_timings[f"{stage}_ms"] = round((time.perf_counter() - stage_start) * 1000, 3)
+
+def record_es_timing(es_data, request_stage="es_request"):
+    """Split an ES stage into server time (took) and network/client overhead"""
+    took = (es_data or {}).get('took')
+    request_ms = g.stage_timings.get(f"{request_stage}_ms")
+    if took is None or request_ms is None:
+        return
+    g.stage_timings["es_took_ms"] = took
+    g.stage_timings["es_overhead_ms"] = round(max(request_ms - took, 0), 3)
+
+def json_response(result):
+    """jsonify with the encoding time recorded as the json_encode stage"""
+    with timed_stage("json_encode"):
+        return jsonify(result)
+
+# The only _source fields transform_review_data reads - every review query projects to these
+REVIEW_FIELDS = ["date", "username", "location", "product", "stars", "title", "review_text",
+                 "helpful_votes", "verified"]
+
+# In-process copy of review_index (REPLICA_ENABLED=1) that answers unpaginated
+# /search-reviews and /keyword-search locally; requests fall back to
+# Elasticsearch while it is loading or more than REPLICA_MAX_STALENESS seconds
+# behind
+REPLICA_ENABLED = os.environ.get("REPLICA_ENABLED") == "1"
+review_replica = ReviewReplica(
+    es,
+    source=REVIEW_FIELDS,
+    refresh_interval=int(os.environ.get("REPLICA_REFRESH_INTERVAL", "30")),
+    max_staleness=int(os.environ.get("REPLICA_MAX_STALENESS", "120")),
+    resync_interval=int(os.environ.get("REPLICA_RESYNC_INTERVAL", "3600"))
+)
+
+def replica_search(method, *args):
+    """Run review_replica.<method>(*args) if the replica is enabled and fresh,
+    else return None so the caller queries Elasticsearch"""
+    if not REPLICA_ENABLED:
+        return None
+    if not review_replica.is_fresh():
+        review_replica.count_fallback()
+        return None
+    return getattr(review_replica, method)(*args)
 
 def transform_review_data(hit):
     """Transform Elasticsearch hit to frontend-expected format"""
@@ -56,28 +671,315 @@ def transform_review_data(hit):
         'images': []  # No images in new schema
     }
 
-def get_user_profile(username):
-    """Fetch user profile from Elasticsearch"""
+def run_timed(timings, stage, fn, *args, **kwargs):
+    """Run fn and record its wall time in milliseconds as timings[stage]"""
+    stage_start = time.time()
     try:
-        response = requests.get(
-            f"{ES_URL}/user_profile/_doc/{username}",
-            headers={
-                "Authorization": f"ApiKey {ES_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            return response.json().get('_source', {})
-        else:
-            print(f"  User profile not found for {username}")
+        return fn(*args, **kwargs)
+    finally:
+        timings[stage] = int((time.time() - stage_start) * 1000)
+
+def get_corpus_version(index="review_index"):
+    """Cheap version token for an index: doc count + latest review date.
+
+    Any newly indexed review changes the count (and usually the date), which
+    changes every cache key built from this token. Returns None if ES fails,
+    in which case callers skip caching.
+    """
+    try:
+        response = es.search(index, {
+            "size": 0,
+            "track_total_hits": True,
+            "aggs": {"last_date": {"max": {"field": "date"}}}
+        })
+        if response.status_code != 200:
             return None
+        es_data = es.parse_json(response)
+        total = es_data.get('hits', {}).get('total', {}).get('value', 0)
+        last_date = es_data.get('aggregations', {}).get('last_date', {}).get('value_as_string')
+        return f"{total}:{last_date}"
+    except Exception as e:
+        log_error(f"Error fetching corpus version: {str(e)}")
+        return None
+
+def get_user_profile(username):
+    """Fetch user profile through the profile cache"""
+    try:
+        profile = profile_cache.get(username)
+        if profile is None:
+            log_info(f"User profile not found for {username}")
+        return profile
             
     except Exception as e:
-        print(f"  Error fetching user profile: {str(e)}")
+        log_error(f"Error fetching user profile: {str(e)}")
         return None
 
+# Completion settings for the AI Search summary call
+SEMANTIC_COMPLETION_OPTIONS = {
+    "model": "gpt-3.5-turbo",
+    "max_tokens": 500,
+    "temperature": 0.7
+}
+
+def render_semantic_review(number, source):
+    """Render one review for the AI Search summary prompt"""
+    return (
+        f"Review {number}:\n"
+        f"Title: {source.get('title', '')}\n"
+        f"Rating: {source.get('stars', 0)}/5 stars\n"
+        f"Product: {source.get('product', '')}\n"
+        f"Review: {source.get('review_text', '')}\n"
+        f"By: {source.get('username', '')}\n\n"
+    )
+
+# Token budgets for the review part of each prompt - reviews are ranked,
+# de-duplicated and trimmed to fit (see context_builder.py)
+CONTEXT_REVIEW_TOKENS = int(os.environ.get("CONTEXT_REVIEW_TOKENS", "250"))
+semantic_context = ContextBuilder(
+    render_semantic_review,
+    budget_tokens=int(os.environ.get("SEMANTIC_CONTEXT_TOKENS", "1500")),
+    model=SEMANTIC_COMPLETION_OPTIONS["model"],
+    max_review_tokens=CONTEXT_REVIEW_TOKENS
+)
+agentic_context = ContextBuilder(
+    render_review,
+    budget_tokens=int(os.environ.get("AGENTIC_CONTEXT_TOKENS", "6000")),
+    model=AGENTIC_COMPLETION_OPTIONS["model"],
+    max_review_tokens=CONTEXT_REVIEW_TOKENS
+)
+
+# Aggregation rollup of review_index behind /review-stats, refreshed incrementally
+# at most every REVIEW_STATS_REFRESH_INTERVAL seconds and rebuilt every
+# REVIEW_STATS_RESYNC_INTERVAL seconds
+review_stats = ReviewStats(
+    es,
+    refresh_interval=int(os.environ.get("REVIEW_STATS_REFRESH_INTERVAL", "60")),
+    resync_interval=int(os.environ.get("REVIEW_STATS_RESYNC_INTERVAL", "3600"))
+)
+# Agentic prompts (direct and batch) start with the rollup's figures for all
+# reviews, and the sample of raw reviews after them gets the smaller
+# AGENTIC_STATS_CONTEXT_TOKENS budget
+REVIEW_STATS_IN_PROMPT = os.environ.get("REVIEW_STATS_IN_PROMPT", "1") == "1"
+agentic_stats_context = ContextBuilder(
+    render_review,
+    budget_tokens=int(os.environ.get("AGENTIC_STATS_CONTEXT_TOKENS", "3000")),
+    model=AGENTIC_COMPLETION_OPTIONS["model"],
+    max_review_tokens=CONTEXT_REVIEW_TOKENS
+)
+
+def review_stats_prompt():
+    """Rollup lines for the agentic prompt, or "" when disabled or unavailable"""
+    if not REVIEW_STATS_IN_PROMPT:
+        return ""
+    try:
+        return review_stats.prompt_text()
+    except Exception as e:
+        log_error(f"Review stats unavailable for the prompt: {str(e)}")
+        return ""
+
+def build_agentic_context(hits, stats_text, focus_terms=None):
+    """(reviews_text, context_report) for an agentic prompt - fewer raw reviews when
+    the review statistics are in the prompt"""
+    builder = agentic_stats_context if stats_text else agentic_context
+    reviews_text, _, context_report = builder.build(hits, focus_terms=focus_terms)
+    context_report["review_stats_tokens"] = count_prompt_tokens(stats_text) if stats_text else 0
+    return reviews_text, context_report
+
+def build_semantic_messages(search_text, hits):
+    """Chat messages asking OpenAI to summarize the top semantic hits for a query.
+
+    Returns (messages, context_report).
+    """
+    # Long reviews keep the sentences that mention the query terms
+    context_text, _, context_report = semantic_context.build(hits, focus_terms=[search_text])
+    
+    messages = [
+        {
+            "role": "system", 
+            "content": "You are an expert assistant that analyzes product reviews. Based on the provided reviews, create a comprehensive summary that addresses the user's search query. Focus on the most relevant insights, common themes, pros/cons, and specific details mentioned in the reviews. Be concise but thorough."
+        },
+        {
+            "role": "user",
+            "content": f"User search query: '{search_text}'\n\nRelevant reviews:\n{context_text}\n\nPlease provide a detailed summary addressing the search query based on these reviews. Include specific insights, common themes, and any notable patterns you observe."
+        }
+    ]
+    return messages, context_report
+
+def generate_semantic_summary(messages):
+    """Run the AI Search summary completion"""
+    openai_response = openai_create(
+        messages=messages,
+        **SEMANTIC_COMPLETION_OPTIONS
+    )
+    return openai_response.choices[0].message.content.strip()
+
+def generate_agentic_summary(messages):
+    """Run the agentic completion and parse it into pros/cons/recommendation"""
+    openai_response = openai_create(messages=messages, **AGENTIC_COMPLETION_OPTIONS)
+    return parse_agentic_response(openai_response.choices[0].message.content)
+
+def agentic_llm_budget_ms():
+    """AGENTIC_LLM_BUDGET_MS, shortened so the local fallback still fits in the request deadline"""
+    deadline = current_deadline()
+    if deadline is None:
+        return AGENTIC_LLM_BUDGET_MS
+    return max(min(AGENTIC_LLM_BUDGET_MS, deadline.remaining_ms() - LOCAL_FALLBACK_RESERVE_MS), 0)
+
+def local_agentic_summary(username, user_profile, hits=None, points=None):
+    """Pros/cons/recommendation without OpenAI: extracted from the review hits,
+    or from already merged pros/cons, or the static answer as a last resort"""
+    if hits:
+        return summarize_reviews(hits, user_profile, EXTRACTIVE_PRODUCT, EXTRACTIVE_CATEGORY)[0]
+    if points:
+        return summarize_points(points, user_profile, EXTRACTIVE_PRODUCT)
+    return fallback_agentic_summary(username)
+
+def generate_agentic_summary_within(budget_ms, key, messages, cache_key=None, cache_value=None):
+    """generate_agentic_summary bounded by budget_ms; raises FutureTimeoutError when it misses.
+
+    The call keeps running after a timeout and caches its answer when it arrives.
+    """
+    future = llm_executor.submit(llm_flight.do, key, generate_agentic_summary, messages)
+    if cache_key:
+        def cache_answer(done):
+            if not done.exception():
+                agentic_cache.set(cache_key, dict(cache_value or {}, **done.result()))
+        future.add_done_callback(cache_answer)
+    return future.result(timeout=budget_ms / 1000)
+
+def upstream_error_status(error):
+    """504 when the request deadline ran out, 503 while an upstream's breaker is open,
+    429 when the LLM gateway is over capacity, else 500"""
+    if isinstance(error, DeadlineExceeded):
+        return 504
+    if isinstance(error, CircuitOpenError):
+        return 503
+    if isinstance(error, GatewayRejected):
+        return 429
+    return 500
+
+def cursor_expired_response():
+    """Error for a cursor whose point-in-time has expired on the cluster"""
+    return jsonify({
+        "status": "error",
+        "message": "Cursor expired, start again without a cursor"
+    }), 410
+
+def sse_response(events):
+    """Wrap an SSE event generator in an unbuffered streaming response"""
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def stream_semantic_summary(base_result, hits, messages, summary_key, cached_summary):
+    """SSE generator for AI Search: hits and metadata first, then summary tokens as they arrive"""
+    yield sse_event("meta", dict(base_result, reviews=[transform_review_data(hit) for hit in hits]))
+    
+    if cached_summary is not None:
+        yield sse_event("token", {"text": cached_summary})
+        yield sse_event("done", dict(base_result, summary=cached_summary, summary_cached=True))
+        return
+    
+    parts = []
+    try:
+        openai_stream = openai_create(
+            messages=messages,
+            stream=True,
+            **SEMANTIC_COMPLETION_OPTIONS
+        )
+        for delta in iter_completion_text(openai_stream):
+            parts.append(delta)
+            yield sse_event("token", {"text": delta})
+        ai_summary = "".join(parts).strip()
+        semantic_cache.set(summary_key, ai_summary)
+        
+    except Exception as openai_error:
+        log_error(f"OpenAI Error: {str(openai_error)}")
+        ai_summary = f"Error generating AI summary: {str(openai_error)}"
+        yield sse_event("error", {"message": ai_summary})
+    
+    yield sse_event("done", dict(base_result, summary=ai_summary, summary_cached=False))
+
+# Agentic answer fields -> SSE event names
+AGENTIC_STREAM_EVENTS = {
+    "pros": "pro",
+    "cons": "con",
+    "personalized_recommendation": "recommendation"
+}
+
+def stream_agentic_summary(base_result, messages, cache_key, stage_timings, start_time, fallback):
+    """SSE generator for Agentic AI: metadata first, then each pro, con and the
+    recommendation as soon as its JSON field is complete.
+
+    Past the LLM budget (see agentic_llm_budget_ms) the stream is abandoned
+    and fallback() answers.
+    """
+    yield sse_event("meta", dict(base_result, stage_timings=dict(stage_timings)))
+    
+    fields = JsonFieldStreamer()
+    emitted = {"pros": 0, "cons": 0}
+    llm_start = time.time()
+    budget_ms = agentic_llm_budget_ms()
+    try:
+        openai_stream = openai_create(
+            messages=messages,
+            stream=True,
+            timeout=budget_ms / 1000,
+            **AGENTIC_COMPLETION_OPTIONS
+        )
+        for delta in iter_completion_text(openai_stream):
+            if (time.time() - llm_start) * 1000 > budget_ms:
+                raise TimeoutError(f"no complete answer within {budget_ms}ms")
+            for field, value in fields.feed(delta):
+                if field not in AGENTIC_STREAM_EVENTS:
+                    continue
+                if field in emitted:
+                    # Same 3-item cap as the blocking response
+                    if emitted[field] >= 3:
+                        continue
+                    emitted[field] += 1
+                yield sse_event(AGENTIC_STREAM_EVENTS[field], {"value": value})
+        
+        summary = parse_agentic_response(fields.text)
+        if cache_key:
+            agentic_cache.set(cache_key, dict(base_result, **summary))
+            
+    except Exception as openai_error:
+        log_error(f"OpenAI Error: {str(openai_error)}")
+        summary = dict(fallback(), engine="extractive", fallback_reason=str(openai_error))
+        yield sse_event("error", {"message": f"OpenAI Error: {str(openai_error)}", "fallback": True})
+    
+    stage_timings["llm_ms"] = int((time.time() - llm_start) * 1000)
+    processing_time = int((time.time() - start_time) * 1000)
+    stage_timings["total_ms"] = processing_time
+    yield sse_event("done", dict(
+        base_result,
+        **summary,
+        processing_time=processing_time,
+        stage_timings=stage_timings,
+        cached=False
+    ))
+
+def stream_cached_agentic_summary(result):
+    """SSE generator replaying a complete (cached or locally computed) Agentic AI answer
+    in the streaming event format"""
+    yield sse_event("meta", result)
+    for field, event in AGENTIC_STREAM_EVENTS.items():
+        values = result[field] if isinstance(result[field], list) else [result[field]]
+        for value in values:
+            yield sse_event(event, {"value": value})
+    yield sse_event("done", result)
+
+@app.route('/startup-status', methods=['GET'])
+def startup_status():
+    """Report this worker process's cold start, warm-up stages and first request latency"""
+    return jsonify({
+        "status": "success",
+        "startup": startup
+    })
+
 @app.route('/')
 def health_check():
     return jsonify({
@@ -92,9 +994,23 @@ def health_check():
         "endpoints": {
             "/search-reviews": "POST - Browse all reviews by date",
             "/semantic-search": "POST - AI-powered semantic search with summary",
+            "/search-reviews/export": "GET - Stream all reviews as NDJSON",
             "/keyword-search": "POST - Keyword-based multi-match search",
+            "/hybrid-search": "POST - Keyword + semantic search fused with RRF",
             "/agentic-summary": "POST - Automatic pros/cons extraction with personalized recommendations",
-            "/cluster-health": "GET - Check Elasticsearch health"
+            "/agentic-summary/batch": "POST - Personalized recommendations for many users, streamed as NDJSON",
+            "/agentic-summary/jobs": "POST - Queue an agentic summary, returns a job id (202)",
+            "/jobs/<job_id>": "GET - Job state and result (?wait= long-polls), DELETE - Cancel the job",
+            "/jobs": "GET - Job queue depth and workers",
+            "/cluster-health": "GET - Check Elasticsearch health",
+            "/cache-stats": "GET - Summary cache hit rates and coalesced requests",
+            "/profile-cache/invalidate": "POST - Drop cached user profiles after an update",
+            "/metrics": "GET - Prometheus latency metrics",
+            "/upstream-status": "GET - Circuit breakers, retries, deadline counters and the LLM gateway queue",
+            "/startup-status": "GET - Cold start, warm-up and first request latency of this worker",
+            "/materializer-status": "GET - Materialized pros/cons progress",
+            "/replica-status": "GET - Local review replica size and sync lag",
+            "/review-stats": "GET - Star histogram, per-product ratings, volume trend and top helpful reviews"
         }
     })
 
@@ -104,21 +1020,15 @@ def cluster_health():
     try:
         log_request('/cluster-health', 'GET')
         
-        response = requests.get(
-            f"{ES_URL}/_cluster/health",
-            headers={
-                "Authorization": f"ApiKey {ES_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            timeout=10
-        )
+        response = es.get("_cluster/health", op="health")
         
-        print(f"  ES Response: {response.status_code}")
+        log_info(f"ES Response: {response.status_code}")
         
         if response.status_code == 200:
             return jsonify({
                 "status": "success",
-                "elasticsearch": response.json()
+                "elasticsearch": es.parse_json(response),
+                "connection_pool": es.pool_stats()
             })
         else:
             return jsonify({
@@ -128,59 +1038,197 @@ def cluster_health():
             }), response.status_code
             
     except requests.exceptions.RequestException as e:
-        print(f"  Error: {str(e)}")
+        log_error(f"Error: {str(e)}")
         return jsonify({
             "status": "error",
             "message": f"Failed to connect to Elasticsearch: {str(e)}"
         }), 500
 
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """Report hit/miss counters for the result and profile caches and request coalescing"""
+    return jsonify({
+        "status": "success",
+        "caches": {
+            "agentic_summary": agentic_cache.stats(),
+            "semantic_summary": semantic_cache.stats(),
+            "mapreduce_points": mapreduce_cache.stats(),
+            "user_profile": profile_cache.stats(),
+            "elser_expansion": elser_expander.stats()
+        },
+        "coalescing": {
+            "elasticsearch": es_flight.stats(),
+            "openai": llm_flight.stats()
+        }
+    })
+
+@app.route('/profile-cache/invalidate', methods=['POST'])
+def invalidate_profile_cache():
+    """Drop cached profiles after an update: {"username": "..."} for one user, {} for all"""
+    data = request.get_json(silent=True) or {}
+    username = data.get('username')
+    profile_cache.invalidate(username)
+    log_info(f"Profile cache invalidated for {username or 'all users'}")
+    return jsonify({
+        "status": "success",
+        "invalidated": username or "all"
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Request/stage latency histograms and cache counters in Prometheus text format"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/upstream-status', methods=['GET'])
+def upstream_status():
+    """Report circuit breakers, retries and deadline-exceeded counts for ES and OpenAI, and the LLM gateway queue"""
+    return jsonify({
+        "status": "success",
+        "request_deadline_ms": REQUEST_DEADLINE_MS,
+        "elasticsearch": es.resilience_stats(),
+        "openai": {
+            "retries_per_call": OPENAI_RETRIES,
+            "timeout_seconds": OPENAI_TIMEOUT,
+            "breaker": openai_breaker.stats(),
+            "gateway": llm_gateway.stats()
+        },
+        "deadline_exceeded": deadline_exceeded.snapshot()
+    })
+
+@app.route('/materializer-status', methods=['GET'])
+def materializer_status():
+    """Report progress of the background pros/cons materializer"""
+    return jsonify({
+        "status": "success",
+        "materializer": materializer.status()
+    })
+
+@app.route('/replica-status', methods=['GET'])
+def replica_status():
+    """Report size, memory use and sync lag of the local review replica"""
+    return jsonify({
+        "status": "success",
+        "enabled": REPLICA_ENABLED,
+        "replica": review_replica.status()
+    })
+
+@app.route('/review-stats', methods=['GET'])
+def get_review_stats():
+    """Review analytics from the aggregation rollup: star histogram, per-product
+    average stars, review volume per ?interval= (day, week, month), verified
+    ratio and the ?top= most helpful reviews"""
+    try:
+        start_time = time.time()
+        interval = request.args.get('interval', 'month')
+        if interval not in INTERVALS:
+            return jsonify({
+                "status": "error",
+                "message": f"Unknown interval '{interval}', expected one of: {', '.join(INTERVALS)}"
+            }), 400
+        try:
+            top = max(0, min(int(request.args.get('top', 5)), review_stats.top_size))
+            products = max(0, int(request.args.get('products', 20)))
+        except ValueError:
+            return jsonify({
+                "status": "error",
+                "message": "top and products must be integers"
+            }), 400
+        
+        log_request('/review-stats', 'GET', {"interval": interval})
+        
+        with timed_stage("rollup"):
+            stats = review_stats.stats(interval=interval, top=top, products=products)
+        status = review_stats.status()
+        return json_response(dict(
+            stats,
+            status="success",
+            rollup={field: status[field] for field in ("refreshes", "full_rebuilds", "last_new_reviews", "last_error")},
+            processing_time=int((time.time() - start_time) * 1000)
+        ))
+        
+    except requests.exceptions.RequestException as e:
+        log_error(f"Network Error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": f"Network error: {str(e)}"
+        }), 500
+    except Exception as e:
+        log_error(f"Server Error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": f"Server error: {str(e)}"
+        }), upstream_error_status(e)
+
 @app.route('/search-reviews', methods=['POST'])
 def search_reviews():
-    """Get all reviews sorted by latest date (Browse All mode)"""
+    """Get all reviews sorted by latest date (Browse All mode)
+
+    Send "paginate": true (and optionally "page_size") to receive a
+    next_cursor, then {"cursor": next_cursor} to fetch the following pages.
+    """
     try:
+        data = request.get_json(silent=True) or {}
+        cursor_token = data.get('cursor')
+        paginate = bool(data.get('paginate')) or bool(cursor_token)
+        cursor = decode_cursor(cursor_token, "/search-reviews") if cursor_token else None
+        page_size = page_size_from(data, 50, cursor)
+        sort = [{"date": {"order": "desc"}}]
+        
         # Default search query - get all reviews sorted by date desc
         es_query = {
             "query": {
                 "match_all": {}
             },
-            "size": 50,
-            "sort": [
-                {"date": {"order": "desc"}}
-            ]
+            "size": page_size,
+            "sort": sort,
+            "_source": REVIEW_FIELDS
         }
             
-        log_request('/search-reviews', 'POST', es_query)
-        
-        # Make request to Elasticsearch
-        response = requests.post(
-            f"{ES_URL}/review_index/_search",
-            headers={
-                "Authorization": f"ApiKey {ES_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json=es_query,
-            timeout=30
-        )
+        log_request('/search-reviews', 'POST', dict(es_query, cursor=bool(cursor_token)))
         
-        print(f"  ES Response: {response.status_code}")
+        # Answer from the local replica if possible, else make request to Elasticsearch
+        next_cursor = None
+        es_data = None
+        if not paginate:
+            with timed_stage("replica"):
+                es_data = replica_search("browse", page_size)
+        served_by = "replica" if es_data is not None else "elasticsearch"
+        if es_data is None:
+            with timed_stage("es_request"):
+                if paginate:
+                    response, es_data, next_cursor = paged_search(
+                        es, "review_index", es_query["query"], sort, page_size, cursor, source=REVIEW_FIELDS,
+                        endpoint="/search-reviews"
+                    )
+                else:
+                    response = es.search("review_index", es_query)
+                    es_data = es.parse_json(response) if response.status_code == 200 else None
+            log_info(f"ES Response: {response.status_code}")
         
-        if response.status_code == 200:
-            es_data = response.json()
+        if served_by == "replica" or response.status_code == 200:
+            record_es_timing(es_data)
             
             # Transform response for frontend
-            reviews = [transform_review_data(hit) for hit in es_data.get('hits', {}).get('hits', [])]
+            with timed_stage("transform"):
+                reviews = [transform_review_data(hit) for hit in es_data.get('hits', {}).get('hits', [])]
             
             result = {
                 "status": "success",
                 "total": es_data.get('hits', {}).get('total', {}).get('value', 0),
                 "took": es_data.get('took', 0),
                 "reviews": reviews,
-                "search_mode": "date_browse"
+                "search_mode": "date_browse",
+                "served_by": served_by
             }
+            if paginate:
+                result["next_cursor"] = next_cursor
+                result["page_size"] = page_size
             
-            print(f"  Returned {len(reviews)} reviews (date sorted)")
-            return jsonify(result)
+            log_info(f"Returned {len(reviews)} reviews (date sorted)")
+            return json_response(result)
             
+        elif cursor_token and response.status_code == 404:
+            return cursor_expired_response()
         else:
             return jsonify({
                 "status": "error",
@@ -188,25 +1236,69 @@ def search_reviews():
                 "details": response.text
             }), response.status_code
             
+    except CursorError as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
     except requests.exceptions.RequestException as e:
-        print(f"  Network Error: {str(e)}")
+        log_error(f"Network Error: {str(e)}")
         return jsonify({
             "status": "error",
             "message": f"Network error: {str(e)}"
         }), 500
     except Exception as e:
-        print(f"  Server Error: {str(e)}")
+        log_error(f"Server Error: {str(e)}")
         return jsonify({
             "status": "error",
             "message": f"Server error: {str(e)}"
-        }), 500
+        }), upstream_error_status(e)
+
+@app.route('/search-reviews/export', methods=['GET'])
+def export_reviews():
+    """Stream every review (newest first) as NDJSON without buffering the index"""
+    log_request('/search-reviews/export', 'GET')
+    
+    def generate():
+        exported = 0
+        try:
+            for hit in es.scan(
+                "review_index",
+                page_size=1000,
+                source=REVIEW_FIELDS,
+                sort=[{"date": {"order": "desc"}}, {"_shard_doc": "asc"}]
+            ):
+                yield dumps(transform_review_data(hit)) + "\n"
+                exported += 1
+        except Exception as e:
+            # Headers are already sent - report the failure in-band
+            log_error(f"Export Error after {exported} reviews: {str(e)}")
+            yield dumps({"status": "error", "message": f"Export failed: {str(e)}"}) + "\n"
+            return
+        log_info(f"Exported {exported} reviews")
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=reviews.ndjson"}
+    )
 
 @app.route('/keyword-search', methods=['POST'])
 def keyword_search():
-    """Perform keyword-based multi-match search on title and review text"""
+    """Perform keyword-based multi-match search on title and review text
+
+    Accepts the same "paginate" / "page_size" / "cursor" fields as
+    /search-reviews; the cursor remembers the query.
+    """
     try:
         data = request.get_json()
-        search_query = data.get('query', '')
+        cursor_token = data.get('cursor')
+        cursor = decode_cursor(cursor_token, "/keyword-search") if cursor_token else None
+        paginate = bool(data.get('paginate')) or bool(cursor)
+        search_query = data.get('query') or (cursor or {}).get('q', '')
+        if cursor and search_query != cursor.get('q'):
+            # search_after values from one query's PIT page mean nothing for another
+            raise CursorError("Cursor belongs to a different query")
         
         if not search_query:
             return jsonify({
@@ -226,32 +1318,40 @@ def keyword_search():
                     "fuzziness": "AUTO"
                 }
             },
-            "size": 20,
+            "size": page_size_from(data, 20, cursor),
             "sort": [
                 {"_score": {"order": "desc"}},  # Sort by relevance first
                 {"date": {"order": "desc"}}     # Then by date
-            ]
+            ],
+            "_source": REVIEW_FIELDS
         }
         
-        # Search Elasticsearch
-        response = requests.post(
-            f"{ES_URL}/review_index/_search",
-            headers={
-                "Authorization": f"ApiKey {ES_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json=es_query,
-            timeout=30
-        )
-        
-        print(f"  ES Response: {response.status_code}")
+        # Search the local replica if possible, else Elasticsearch
+        next_cursor = None
+        es_data = None
+        if not paginate:
+            with timed_stage("replica"):
+                es_data = replica_search("keyword_search", search_query, es_query["size"])
+        served_by = "replica" if es_data is not None else "elasticsearch"
+        if es_data is None:
+            with timed_stage("es_request"):
+                if paginate:
+                    response, es_data, next_cursor = paged_search(
+                        es, "review_index", es_query["query"], es_query["sort"], es_query["size"], cursor,
+                        source=REVIEW_FIELDS, endpoint="/keyword-search", q=search_query
+                    )
+                else:
+                    response = es.search("review_index", es_query)
+                    es_data = es.parse_json(response) if response.status_code == 200 else None
+            log_info(f"ES Response: {response.status_code}")
         
-        if response.status_code == 200:
-            es_data = response.json()
+        if served_by == "replica" or response.status_code == 200:
+            record_es_timing(es_data)
             hits = es_data.get('hits', {}).get('hits', [])
             
             # Transform response for frontend
-            reviews = [transform_review_data(hit) for hit in hits]
+            with timed_stage("transform"):
+                reviews = [transform_review_data(hit) for hit in hits]
             
             result = {
                 "status": "success",
@@ -260,12 +1360,18 @@ def keyword_search():
                 "took": es_data.get('took', 0),
                 "reviews": reviews,
                 "search_mode": "keyword",
-                "max_score": es_data.get('hits', {}).get('max_score', 0)
+                "max_score": es_data.get('hits', {}).get('max_score', 0),
+                "served_by": served_by
             }
+            if paginate:
+                result["next_cursor"] = next_cursor
+                result["page_size"] = es_query["size"]
             
-            print(f"  Found {len(reviews)} reviews matching '{search_query}'")
-            return jsonify(result)
+            log_info(f"Found {len(reviews)} reviews matching '{search_query}'")
+            return json_response(result)
             
+        elif cursor and response.status_code == 404:
+            return cursor_expired_response()
         else:
             return jsonify({
                 "status": "error",
@@ -273,18 +1379,120 @@ def keyword_search():
                 "details": response.text
             }), response.status_code
             
+    except CursorError as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
     except requests.exceptions.RequestException as e:
-        print(f"  Network Error: {str(e)}")
+        log_error(f"Network Error: {str(e)}")
         return jsonify({
             "status": "error",
             "message": f"Network error: {str(e)}"
         }), 500
     except Exception as e:
-        print(f"  Server Error: {str(e)}")
+        log_error(f"Server Error: {str(e)}")
         return jsonify({
             "status": "error",
             "message": f"Server error: {str(e)}"
+        }), upstream_error_status(e)
+
+@app.route('/hybrid-search', methods=['POST'])
+def hybrid_search():
+    """Keyword + semantic search fused in a single Elasticsearch request (Hybrid mode)"""
+    try:
+        data = request.get_json()
+        search_query = data.get('query', '')
+        method = data.get('method', 'rrf')
+        summarize = bool(data.get('summarize', False))
+        
+        if not search_query:
+            return jsonify({
+                "status": "error",
+                "message": "No search query provided"
+            }), 400
+        if method not in FUSION_METHODS:
+            return jsonify({
+                "status": "error",
+                "message": f"Unknown method '{method}', expected one of: {', '.join(FUSION_METHODS)}"
+            }), 400
+        try:
+            size = max(1, min(int(data.get('size', 10)), 50))
+            weights = {
+                name: float(value) for name, value in (data.get('weights') or {}).items()
+                if name in ("lexical", "semantic")
+            }
+        except (AttributeError, TypeError, ValueError) as e:
+            return jsonify({
+                "status": "error",
+                "message": f"Invalid size or weights: {str(e)}"
+            }), 400
+        
+        log_request('/hybrid-search', 'POST', {"search_query": search_query, "method": method})
+        
+        with timed_stage("es_request"), deadline_scope(stage_deadline(ES_STAGE_SHARE)):
+            response, es_data, engine = es_flight.do(
+                ("hybrid_search", normalize_query(search_query), method, size, tuple(sorted(weights.items()))),
+                hybrid_searcher.search, search_query, size, method, weights, REVIEW_FIELDS
+            )
+        
+        log_info(f"ES Response: {response.status_code} ({engine} fusion)")
+        
+        if es_data is None:
+            return jsonify({
+                "status": "error",
+                "message": f"Elasticsearch search failed: {response.status_code}",
+                "details": response.text
+            }), response.status_code
+        
+        record_es_timing(es_data)
+        hits = es_data.get('hits', {}).get('hits', [])
+        with timed_stage("transform"):
+            reviews = [transform_review_data(hit) for hit in hits]
+        result = {
+            "status": "success",
+            "query": search_query,
+            # Fused candidates, not the page size
+            "total": es_data.get('hits', {}).get('total', {}).get('value', len(hits)),
+            "took": es_data.get('took', 0),
+            "reviews": reviews,
+            "search_mode": "hybrid",
+            "fusion": {"method": method, "engine": engine}
+        }
+        
+        # Optionally summarize the fused top 5 like AI Search does
+        if summarize and hits:
+            top_hits = hits[:5]
+            summary_key = make_key("semantic_summary", normalize_query(search_query), [hit['_id'] for hit in top_hits])
+            summary = semantic_cache.get(summary_key)
+            result["summary_cached"] = summary is not None
+            if summary is None:
+                try:
+                    with timed_stage("prompt_build"):
+                        messages, result["context"] = build_semantic_messages(search_query, top_hits)
+                    with timed_stage("llm"):
+                        summary = llm_flight.do(summary_key, generate_semantic_summary, messages)
+                    semantic_cache.set(summary_key, summary)
+                except Exception as openai_error:
+                    log_error(f"OpenAI Error: {str(openai_error)}")
+                    summary = f"Error generating AI summary: {str(openai_error)}"
+            result["summary"] = summary
+        
+        log_info(f"Found {len(hits)} reviews for '{search_query}' with {method} fusion")
+        return json_response(result)
+            
+    except requests.exceptions.RequestException as e:
+        log_error(f"Network Error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": f"Network error: {str(e)}"
         }), 500
+    except Exception as e:
+        log_error(f"Server Error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": f"Server error: {str(e)}"
+        }), upstream_error_status(e)
 
 @app.route('/semantic-search', methods=['POST'])
 def semantic_search():
@@ -292,6 +1500,7 @@ def semantic_search():
     try:
         data = request.get_json()
         search_text = data.get('text', '')
+        stream = bool(data.get('stream', False))
         
         if not search_text:
             return jsonify({
@@ -301,30 +1510,28 @@ def semantic_search():
         
         log_request('/semantic-search', 'POST', {"search_text": search_text})
         
-        # Semantic search query using ELSER on the semantic subfield
-        es_query = {
-            "query": {
-                "semantic": {
-                    "field": "review_text.semantic",
-                    "query": search_text
-                }
-            },
-            "size": 5,  # Get top 5 results for RAG
-            "_source": ["date", "username", "title", "review_text", "stars", "product"]
-        }
-        
-        # Search Elasticsearch
-        response = requests.post(
-            f"{ES_URL}/review_index/_search",
-            headers={
-                "Authorization": f"ApiKey {ES_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json=es_query,
-            timeout=30
-        )
+        # Search Elasticsearch - identical normalized queries in flight share one search.
+        # The search may use ES_STAGE_SHARE of the deadline, the rest is left for OpenAI
+        with timed_stage("es_request"), deadline_scope(stage_deadline(ES_STAGE_SHARE)):
+            # ELSER on the semantic subfield: a sparse_vector query from the cached
+            # expansion of the text, or a semantic query that runs inference in ES
+            with timed_stage("elser_expansion"):
+                query, expansion = elser_query(search_text)
+            es_query = {
+                "query": query,
+                "size": 5,  # Get top 5 results for RAG
+                "_source": REVIEW_FIELDS
+            }
+            response = es_flight.do(
+                ("semantic_search", normalize_query(search_text), expansion["expansion"]),
+                es.search, "review_index", es_query
+            )
+            if response.status_code == 400 and "sparse_vector" in query:
+                elser_expander.disable(response.text[:200])
+                es_query["query"], expansion = elser_query(search_text)
+                response = es.search("review_index", es_query)
         
-        print(f"  ES Response: {response.status_code}")
+        log_info(f"ES Response: {response.status_code}")
         
         if response.status_code != 200:
             return jsonify({
@@ -333,7 +1540,8 @@ def semantic_search():
                 "details": response.text
             }), response.status_code
             
-        es_data = response.json()
+        es_data = es.parse_json(response)
+        record_es_timing(es_data)
         hits = es_data.get('hits', {}).get('hits', [])
         
         if not hits:
@@ -345,78 +1553,56 @@ def semantic_search():
                 "search_mode": "ai_semantic"
             })
         
-        # Prepare context for OpenAI
-        review_context = []
-        for hit in hits:
-            source = hit['_source']
-            review_context.append({
-                "title": source.get('title', ''),
-                "review": source.get('review_text', ''),
-                "stars": source.get('stars', 0),
-                "product": source.get('product', ''),
-                "username": source.get('username', '')
-            })
+        # Same normalized query + same ordered top hits => same summary
+        summary_key = make_key("semantic_summary", normalize_query(search_text), [hit['_id'] for hit in hits])
+        ai_summary = semantic_cache.get(summary_key)
+        summary_cached = ai_summary is not None
         
-        # Generate OpenAI summary
-        try:
-            # Create context string for OpenAI
-            context_text = ""
-            for i, review in enumerate(review_context, 1):
-                context_text += f"Review {i}:\n"
-                context_text += f"Title: {review['title']}\n"
-                context_text += f"Rating: {review['stars']}/5 stars\n"
-                context_text += f"Product: {review['product']}\n"
-                context_text += f"Review: {review['review']}\n"
-                context_text += f"By: {review['username']}\n\n"
-            
-            # OpenAI API call
-            openai_response = openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are an expert assistant that analyzes product reviews. Based on the provided reviews, create a comprehensive summary that addresses the user's search query. Focus on the most relevant insights, common themes, pros/cons, and specific details mentioned in the reviews. Be concise but thorough."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"User search query: '{search_text}'\n\nRelevant reviews:\n{context_text}\n\nPlease provide a detailed summary addressing the search query based on these reviews. Include specific insights, common themes, and any notable patterns you observe."
-                    }
-                ],
-                max_tokens=500,
-                temperature=0.7
-            )
-            
-            ai_summary = openai_response.choices[0].message.content.strip()
-            
-        except Exception as openai_error:
-            print(f"  OpenAI Error: {str(openai_error)}")
-            ai_summary = f"Error generating AI summary: {str(openai_error)}"
+        with timed_stage("prompt_build"):
+            messages, context_report = build_semantic_messages(search_text, hits)
         
-        # Return results
-        result = {
+        base_result = {
             "status": "success",
             "query": search_text,
-            "summary": ai_summary,
             "total_results": len(hits),
             "search_score": hits[0].get('_score', 0) if hits else 0,
-            "search_mode": "ai_semantic"
+            "search_mode": "ai_semantic",
+            "elser_expansion": expansion,
+            "context": context_report
         }
         
-        print(f"  Generated AI summary for '{search_text}' using {len(hits)} reviews")
-        return jsonify(result)
+        if stream:
+            log_info(f"Streaming AI summary for '{search_text}' using {len(hits)} reviews")
+            return sse_response(stream_semantic_summary(base_result, hits, messages, summary_key, ai_summary))
+        
+        if not summary_cached:
+            try:
+                with timed_stage("llm"):
+                    ai_summary = llm_flight.do(summary_key, generate_semantic_summary, messages)
+                semantic_cache.set(summary_key, ai_summary)
+                
+            except Exception as openai_error:
+                log_error(f"OpenAI Error: {str(openai_error)}")
+                ai_summary = f"Error generating AI summary: {str(openai_error)}"
+        
+        # Return results
+        result = dict(base_result, summary=ai_summary, summary_cached=summary_cached)
+        
+        log_info(f"{'Served cached' if summary_cached else 'Generated'} AI summary for '{search_text}' using {len(hits)} reviews")
+        return json_response(result)
             
     except requests.exceptions.RequestException as e:
-        print(f"  Network Error: {str(e)}")
+        log_error(f"Network Error: {str(e)}")
         return jsonify({
             "status": "error",
             "message": f"Network error: {str(e)}"
         }), 500
     except Exception as e:
-        print(f"  Server Error: {str(e)}")
+        log_error(f"Server Error: {str(e)}")
         return jsonify({
             "status": "error",
             "message": f"Server error: {str(e)}"
-        }), 500
+        }), upstream_error_status(e)
 
 @app.route('/agentic-summary', methods=['POST'])
 def agentic_summary():
@@ -427,46 +1613,146 @@ def agentic_summary():
         
         # Get username from request, default to Student2025 if not provided
         username = data.get('username', DEFAULT_USER)
+        stream = bool(data.get('stream', False))
+        mode = data.get('mode', 'direct')
         
-        log_request('/agentic-summary', 'POST', {"username": username})
-        
-        # Get user profile
-        user_profile = get_user_profile(username)
-        print(f"  Fetched profile for user: {username}")
+        if mode not in AGENTIC_MODES:
+            return jsonify({
+                "status": "error",
+                "message": f"Unknown mode '{mode}', expected one of: {', '.join(AGENTIC_MODES)}"
+            }), 400
         
-        # Get ALL reviews from Elasticsearch
-        es_query = {
-            "query": {
-                "match_all": {}
-            },
-            "size": 100,  # Get more reviews for comprehensive analysis
-            "_source": ["date", "username", "title", "review_text", "stars", "product"]
-        }
+        log_request('/agentic-summary', 'POST', {"username": username, "mode": mode})
         
-        # Search Elasticsearch
-        response = requests.post(
-            f"{ES_URL}/review_index/_search",
-            headers={
-                "Authorization": f"ApiKey {ES_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json=es_query,
-            timeout=30
-        )
+        # Profile lookup and review retrieval are independent - run them
+        # concurrently so the ES part costs max() of the two, not the sum
+        stage_timings = g.stage_timings
+        es_start = time.time()
+        # ES lookups may use ES_STAGE_SHARE of the deadline, the rest is left for OpenAI
+        with deadline_scope(stage_deadline(ES_STAGE_SHARE)):
+            profile_future = upstream_executor.submit(
+                run_timed, stage_timings, "profile_fetch_ms",
+                es_flight.do, ("user_profile", username), get_user_profile, username
+            )
+            reviews_future = None
+            stats_future = None
+            if mode in ("direct", "fast"):
+                reviews_future = upstream_executor.submit(
+                    run_timed, stage_timings, "reviews_fetch_ms",
+                    es_flight.do, ("agentic_reviews",), es.search, "review_index", AGENTIC_REVIEWS_QUERY
+                )
+            if mode == "direct":
+                stats_future = upstream_executor.submit(
+                    run_timed, stage_timings, "review_stats_ms", review_stats_prompt
+                )
+            materialized = None
+            if mode == "materialized":
+                # The precomputed summary's version replaces the corpus version:
+                # answers only change when the materializer updates the document
+                product = data.get('product', DEFAULT_PRODUCT)
+                materialized_future = upstream_executor.submit(
+                    run_timed, stage_timings, "materialized_fetch_ms",
+                    es_flight.do, ("materialized", product), materializer.get_summary, product
+                )
+                user_profile = profile_future.result()
+                materialized = materialized_future.result()
+                if not materialized:
+                    return jsonify({
+                        "status": "error",
+                        "message": f"No materialized summary for '{product}' yet - run materializer.py or use another mode"
+                    }), 404
+                content_version = materialized["version"]
+            elif mode == "fast":
+                # Computed in milliseconds on every request, nothing worth caching
+                user_profile = profile_future.result()
+                content_version = None
+            else:
+                version_future = upstream_executor.submit(
+                    run_timed, stage_timings, "corpus_version_ms",
+                    es_flight.do, ("corpus_version",), get_corpus_version
+                )
+                user_profile = profile_future.result()
+                content_version = version_future.result()
+        log_info(f"Fetched profile for user: {username}")
         
-        print(f"  ES Response: {response.status_code}")
+        # Serve a cached answer while neither the profile nor the review corpus changed
+        cache_key = None
+        if content_version:
+            cache_key = make_key("agentic_summary", mode, username, fingerprint(user_profile), content_version)
+            cached = agentic_cache.get(cache_key)
+            if cached:
+                processing_time = int((time.time() - start_time) * 1000)
+                stage_timings["total_ms"] = processing_time
+                log_info(f"Served cached Agentic AI summary for {username} in {processing_time}ms")
+                result = dict(
+                    cached,
+                    processing_time=processing_time,
+                    stage_timings=stage_timings,
+                    cached=True
+                )
+                if stream:
+                    return sse_response(stream_cached_agentic_summary(result))
+                return json_response(result)
         
-        if response.status_code != 200:
-            return jsonify({
-                "status": "error",
-                "message": f"Elasticsearch search failed: {response.status_code}",
-                "details": response.text
-            }), response.status_code
+        mapreduce_stats = None
+        context_report = None
+        extractive_report = None
+        # Inputs of the local extractive answer used when OpenAI fails or is too slow
+        hits = None
+        points = materialized
+        if mode == "materialized":
+            # Only the small personalization call runs on the request path
+            total_reviews = materialized.get("reviews_analyzed", 0)
+            with timed_stage("prompt_build"):
+                messages = mapreduce_summarizer.final_messages(username, user_profile, materialized, total_reviews)
+        elif mode == "mapreduce":
+            # Stream every review through the map-reduce pipeline (or take its
+            # cached result), then make one final call on the merged pros/cons
+            merged, mapreduce_stats = run_timed(stage_timings, "mapreduce_ms", mapreduce_points, content_version)
+            total_reviews = mapreduce_stats["reviews"]
+            points = merged
+            with timed_stage("prompt_build"):
+                messages = mapreduce_summarizer.final_messages(username, user_profile, merged, total_reviews)
+            log_info(f"Map-reduced {total_reviews} reviews in {mapreduce_stats['chunks']} chunks")
+        else:
+            response = reviews_future.result()
+            stage_timings["elasticsearch_ms"] = int((time.time() - es_start) * 1000)
             
-        es_data = response.json()
-        hits = es_data.get('hits', {}).get('hits', [])
+            log_info(f"ES Response: {response.status_code}")
+            
+            if response.status_code != 200:
+                return jsonify({
+                    "status": "error",
+                    "message": f"Elasticsearch search failed: {response.status_code}",
+                    "details": response.text
+                }), response.status_code
+                
+            es_data = es.parse_json(response)
+            record_es_timing(es_data, "reviews_fetch")
+            hits = es_data.get('hits', {}).get('hits', [])
+            
+            if mode == "fast":
+                # Pros/cons straight from the reviews, no OpenAI call
+                with timed_stage("extractive"):
+                    summary, extractive_report = summarize_reviews(
+                        hits, user_profile, EXTRACTIVE_PRODUCT, EXTRACTIVE_CATEGORY
+                    )
+                total_reviews = extractive_report["reviews"]
+            else:
+                # Fit the reviews into the token budget; long ones keep the
+                # sentences about the user's feature priorities
+                stats_text = stats_future.result()
+                with timed_stage("prompt_build"):
+                    priorities = (user_profile or {}).get('preferences', {}).get('feature_priorities', [])
+                    reviews_text, context_report = build_agentic_context(
+                        hits, stats_text, focus_terms=[p.replace('_', ' ') for p in priorities]
+                    )
+                    total_reviews = context_report["reviews_included"]
+                    messages = build_agentic_messages(
+                        username, user_profile, reviews_text, total_reviews, stats_text=stats_text
+                    )
         
-        if not hits:
+        if not total_reviews:
             return jsonify({
                 "status": "success",
                 "pros": ["No reviews available for analysis"],
@@ -474,182 +1760,578 @@ def agentic_summary():
                 "personalized_recommendation": "Unable to generate recommendation without reviews.",
                 "total_reviews_analyzed": 0,
                 "processing_time": int((time.time() - start_time) * 1000),
+                "stage_timings": stage_timings,
                 "search_mode": "agentic_ai",
                 "username": username
             })
         
-        # Prepare all reviews for OpenAI
-        all_reviews_text = ""
-        for i, hit in enumerate(hits, 1):
-            source = hit['_source']
-            all_reviews_text += f"Review {i}:\n"
-            all_reviews_text += f"Title: {source.get('title', '')}\n"
-            all_reviews_text += f"Rating: {source.get('stars', 0)}/5 stars\n"
-            all_reviews_text += f"Review: {source.get('review_text', '')}\n\n"
-        
-        # Prepare user profile context
-        user_context = ""
-        if user_profile:
-            # Calculate average past purchase price
-            past_purchases = user_profile.get('past_purchases', [])
-            avg_price = sum([p.get('price', 0) for p in past_purchases]) / len(past_purchases) if past_purchases else 0
-            
-            user_context = f"""
-User Profile:
-- Username: {user_profile.get('username')}
-- Occupation: {user_profile.get('occupation')}
-- Annual Income: ${user_profile.get('annual_income', 0):,}
-- Credit Limit: ${user_profile.get('credit_limit', 0):,}
-- Past Purchases Average Price: ${avg_price:,.2f}
-- Their Own Review: "{user_profile.get('past_reviews', [{}])[0].get('review_text', '')}"
-- Price Sensitivity: {user_profile.get('preferences', {}).get('price_sensitivity', 'unknown')}
-- Feature Priorities: {', '.join(user_profile.get('preferences', {}).get('feature_priorities', []))}
-"""
+        # Fields shared by every response variant
+        base_result = {
+            "status": "success",
+            "total_reviews_analyzed": total_reviews,
+            "search_mode": "agentic_ai",
+            "mode": mode,
+            "user_profile_loaded": user_profile is not None,
+            "username": username
+        }
+        if mapreduce_stats:
+            base_result["mapreduce"] = mapreduce_stats
+        if context_report:
+            base_result["context"] = context_report
+        if extractive_report:
+            base_result["extractive"] = extractive_report
+        if materialized:
+            base_result["materialized"] = {
+                "product": materialized.get("product"),
+                "updated_at": materialized.get("updated_at"),
+                "pros": materialized.get("pros", []),
+                "cons": materialized.get("cons", [])
+            }
         
-        # Generate OpenAI pros/cons analysis with personalized recommendation
-        try:
-            # Different prompts based on user profile
-            if username == 'TechUser92':
-                system_prompt = """You are an expert product analyst and personal shopping advisor. Analyze all the provided reviews and user profile to:
-1. Extract EXACTLY 3 main pros and EXACTLY 3 main cons about the Apple Watch Series 10
-2. Provide a personalized recommendation based on the user's financial situation and needs
-
-Your response must be in this exact JSON format:
-{
-    "pros": [
-        "First pro point - be specific and mention the feature",
-        "Second pro point - be specific and mention the feature",
-        "Third pro point - be specific and mention the feature"
-    ],
-    "cons": [
-        "First con point - be specific and mention the issue",
-        "Second con point - be specific and mention the issue",
-        "Third con point - be specific and mention the issue"
-    ],
-    "personalized_recommendation": "A detailed recommendation (80-120 words) that acknowledges their tech enthusiasm and disposable income, recommending the highest-end model with all premium features and accessories, explaining why the investment is worth it for their lifestyle and career"
-}
-
-Rules:
-1. Each pro/con should be a complete sentence (15-25 words)
-2. Focus on the most frequently mentioned positives and negatives
-3. The personalized recommendation MUST consider the user's high income and low price sensitivity
-4. Recommend the most premium options available with all accessories
-5. Emphasize cutting-edge features and ecosystem benefits"""
-            else:
-                # Default prompt for Student2025
-                system_prompt = """You are an expert product analyst and personal shopping advisor. Analyze all the provided reviews and user profile to:
-1. Extract EXACTLY 3 main pros and EXACTLY 3 main cons about the Apple Watch Series 10
-2. Provide a personalized recommendation based on the user's financial situation and needs
-
-Your response must be in this exact JSON format:
-{
-    "pros": [
-        "First pro point - be specific and mention the feature",
-        "Second pro point - be specific and mention the feature",
-        "Third pro point - be specific and mention the feature"
-    ],
-    "cons": [
-        "First con point - be specific and mention the issue",
-        "Second con point - be specific and mention the issue",
-        "Third con point - be specific and mention the issue"
-    ],
-    "personalized_recommendation": "A detailed recommendation (80-120 words) that acknowledges the product quality but recommends a more budget-friendly alternative like the Xiaomi Mi Band 7, Amazfit Band 7, or Fitbit Inspire 3, explaining why it's better for their budget and still meets their core needs"
-}
-
-Rules:
-1. Each pro/con should be a complete sentence (15-25 words)
-2. Focus on the most frequently mentioned positives and negatives
-3. The personalized recommendation MUST consider the user's limited budget and recommend a cheaper alternative
-4. Be empathetic but direct about the financial reality for a college student
-5. Suggest specific alternative products with much lower total cost of ownership"""
-            
-            openai_response = openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": system_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": f"{user_context}\n\nAnalyze these {len(hits)} Apple Watch Series 10 reviews and provide pros, cons, and a personalized recommendation:\n\n{all_reviews_text}"
-                    }
-                ],
-                max_tokens=800,
-                temperature=0.3,
-                response_format={"type": "json_object"}
+        def local_fallback():
+            return local_agentic_summary(username, user_profile, hits, points)
+        
+        if mode == "fast":
+            summary = dict(summary, engine="extractive")
+        elif stream:
+            log_info(f"Streaming Personalized Agentic AI summary from {total_reviews} reviews for {username}")
+            return sse_response(
+                stream_agentic_summary(
+                    dict(base_result, engine="openai"), messages, cache_key, stage_timings, start_time, local_fallback
+                )
             )
+        else:
+            # Generate OpenAI pros/cons analysis with personalized recommendation
+            try:
+                # Requests with an identical prompt in flight share one completion;
+                # only genuine LLM answers are cached, never the fallbacks below
+                llm_budget_ms = agentic_llm_budget_ms()
+                summary = run_timed(
+                    stage_timings,
+                    "llm_ms",
+                    generate_agentic_summary_within,
+                    llm_budget_ms,
+                    cache_key or fingerprint(messages),
+                    messages,
+                    cache_key,
+                    dict(base_result, engine="openai")
+                )
+                summary = dict(summary, engine="openai")
             
-            # Parse the JSON response
-            ai_response = json.loads(openai_response.choices[0].message.content.strip())
-            pros = ai_response.get("pros", [])[:3]
-            cons = ai_response.get("cons", [])[:3]
-            personalized_recommendation = ai_response.get("personalized_recommendation", "")
-            
-            # Fallback if parsing fails
-            if not pros or not cons or not personalized_recommendation:
-                raise ValueError("Invalid response format from OpenAI")
-            
-        except Exception as openai_error:
-            print(f"  OpenAI Error: {str(openai_error)}")
-            # Fallback pros/cons/recommendation based on user
-            if username == 'TechUser92':
-                pros = [
-                    "Display quality and size improvements make everything more readable",
-                    "S10 chip delivers exceptional performance for demanding apps",
-                    "Advanced health sensors including temperature and blood oxygen monitoring"
-                ]
-                cons = [
-                    "Battery life still requires daily charging with heavy usage",
-                    "Some advanced features require iPhone 15 Pro or newer",
-                    "Titanium edition significantly more expensive than aluminum"
-                ]
-                personalized_recommendation = "For someone with your tech expertise and income, the Apple Watch Series 10 Titanium with Cellular is the perfect choice. The $799 investment delivers cutting-edge health monitoring, seamless ecosystem integration, and premium materials that match your professional image. Add the Milanese Loop ($99) for versatility. The productivity gains alone justify the cost for your $185k salary."
-            else:
-                pros = [
-                    "Display quality and size improvements make everything more readable",
-                    "Health tracking features including heart rate and sleep monitoring",
-                    "Seamless integration with iPhone and Apple ecosystem"
-                ]
-                cons = [
-                    "Battery life concerns with heavy usage and GPS tracking",
-                    "Premium pricing may not justify upgrade from recent models",
-                    "Many features require additional subscriptions adding to cost"
-                ]
-                personalized_recommendation = "While the Apple Watch Series 10 is an excellent device, given your student budget and $500 credit limit, I'd recommend the Xiaomi Mi Band 7 ($50) or Amazfit Band 7 ($50). These alternatives offer essential features you need - step tracking, sleep monitoring, and study timers - without the financial strain. You'll save over $300 and avoid costly subscriptions while still getting reliable fitness tracking for campus life."
+            except FutureTimeoutError:
+                log_error(f"OpenAI missed the {llm_budget_ms}ms budget, answering from the local engine")
+                summary = dict(local_fallback(), engine="extractive", fallback_reason="llm_budget_exceeded")
+            except Exception as openai_error:
+                log_error(f"OpenAI Error: {str(openai_error)}")
+                # Pros/cons extracted locally from the same reviews
+                summary = dict(local_fallback(), engine="extractive", fallback_reason=str(openai_error))
         
         # Calculate processing time
         processing_time = int((time.time() - start_time) * 1000)
+        stage_timings["total_ms"] = processing_time
         
         # Return results
-        result = {
-            "status": "success",
-            "pros": pros,
-            "cons": cons,
-            "personalized_recommendation": personalized_recommendation,
-            "total_reviews_analyzed": len(hits),
-            "processing_time": processing_time,
-            "search_mode": "agentic_ai",
-            "user_profile_loaded": user_profile is not None,
-            "username": username
-        }
+        result = dict(
+            base_result,
+            **summary,
+            processing_time=processing_time,
+            stage_timings=stage_timings,
+            cached=False
+        )
         
-        print(f"  Generated Personalized Agentic AI summary from {len(hits)} reviews for {username} in {processing_time}ms")
-        return jsonify(result)
+        log_info(f"Generated Personalized Agentic AI summary from {total_reviews} reviews for {username} in {processing_time}ms")
+        if stream:
+            return sse_response(stream_cached_agentic_summary(result))
+        return json_response(result)
+            
+    except requests.exceptions.RequestException as e:
+        log_error(f"Network Error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": f"Network error: {str(e)}"
+        }), 500
+    except Exception as e:
+        log_error(f"Server Error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": f"Server error: {str(e)}"
+        }), upstream_error_status(e)
+
+@app.route('/agentic-summary/batch', methods=['POST'])
+def agentic_summary_batch():
+    """Personalized pros/cons for many users, streamed as NDJSON as each one finishes
+
+    Reviews are fetched and rendered once and profiles with one multi-get;
+    the per-user OpenAI calls then run concurrently (at most "concurrency",
+    capped by BATCH_CONCURRENCY). Every prompt starts with the same system
+    prompt and review block, so the provider can serve that prefix from its
+    prompt cache. Answers are cached under their own mode ("batch"): unlike
+    direct mode, the review block is not trimmed to each user's priorities.
+    """
+    try:
+        start_time = time.time()
+        data = request.get_json(silent=True) or {}
+        usernames = list(dict.fromkeys(
+            name for name in data.get('usernames') or [] if isinstance(name, str) and name
+        ))
+        if not usernames:
+            return jsonify({
+                "status": "error",
+                "message": "No usernames provided"
+            }), 400
+        if len(usernames) > BATCH_MAX_USERS:
+            return jsonify({
+                "status": "error",
+                "message": f"At most {BATCH_MAX_USERS} usernames per batch"
+            }), 400
+        try:
+            concurrency = max(1, min(int(data.get('concurrency', BATCH_CONCURRENCY)), BATCH_CONCURRENCY))
+        except (TypeError, ValueError):
+            return jsonify({
+                "status": "error",
+                "message": "concurrency must be an integer"
+            }), 400
+        
+        log_request('/agentic-summary/batch', 'POST', {"users": len(usernames), "concurrency": concurrency})
+        
+        # Shared inputs, fetched once for the whole batch
+        stage_timings = g.stage_timings
+        profiles_future = upstream_executor.submit(
+            run_timed, stage_timings, "profile_fetch_ms", profile_cache.get_many, usernames
+        )
+        reviews_future = upstream_executor.submit(
+            run_timed, stage_timings, "reviews_fetch_ms",
+            es_flight.do, ("agentic_reviews",), es.search, "review_index", AGENTIC_REVIEWS_QUERY
+        )
+        version_future = upstream_executor.submit(
+            run_timed, stage_timings, "corpus_version_ms",
+            es_flight.do, ("corpus_version",), get_corpus_version
+        )
+        stats_future = upstream_executor.submit(run_timed, stage_timings, "review_stats_ms", review_stats_prompt)
+        response = reviews_future.result()
+        if response.status_code != 200:
+            return jsonify({
+                "status": "error",
+                "message": f"Elasticsearch search failed: {response.status_code}",
+                "details": response.text
+            }), response.status_code
+        profiles = profiles_future.result()
+        content_version = version_future.result()
+        
+        es_data = es.parse_json(response)
+        record_es_timing(es_data, "reviews_fetch")
+        hits = es_data.get('hits', {}).get('hits', [])
+        
+        # One statistics + review block for every user (no per-user focus terms), so the prompts share a prefix
+        stats_text = stats_future.result()
+        with timed_stage("prompt_build"):
+            reviews_text, context_report = build_agentic_context(hits, stats_text)
+        total_reviews = context_report["reviews_included"]
+        if not total_reviews:
+            return jsonify({
+                "status": "success",
+                "message": "No reviews available for analysis",
+                "total_reviews_analyzed": 0,
+                "users": len(usernames)
+            })
+        
+        def summarize_user(username):
+            user_start = time.time()
+            user_profile = profiles.get(username)
+            base_result = {
+                "status": "success",
+                "total_reviews_analyzed": total_reviews,
+                "search_mode": "agentic_ai",
+                "mode": "batch",
+                "user_profile_loaded": user_profile is not None,
+                "username": username,
+                "context": context_report
+            }
+            cache_key = None
+            if content_version:
+                cache_key = make_key("agentic_summary", "batch", username, fingerprint(user_profile), content_version)
+                cached = agentic_cache.get(cache_key)
+                if cached:
+                    return dict(cached, cached=True, processing_time=int((time.time() - user_start) * 1000))
+            
+            messages = build_agentic_messages(username, user_profile, reviews_text, total_reviews, stats_text=stats_text)
+            try:
+                summary = llm_flight.do(cache_key or fingerprint(messages), generate_agentic_summary, messages)
+                if cache_key:
+                    agentic_cache.set(cache_key, dict(base_result, **summary))
+                fallback = False
+            except Exception as openai_error:
+                log_error(f"OpenAI Error for {username}: {str(openai_error)}")
+                summary = local_agentic_summary(username, user_profile, hits)
+                fallback = True
+            return dict(
+                base_result,
+                **summary,
+                cached=False,
+                fallback=fallback,
+                processing_time=int((time.time() - user_start) * 1000)
+            )
+        
+        def generate():
+            yield dumps({
+                "type": "meta",
+                "users": len(usernames),
+                "concurrency": concurrency,
+                "total_reviews_analyzed": total_reviews,
+                "context": context_report,
+                "stage_timings": stage_timings
+            }) + "\n"
+            counts = {"succeeded": 0, "cached": 0, "fallback": 0}
+            # Context-copying, so the OpenAI calls queue under this batch's LLM gateway flow
+            pool = ContextThreadPoolExecutor(max_workers=min(concurrency, len(usernames)), thread_name_prefix="batch")
+            try:
+                futures = [pool.submit(summarize_user, username) for username in usernames]
+                for future in as_completed(futures):
+                    result = future.result()
+                    counts["succeeded"] += 1
+                    counts["cached"] += bool(result.get("cached"))
+                    counts["fallback"] += bool(result.get("fallback"))
+                    yield dumps(dict(result, type="user")) + "\n"
+            except Exception as e:
+                # Headers are already sent - report the failure in-band
+                log_error(f"Batch Error after {counts['succeeded']} users: {str(e)}")
+                yield dumps({"type": "error", "status": "error", "message": f"Batch failed: {str(e)}"}) + "\n"
+                return
+            finally:
+                # A disconnected client stops the calls that have not started yet
+                pool.shutdown(wait=False, cancel_futures=True)
+            processing_time = int((time.time() - start_time) * 1000)
+            log_info(f"Generated {counts['succeeded']} batch Agentic AI summaries ({counts['cached']} cached) in {processing_time}ms")
+            yield dumps(dict(counts, type="done", status="success", processing_time=processing_time)) + "\n"
+        
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
             
     except requests.exceptions.RequestException as e:
-        print(f"  Network Error: {str(e)}")
+        log_error(f"Network Error: {str(e)}")
         return jsonify({
             "status": "error",
             "message": f"Network error: {str(e)}"
         }), 500
     except Exception as e:
-        print(f"  Server Error: {str(e)}")
+        log_error(f"Server Error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": f"Server error: {str(e)}"
+        }), upstream_error_status(e)
+
+# Asynchronous agentic summaries: POST /agentic-summary/jobs returns a job id
+# at once and JOB_WORKERS threads per process run the pipeline, so slow LLM
+# calls wait in the queue instead of holding request threads. The queue is a
+# SQLite file shared by the worker processes on a host and kept across restarts.
+JOB_DB_PATH = os.environ.get("JOB_DB_PATH", "jobs.sqlite3")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))  # 0 disables the job workers in this process
+# Jobs run under their own deadline instead of REQUEST_DEADLINE_MS
+JOB_DEADLINE_MS = int(os.environ.get("JOB_DEADLINE_MS", "120000"))
+# Longest ?wait= a status request may block for a result (seconds)
+JOB_MAX_WAIT = float(os.environ.get("JOB_MAX_WAIT", "30"))
+# WSGI environ key marking a request dispatched by a job worker
+JOB_ENVIRON_KEY = "review_search.job_id"
+
+def run_agentic_summary_job(job_id, payload):
+    """Run /agentic-summary for a job through the normal request pipeline (hooks, caches, metrics)"""
+    with app.test_request_context(
+        "/agentic-summary",
+        method="POST",
+        json=dict(payload, stream=False),
+        environ_overrides={JOB_ENVIRON_KEY: job_id}
+    ):
+        response = app.full_dispatch_request()
+        body = response.get_json(silent=True) or {"status": "error", "message": response.get_data(as_text=True)[:500]}
+    return ("succeeded" if response.status_code < 400 else "failed"), dict(body, status_code=response.status_code)
+
+# Opened on first use (or by start_background_workers), so that importing
+# backend - from tests or tools - creates no SQLite files
+_jobs_lock = threading.Lock()
+_job_queue = None
+_job_workers = None
+
+def get_job_queue():
+    """The process's JobQueue on JOB_DB_PATH, opened on first use"""
+    global _job_queue, _job_workers
+    with _jobs_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                JOB_DB_PATH,
+                max_queued=int(os.environ.get("JOB_MAX_QUEUED", "1000")),
+                stale_seconds=int(os.environ.get("JOB_STALE_SECONDS", "60")),
+                retention_seconds=int(os.environ.get("JOB_RETENTION_SECONDS", "86400"))
+            )
+            _job_workers = JobWorkers(_job_queue, {"agentic_summary": run_agentic_summary_job}, workers=JOB_WORKERS)
+    return _job_queue
+
+def get_job_workers():
+    """The JobWorkers of this process (not started until start_background_workers)"""
+    get_job_queue()
+    return _job_workers
+
+metrics.gauge_collector(
+    "review_search_jobs",
+    "Asynchronous jobs by state in the shared queue, and jobs running in this process",
+    ["state"],
+    lambda: [] if _job_queue is None else (
+        [((state,), count) for state, count in _job_queue.stats()["counts"].items()]
+        + [(("running_here",), _job_workers.stats()["running"])]
+    )
+)
+
+def job_response(job):
+    """Public view of a job: state, queue position while queued, result once finished"""
+    view = {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "state": job["status"],
+        "priority": job["priority"],
+        "attempts": job["attempts"],
+        "cancel_requested": job["cancel_requested"],
+        "created_at": datetime.utcfromtimestamp(job["created_at"]).isoformat(),
+        "status_url": f"/jobs/{job['id']}"
+    }
+    if job["status"] == "queued":
+        view["queue_position"] = get_job_queue().position(job["id"])
+    if job["started_at"]:
+        view["queued_ms"] = int((job["started_at"] - job["created_at"]) * 1000)
+    if job["finished_at"] and job["started_at"]:
+        view["run_ms"] = int((job["finished_at"] - job["started_at"]) * 1000)
+    if job["result"] is not None:
+        view["result"] = job["result"]
+    if job["error"]:
+        view["error"] = job["error"]
+    return view
+
+@app.route('/agentic-summary/jobs', methods=['POST'])
+def submit_agentic_summary_job():
+    """Queue an /agentic-summary request and return 202 with its job id
+
+    The body takes the /agentic-summary fields ("username", "mode",
+    "product") plus "priority": "high" | "normal" | "low". Poll
+    GET /jobs/<job_id>, or add ?wait=<seconds> to long-poll for the result.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        priority = data.pop('priority', 'normal')
+        if priority not in PRIORITIES:
+            return jsonify({
+                "status": "error",
+                "message": f"Unknown priority '{priority}', expected one of: {', '.join(PRIORITIES)}"
+            }), 400
+        mode = data.get('mode', 'direct')
+        if mode not in AGENTIC_MODES:
+            return jsonify({
+                "status": "error",
+                "message": f"Unknown mode '{mode}', expected one of: {', '.join(AGENTIC_MODES)}"
+            }), 400
+        data.pop('stream', None)
+        
+        log_request('/agentic-summary/jobs', 'POST', {"username": data.get('username', DEFAULT_USER), "priority": priority})
+        
+        job_queue = get_job_queue()
+        job_id = job_queue.enqueue("agentic_summary", data, priority)
+        response = jsonify(dict(job_response(job_queue.get(job_id)), status="accepted"))
+        response.headers["Location"] = f"/jobs/{job_id}"
+        return response, 202
+        
+    except QueueFull as e:
+        log_error(f"Job queue full: {str(e)}")
+        response = jsonify({
+            "status": "error",
+            "message": f"Too many queued jobs, try again later ({str(e)})"
+        })
+        response.headers["Retry-After"] = "30"
+        return response, 429
+    except Exception as e:
+        log_error(f"Server Error: {str(e)}")
         return jsonify({
             "status": "error",
             "message": f"Server error: {str(e)}"
         }), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job state and, once finished, its result; ?wait=<seconds> blocks until then (up to JOB_MAX_WAIT)"""
+    try:
+        wait = max(0.0, min(float(request.args.get('wait', 0)), JOB_MAX_WAIT))
+    except ValueError:
+        return jsonify({
+            "status": "error",
+            "message": "wait must be a number of seconds"
+        }), 400
+    # Long-polling only holds this request thread; the job itself runs on a job worker
+    job_queue = get_job_queue()
+    job = job_queue.wait(job_id, wait) if wait else job_queue.get(job_id)
+    if job is None:
+        return jsonify({
+            "status": "error",
+            "message": f"No job '{job_id}'"
+        }), 404
+    return jsonify(dict(job_response(job), status="success"))
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a job: a queued job never runs, a running job's result is discarded"""
+    job = get_job_queue().cancel(job_id)
+    if job is None:
+        return jsonify({
+            "status": "error",
+            "message": f"No job '{job_id}'"
+        }), 404
+    log_info(f"Job {job_id} cancel requested ({job['status']})")
+    return jsonify(dict(job_response(job), status="success"))
+
+@app.route('/jobs', methods=['GET'])
+def job_stats():
+    """Queue depth by state and this process's job workers"""
+    return jsonify({
+        "status": "success",
+        "queue": get_job_queue().stats(),
+        "workers": get_job_workers().stats()
+    })
+
+# Warm-up before serving: how many pooled ES connections to open up front
+WARMUP_ES_CONNECTIONS = int(os.environ.get("WARMUP_ES_CONNECTIONS", "4"))
+
+# Startup timings of this process, reported by GET /startup-status and /metrics
+startup_lock = threading.Lock()
+ready_monotonic = None
+startup = {
+    "pid": os.getpid(),
+    "import_seconds": None,
+    "warm_up": None,
+    "warm_up_seconds": None,
+    "cold_start_seconds": None,
+    "ready_at": None,
+    "first_request": None
+}
+metrics.gauge_collector(
+    "review_search_startup_seconds",
+    "Process cold start: module import, each warm-up stage, total until ready, and the first request",
+    ["phase"],
+    lambda: [
+        ((phase,), value)
+        for phase, value in [
+            ("import", startup["import_seconds"]),
+            ("cold_start", startup["cold_start_seconds"]),
+            ("first_request", (startup["first_request"] or {}).get("seconds"))
+        ] + [
+            (f"warm_up_{stage}", result["ms"] / 1000) for stage, result in (startup["warm_up"] or {}).items()
+        ]
+        if value is not None
+    ]
+)
+
+def record_first_request(endpoint, status, duration):
+    with startup_lock:
+        if startup["first_request"] is not None:
+            return
+        ready_at = ready_monotonic
+        startup["first_request"] = {
+            "endpoint": endpoint,
+            "status": status,
+            "seconds": round(duration, 4),
+            "seconds_after_ready": round(time.monotonic() - ready_at, 3) if ready_at else None
+        }
+    log_info("first request", **startup["first_request"])
+
+def warm_es_connections():
+    """Open up to WARMUP_ES_CONNECTIONS keep-alive connections with concurrent health checks"""
+    count = max(min(WARMUP_ES_CONNECTIONS, es.pool_size), 1)
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        for response in pool.map(lambda _: es.get("_cluster/health", op="health"), range(count)):
+            response.raise_for_status()
+    return {"connections": es.pool_stats()["misses"]}
+
+def warm_elser():
+    """One semantic query, so the ELSER deployment behind review_text.semantic is loaded"""
+    response = es.search("review_index", {
+        "size": 1,
+        "_source": False,
+        "query": {
+            "semantic": {
+                "field": "review_text.semantic",
+                "query": "battery life"
+            }
+        }
+    })
+    response.raise_for_status()
+    return {"took_ms": es.parse_json(response).get("took")}
+
+def warm_openai():
+    """List models: authenticates and opens the client's connection without spending tokens"""
+    models = openai_client.models.list(timeout=min(OPENAI_TIMEOUT, 10))
+    return {"models": len(models.data)}
+
+WARM_UP_STAGES = {
+    "es_connections": warm_es_connections,
+    "elser": warm_elser,
+    "openai": warm_openai
+}
+
+def warm_up():
+    """Run the warm-up stages concurrently; failures are reported, not raised"""
+    def run(stage):
+        stage_start = time.perf_counter()
+        try:
+            result = dict(WARM_UP_STAGES[stage]() or {}, ok=True)
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        result["ms"] = round((time.perf_counter() - stage_start) * 1000, 1)
+        return stage, result
+
+    with ThreadPoolExecutor(max_workers=len(WARM_UP_STAGES)) as pool:
+        results = dict(pool.map(run, WARM_UP_STAGES))
+    for stage, result in results.items():
+        if result["ok"]:
+            log_info("warm-up stage done", stage=stage, ms=result["ms"])
+        else:
+            _log(logging.WARNING, "warm-up stage failed", {"stage": stage, "ms": result["ms"], "error": result["error"]})
+    return results
+
+def start_background_workers():
+    """Start the materializer, review replica and job worker threads enabled by the environment"""
+    if os.environ.get("MATERIALIZER_ENABLED") == "1":
+        materializer.start()
+    if REPLICA_ENABLED:
+        review_replica.start()
+    get_job_queue()
+    if JOB_WORKERS > 0:
+        get_job_workers().start()
+
+MODULE_LOADED = time.time()
+
+def create_app(started_at=None, warm=None):
+    """Return the app ready to serve: warmed up, with background workers running.
+
+    Call once in every worker process (after any fork, as it starts threads).
+    started_at is when the process started, for the cold-start figure;
+    warm defaults to WARMUP != "0".
+    """
+    global ready_monotonic
+    started_at = started_at or MODULE_LOAD_STARTED
+    if warm is None:
+        warm = os.environ.get("WARMUP", "1") != "0"
+    startup["pid"] = os.getpid()
+    startup["import_seconds"] = round(MODULE_LOADED - started_at, 3)
+    if warm:
+        warm_start = time.time()
+        startup["warm_up"] = warm_up()
+        startup["warm_up_seconds"] = round(time.time() - warm_start, 3)
+    start_background_workers()
+    startup["cold_start_seconds"] = round(time.time() - started_at, 3)
+    startup["ready_at"] = datetime.utcnow().isoformat()
+    ready_monotonic = time.monotonic()
+    log_info(
+        "worker ready",
+        pid=startup["pid"],
+        cold_start_seconds=startup["cold_start_seconds"],
+        import_seconds=startup["import_seconds"],
+        warm_up_seconds=startup["warm_up_seconds"] or 0
+    )
+    return app
+
 if __name__ == '__main__':
     print("🚀 Starting Multi-Search Experience Backend...")
     print(f"📡 Elasticsearch: {ES_URL}")
@@ -664,10 +2346,30 @@ if __name__ == '__main__':
     print("\n📡 API Endpoints:")
     print("  GET  /                 - Health check & mode info")
     print("  GET  /cluster-health   - Test Elasticsearch connection")
+    print("  GET  /cache-stats      - Summary cache hit rates")
+    print("  GET  /metrics          - Prometheus latency metrics")
+    print("  GET  /upstream-status  - Circuit breakers, deadlines and LLM gateway")
+    print("  GET  /startup-status   - Cold start and warm-up timings")
+    print("  GET  /materializer-status - Materialized pros/cons progress")
+    print("  GET  /replica-status   - Local review replica size and sync lag")
+    print("  GET  /review-stats     - Rating and volume analytics (aggregation rollup)")
     print("  POST /search-reviews   - Browse all reviews (date sorted)")
+    print("  GET  /search-reviews/export - Stream all reviews as NDJSON")
     print("  POST /keyword-search   - Multi-match keyword search")
+    print("  POST /hybrid-search    - Keyword + semantic search (RRF)")
     print("  POST /semantic-search  - AI semantic search + summary")
     print("  POST /agentic-summary  - Personalized pros/cons + recommendations")
+    print("  POST /agentic-summary/batch - Recommendations for many users (NDJSON)")
+    print("  POST /agentic-summary/jobs - Queue an agentic summary (async job)")
+    print("  GET  /jobs/<job_id>    - Job state and result (?wait= to long-poll)")
+    print("  DELETE /jobs/<job_id>  - Cancel a job")
+    print("  GET  /jobs             - Job queue depth and workers")
     print("\n" + "="*60)
     
+    print("Development server - use serve.py under load")
+    
+    # With the debug reloader only the serving child process runs the background workers
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_workers()
+    
     app.run(debug=True, host='0.0.0.0', port=8001)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Load test / benchmark for the four search modes.
+
+By default the backend runs in-process against the local stand-ins from
+fake_services.py, so no Elastic Cloud cluster or OpenAI key is needed:
+
+    python3 bench.py --concurrency 16 --duration 20 --llm-latency 800 --llm-error-rate 0.02
+
+Use --target to drive an already running backend (with whatever ES/OpenAI it
+is configured for) instead:
+
+    python3 bench.py --target http://localhost:8001 --modes keyword,semantic
+
+Each mode is run on its own for --duration seconds (or --requests requests)
+with --concurrency workers. The report is JSON (stdout, or --output FILE)
+with throughput, p50/p95/p99 latency and error rate per mode, so runs can be
+compared by a script. Fake services and backend share this process's GIL -
+use --target with separately started services for absolute numbers.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+MODES = ("browse", "keyword", "semantic", "agentic")
+
+KEYWORD_QUERIES = ["battery", "display", "health tracking", "price", "strap", "sleep", "gps", "titanium"]
+SEMANTIC_QUERIES = [
+    "battery life issues",
+    "is the screen easy to read outdoors",
+    "accurate heart rate and sleep tracking",
+    "worth upgrading from an older model",
+    "comfortable for all day wear"
+]
+USERNAMES = ["Student2025", "TechUser92"]
+
+
+def build_request(mode, cache_bust=False):
+    """(path, json body) for one request of a mode"""
+    suffix = f" {uuid.uuid4().hex[:6]}" if cache_bust else ""
+    if mode == "browse":
+        return "/search-reviews", {}
+    if mode == "keyword":
+        return "/keyword-search", {"query": random.choice(KEYWORD_QUERIES) + suffix}
+    if mode == "semantic":
+        return "/semantic-search", {"text": random.choice(SEMANTIC_QUERIES) + suffix}
+    if mode == "agentic":
+        body = {"username": random.choice(USERNAMES)}
+        if cache_bust:
+            # Unknown users get the default prompt but their own cache entry
+            body["username"] += suffix.strip()
+        return "/agentic-summary", body
+    raise ValueError(f"Unknown mode '{mode}'")
+
+
+def check_body(mode, body):
+    """What is wrong with a 200 response body of `mode`, or None if it has the expected shape"""
+    if not isinstance(body, dict) or body.get("status") != "success":
+        return "status is not success"
+    if mode in ("browse", "keyword"):
+        reviews = body.get("reviews")
+        if not isinstance(reviews, list) or not isinstance(body.get("total"), int):
+            return "no reviews list or total"
+        if any(not review.get("id") or not review.get("title") for review in reviews):
+            return "review without id or title"
+        if mode == "keyword" and body.get("total") and not reviews:
+            return "matches counted but no reviews returned"
+    elif mode == "semantic":
+        if not isinstance(body.get("summary"), str) or not body["summary"].strip():
+            return "empty summary"
+    elif mode == "agentic":
+        for field in ("pros", "cons"):
+            points = body.get(field)
+            if not isinstance(points, list) or not points or not all(isinstance(p, str) and p for p in points):
+                return f"no {field}"
+        if not isinstance(body.get("personalized_recommendation"), str) or not body["personalized_recommendation"]:
+            return "no personalized_recommendation"
+    return None
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(samples, elapsed):
+    """Aggregate (latency_s, status) samples into the per-mode report"""
+    latencies = sorted(latency * 1000 for latency, _ in samples)
+    statuses = {}
+    errors = 0
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        if status in ("exception", "invalid") or status >= 400:
+            errors += 1
+    count = len(samples)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "elapsed_s": round(elapsed, 3),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2) if latencies else None,
+            "p95": round(percentile(latencies, 95), 2) if latencies else None,
+            "p99": round(percentile(latencies, 99), 2) if latencies else None,
+            "mean": round(sum(latencies) / count, 2) if count else None,
+            "max": round(latencies[-1], 2) if latencies else None
+        },
+        "status_codes": statuses
+    }
+
+
+def run_mode(base_url, mode, concurrency, duration=None, total_requests=None, cache_bust=False, timeout=120):
+    """Drive one mode with `concurrency` workers; returns its report"""
+    samples = []
+    lock = threading.Lock()
+    issued = [0]
+    deadline = time.time() + duration if duration else None
+
+    def next_allowed():
+        with lock:
+            if total_requests is not None and issued[0] >= total_requests:
+                return False
+            if deadline is not None and time.time() >= deadline:
+                return False
+            issued[0] += 1
+            return True
+
+    def worker():
+        session = requests.Session()
+        while next_allowed():
+            path, body = build_request(mode, cache_bust)
+            start = time.perf_counter()
+            try:
+                response = session.post(base_url + path, json=body, timeout=timeout)
+                status = response.status_code
+                # A 200 with the wrong body counts as an error too
+                if status == 200 and check_body(mode, response.json()):
+                    status = "invalid"
+            except (requests.exceptions.RequestException, ValueError):
+                status = "exception"
+            with lock:
+                samples.append((time.perf_counter() - start, status))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return summarize(samples, time.perf_counter() - start)
+
+
+def start_local_stack(args):
+    """Start the fake services and the backend in-process; returns (base_url, fakes)"""
+    from werkzeug.serving import make_server
+
+    from fake_services import FakeElasticsearch, FakeOpenAI, serve
+
+    fake_es = FakeElasticsearch(args.seed_file, latency_ms=args.es_latency, jitter_ms=args.es_jitter,
+                                error_rate=args.es_error_rate)
+    fake_openai = FakeOpenAI(latency_ms=args.llm_latency, jitter_ms=args.llm_jitter,
+                             error_rate=args.llm_error_rate)
+    es_server = serve(fake_es)
+    openai_server = serve(fake_openai)
+
+    # backend reads its configuration at import time
+    os.environ["ES_URL"] = f"http://127.0.0.1:{es_server.server_port}"
+    os.environ["ES_API_KEY"] = "bench"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{openai_server.server_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ.setdefault("LOG_SAMPLE_RATE", "0")
+    # The stand-in has no rate limits; export OPENAI_RPM / OPENAI_TPM to bench the LLM gateway
+    os.environ.setdefault("OPENAI_RPM", "0")
+    os.environ.setdefault("OPENAI_TPM", "0")
+    import backend
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="backend", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", {"elasticsearch": fake_es, "openai": fake_openai}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the search modes")
+    parser.add_argument("--target", help="URL of a running backend (default: in-process backend + fakes)")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"comma separated subset of {','.join(MODES)}")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per mode")
+    parser.add_argument("--requests", type=int, help="requests per mode (overrides --duration)")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed requests per mode before measuring")
+    parser.add_argument("--cache-bust", action="store_true", help="make every query unique to defeat caches")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per request timeout in seconds")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--seed-file", default="Elastic build.txt")
+    parser.add_argument("--es-latency", type=float, default=20.0, help="fake ES ms per request")
+    parser.add_argument("--es-jitter", type=float, default=10.0)
+    parser.add_argument("--es-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=800.0, help="fake OpenAI ms per completion")
+    parser.add_argument("--llm-jitter", type=float, default=400.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(unknown)}")
+
+    fakes = {}
+    base_url = args.target.rstrip("/") if args.target else None
+    if base_url is None:
+        base_url, fakes = start_local_stack(args)
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "target": args.target or "in-process",
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "target")},
+        "modes": {}
+    }
+    for mode in modes:
+        if args.warmup:
+            run_mode(base_url, mode, 1, total_requests=args.warmup, cache_bust=args.cache_bust, timeout=args.timeout)
+        report["modes"][mode] = run_mode(
+            base_url,
+            mode,
+            args.concurrency,
+            duration=None if args.requests else args.duration,
+            total_requests=args.requests,
+            cache_bust=args.cache_bust,
+            timeout=args.timeout
+        )
+    if fakes:
+        report["fakes"] = {name: dict(fake.injector.stats) for name, fake in fakes.items()}
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Token-budgeted review context for LLM prompts.
+
+Prompt size (and with it LLM latency and cost) used to grow with every
+review returned by Elasticsearch. ContextBuilder instead:
+
+1. ranks reviews by search score, then helpful votes, then recency
+2. drops near-duplicates of reviews already selected (word shingle overlap)
+3. trims long review_text to its most relevant sentences
+4. adds rendered reviews until the token budget is used up
+
+Tokens are counted locally with tiktoken (a requirement). If it is missing
+or cannot load its encoding - it downloads the BPE file on first use unless
+TIKTOKEN_CACHE_DIR has it - a word/punctuation approximation is used instead;
+every build reports tokens used against tokens available and which counter
+("tokenizer") produced them.
+"""
+
+import re
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+from observability import ComponentLogger
+
+log = ComponentLogger("context_builder")
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+WORD = re.compile(r"\w+")
+TOKEN_PIECE = re.compile(r"\w+|[^\w\s]")
+
+
+def get_token_counter(model="gpt-3.5-turbo"):
+    """Return (count_tokens, tokenizer_name) for a model, preferring tiktoken"""
+    if tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+            return (lambda text: len(encoding.encode(text))), encoding.name
+        except Exception as e:
+            log.warning("tiktoken unavailable, approximating token counts", model=model, error=str(e))
+    else:
+        log.warning("tiktoken is not installed, approximating token counts", model=model)
+
+    def approximate(text):
+        # ~1 token per short word or punctuation mark, long words split in pieces
+        return sum(1 + len(piece) // 8 for piece in TOKEN_PIECE.findall(text))
+
+    return approximate, "approximate"
+
+
+def _words(text):
+    return WORD.findall(text.lower())
+
+
+def _shingles(text, size=3):
+    words = _words(text)
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _rank_key(hit):
+    source = hit.get('_source', {})
+    return (hit.get('_score') or 0, source.get('helpful_votes') or 0, source.get('date') or "")
+
+
+class ContextBuilder:
+    """Fills a token budget with the best-ranked, de-duplicated, trimmed reviews"""
+
+    def __init__(self, render, budget_tokens, model="gpt-3.5-turbo", max_review_tokens=200,
+                 duplicate_threshold=0.8):
+        # render(number, source) -> text of one review in the prompt
+        self.render = render
+        self.budget_tokens = budget_tokens
+        self.max_review_tokens = max_review_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.count_tokens, self.tokenizer = get_token_counter(model)
+
+    def trim(self, text, focus_terms=None):
+        """Shorten text to max_review_tokens, keeping the sentences that share most words with focus_terms.
+
+        Without focus terms the leading sentences are kept. Kept sentences
+        stay in their original order.
+        """
+        if self.count_tokens(text) <= self.max_review_tokens:
+            return text
+        sentences = [s for s in SENTENCE_SPLIT.split(text.strip()) if s]
+        focus = set(_words(" ".join(focus_terms or [])))
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda i: (-len(focus.intersection(_words(sentences[i]))), i)
+        )
+
+        keep = []
+        used = 0
+        for i in ranked:
+            tokens = self.count_tokens(sentences[i])
+            if used + tokens > self.max_review_tokens:
+                continue
+            keep.append(i)
+            used += tokens
+        if not keep:
+            # A single sentence longer than the limit - cut it on a word boundary
+            words = sentences[ranked[0]].split()
+            while words and self.count_tokens(" ".join(words)) > self.max_review_tokens:
+                words = words[:int(len(words) * 0.8)]
+            return " ".join(words) + "..."
+        return " ".join(sentences[i] for i in sorted(keep))
+
+    def build(self, hits, focus_terms=None):
+        """Render hits into one context string within the budget.
+
+        Returns (text, included_hits, report); included hits are in prompt order.
+        """
+        parts = []
+        included = []
+        kept_shingles = []
+        used = 0
+        report = {
+            "tokens_used": 0,
+            "tokens_available": self.budget_tokens,
+            "tokenizer": self.tokenizer,
+            "reviews_considered": len(hits),
+            "reviews_included": 0,
+            "duplicates_dropped": 0,
+            "reviews_trimmed": 0,
+            "over_budget_dropped": 0
+        }
+
+        for hit in sorted(hits, key=_rank_key, reverse=True):
+            source = hit.get('_source', {})
+            review_text = source.get('review_text', '') or ''
+
+            shingles = _shingles(f"{source.get('title', '')} {review_text}")
+            if shingles and any(
+                len(shingles & other) / len(shingles | other) >= self.duplicate_threshold
+                for other in kept_shingles
+            ):
+                report["duplicates_dropped"] += 1
+                continue
+
+            trimmed = self.trim(review_text, focus_terms)
+            if trimmed != review_text:
+                source = dict(source, review_text=trimmed)
+
+            text = self.render(len(included) + 1, source)
+            tokens = self.count_tokens(text)
+            if used + tokens > self.budget_tokens:
+                report["over_budget_dropped"] += 1
+                continue
+
+            parts.append(text)
+            included.append(hit)
+            kept_shingles.append(shingles)
+            used += tokens
+            if trimmed != review_text:
+                report["reviews_trimmed"] += 1
+
+        report["tokens_used"] = used
+        report["reviews_included"] = len(included)
+        return "".join(parts), included, report
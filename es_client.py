@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Shared Elasticsearch client for the search backend.
+
+Every endpoint goes through one ESClient instance so that the auth headers are
+built once and TCP+TLS connections to the cluster are kept alive and reused
+from a bounded pool instead of being opened per request.
+
+Timeouts are capped by the current request deadline (see resilience.py).
+Reads are retried on connection errors and 429/502/503/504 with jittered
+backoff, can be hedged (a second identical request after hedge_after
+seconds, first answer wins), and every call goes through an optional
+circuit breaker - hedge copies included. Writes, bulk requests and opening
+a point-in-time are never retried or hedged.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from fastjson import loads
+from resilience import (
+    CircuitOpenError,
+    DeadlineExceeded,
+    current_deadline,
+    deadline_error,
+    deadline_timeout,
+    sleep_before_retry
+)
+
+# Per-operation timeouts in seconds (overridable per client)
+DEFAULT_TIMEOUTS = {
+    "health": 10,   # _cluster/health
+    "get": 10,      # single document lookups (user_profile/_doc/...)
+    "search": 30,   # _search requests
+    "write": 30,    # single document writes
+    "bulk": 120,    # _bulk batches (semantic_text inference runs inside the request)
+    "inference": 30,  # _inference calls (ELSER query expansion)
+    "pit": 10,      # opening a point-in-time
+}
+
+# Operations that create or change server state: sent once, never retried or hedged
+NON_IDEMPOTENT_OPS = ("write", "bulk", "pit")
+
+# Response fields the backend reads from a search; everything else (_shards,
+# _index, _ignored, ...) is dropped by Elasticsearch before it is sent
+SEARCH_FILTER_PATH = ",".join([
+    "took", "timed_out", "pit_id",
+    "hits.total.value", "hits.max_score",
+    "hits.hits._id", "hits.hits._score", "hits.hits._source", "hits.hits.sort",
+    "aggregations",
+    "error", "status"
+])
+MSEARCH_FILTER_PATH = ",".join(f"responses.{path}" for path in SEARCH_FILTER_PATH.split(","))
+GET_FILTER_PATH = "_id,_seq_no,_primary_term,found,_source,error,status"
+MGET_FILTER_PATH = ",".join(f"docs.{path}" for path in GET_FILTER_PATH.split(",") if path != "status")
+# Per-item outcome of a _bulk request, without the _index/_version/_shards noise
+BULK_FILTER_PATH = "took,ingest_took,errors,items.*._id,items.*.status,items.*.error,error,status"
+
+# Statuses worth retrying a read on (overload / unavailable)
+RETRY_STATUSES = (429, 502, 503, 504)
+# Transport errors worth retrying a read on; any other exception is raised at once
+RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+class ESClient:
+    """Pooled keep-alive HTTP client for a single Elasticsearch cluster"""
+
+    def __init__(self, base_url, api_key, pool_size=10, timeouts=None, observer=None,
+                 retries=0, hedge_after=None, breaker=None):
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        # observer(wire_bytes, body_bytes, parse_seconds) is called for every body parse_json decodes
+        self.observer = observer
+        self.retries = retries
+        self.hedge_after = hedge_after
+        self.breaker = breaker
+        self._hedge_pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="es-hedge") if hedge_after else None
+        self._stats_lock = threading.Lock()
+        self._stats = {"retries": 0, "hedged": 0, "hedge_wins": 0}
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"ApiKey {api_key}",
+            "Content-Type": "application/json"
+        })
+
+        # pool_block=True caps open connections at pool_size; extra callers
+        # wait for a free connection instead of opening throwaway ones
+        self._adapter = HTTPAdapter(
+            pool_connections=2,
+            pool_maxsize=pool_size,
+            pool_block=True
+        )
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+
+    def _count(self, counter):
+        with self._stats_lock:
+            self._stats[counter] += 1
+
+    def request(self, method, path, op="search", **kwargs):
+        """Send a request through the shared session using the timeout for `op`.
+
+        Raises DeadlineExceeded when the request deadline leaves no time for
+        the call and CircuitOpenError while the breaker is open.
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        cap = kwargs.pop("timeout", None) or self.timeouts.get(op, DEFAULT_TIMEOUTS["search"])
+        idempotent = op not in NON_IDEMPOTENT_OPS
+        attempts = 1 + (self.retries if idempotent else 0)
+        for attempt in range(attempts):
+            kwargs["timeout"] = deadline_timeout(cap, f"es:{op}")
+            if self.breaker is not None:
+                self.breaker.before_call()
+            last = attempt == attempts - 1
+            try:
+                if self._hedge_pool is not None and idempotent:
+                    response = self._hedged_request(method, url, kwargs)
+                else:
+                    response = self._send(method, url, kwargs)
+            except Exception as e:
+                if not isinstance(e, RETRY_EXCEPTIONS):
+                    raise
+                deadline = current_deadline()
+                if deadline is not None and deadline.expired():
+                    raise deadline_error(f"es:{op}") from e
+                if last or not sleep_before_retry(attempt):
+                    raise
+                self._count("retries")
+                continue
+
+            if response.status_code in RETRY_STATUSES and not last and sleep_before_retry(attempt):
+                self._count("retries")
+                continue
+            return response
+
+    def _record_outcome(self, response):
+        """Tell the breaker how a call it let through went (None: it raised).
+
+        Every outcome after before_call() is recorded, or a half-open breaker
+        would wait for its trial call forever.
+        """
+        if self.breaker is None:
+            return
+        if response is None or response.status_code >= 500 or response.status_code == 429:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _send(self, method, url, kwargs):
+        """One call the breaker let through, with its outcome recorded"""
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except Exception:
+            self._record_outcome(None)
+            raise
+        self._record_outcome(response)
+        return response
+
+    def _hedged_request(self, method, url, kwargs):
+        """Send the request, and a second copy if the first is slower than hedge_after.
+
+        The second copy is a call of its own: it only goes out if the breaker
+        lets it (never during a half-open trial), otherwise the first copy is
+        waited for.
+        """
+        first = self._hedge_pool.submit(self._send, method, url, kwargs)
+        done, _ = wait([first], timeout=min(self.hedge_after, kwargs["timeout"]))
+        if done:
+            return first.result()
+        if self.breaker is not None:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                return first.result()
+        self._count("hedged")
+        second = self._hedge_pool.submit(self._send, method, url, kwargs)
+        done, pending = wait([first, second], return_when=FIRST_COMPLETED)
+        winner = done.pop()
+        if winner.exception() is not None and pending:
+            # The other copy may still succeed
+            winner = pending.pop()
+        if winner is second:
+            self._count("hedge_wins")
+        return winner.result()
+
+    def resilience_stats(self):
+        """Retry/hedge counters plus breaker state"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["retries_per_read"] = self.retries
+        stats["hedge_after_seconds"] = self.hedge_after
+        if self.breaker is not None:
+            stats["breaker"] = self.breaker.stats()
+        return stats
+
+    def parse_json(self, response):
+        """Decode a response body with the fast JSON parser, reporting its size and parse time"""
+        parse_start = time.perf_counter()
+        data = loads(response.content)
+        if self.observer is not None:
+            body_bytes = len(response.content)
+            wire_bytes = int(response.headers.get("Content-Length") or body_bytes)
+            self.observer(wire_bytes, body_bytes, time.perf_counter() - parse_start)
+        return data
+
+    @staticmethod
+    def _with_filter_path(kwargs, filter_path):
+        if filter_path:
+            kwargs["params"] = dict(kwargs.get("params") or {}, filter_path=filter_path)
+        return kwargs
+
+    def get(self, path, op="get", **kwargs):
+        return self.request("GET", path, op=op, **kwargs)
+
+    def post(self, path, body=None, op="search", **kwargs):
+        return self.request("POST", path, op=op, json=body, **kwargs)
+
+    def search(self, index, body, filter_path=SEARCH_FILTER_PATH, **kwargs):
+        """POST {index}/_search (index may be None for point-in-time searches)"""
+        path = f"{index}/_search" if index else "_search"
+        return self.post(path, body, op="search", **self._with_filter_path(kwargs, filter_path))
+
+    def msearch(self, index, bodies, filter_path=MSEARCH_FILTER_PATH):
+        """POST {index}/_msearch - several searches in one round trip"""
+        lines = []
+        for body in bodies:
+            lines.append("{}")
+            lines.append(json.dumps(body))
+        return self.request(
+            "POST",
+            f"{index}/_msearch",
+            op="search",
+            data="\n".join(lines) + "\n",
+            headers={"Content-Type": "application/x-ndjson"},
+            **self._with_filter_path({}, filter_path)
+        )
+
+    def get_doc(self, index, doc_id, filter_path=GET_FILTER_PATH, **kwargs):
+        """GET {index}/_doc/{doc_id}"""
+        path = f"{index}/_doc/{quote(str(doc_id), safe='')}"
+        return self.get(path, op="get", **self._with_filter_path(kwargs, filter_path))
+
+    def mget(self, index, ids, filter_path=MGET_FILTER_PATH):
+        """POST {index}/_mget - several documents by id in one round trip"""
+        return self.post(f"{index}/_mget", {"ids": list(ids)}, op="get",
+                         **self._with_filter_path({}, filter_path))
+
+    def put_doc(self, index, doc_id, body, refresh=None):
+        """PUT {index}/_doc/{doc_id}"""
+        path = f"{index}/_doc/{quote(str(doc_id), safe='')}"
+        if refresh:
+            path += f"?refresh={refresh}"
+        return self.request("PUT", path, op="write", json=body)
+
+    def bulk(self, index, body, filter_path=BULK_FILTER_PATH):
+        """POST {index}/_bulk with an NDJSON body (not retried; callers retry the failed items)"""
+        return self.request(
+            "POST",
+            f"{index}/_bulk",
+            op="bulk",
+            data=body,
+            headers={"Content-Type": "application/x-ndjson"},
+            **self._with_filter_path({}, filter_path)
+        )
+
+    def open_pit(self, index, keep_alive="1m"):
+        """Open a point-in-time on `index` and return its id"""
+        response = self.post(f"{index}/_pit?keep_alive={keep_alive}", op="pit")
+        response.raise_for_status()
+        return self.parse_json(response)["id"]
+
+    def close_pit(self, pit_id):
+        """Release a point-in-time (errors are ignored, PITs expire on their own)"""
+        try:
+            self.request("DELETE", "_pit", op="search", json={"id": pit_id})
+        except (requests.exceptions.RequestException, DeadlineExceeded, CircuitOpenError):
+            pass
+
+    def scan(self, index, query=None, page_size=500, keep_alive="1m", source=None, sort=None, pit_id=None):
+        """Yield every hit matching `query` using a point-in-time and search_after.
+
+        Pages are fetched lazily as the caller consumes hits, so the whole
+        result set is never held in memory. Raises requests.HTTPError if a
+        page request fails. With `pit_id` the scan reads that already open
+        point-in-time (index is ignored) and leaves closing it to the caller.
+        """
+        owned = pit_id is None
+        if owned:
+            pit_id = self.open_pit(index, keep_alive)
+        search_after = None
+        try:
+            while True:
+                body = {
+                    "size": page_size,
+                    "query": query or {"match_all": {}},
+                    "pit": {"id": pit_id, "keep_alive": keep_alive},
+                    # _shard_doc is the cheapest total order available with a PIT
+                    "sort": sort or [{"_shard_doc": "asc"}],
+                    "track_total_hits": False
+                }
+                if source is not None:
+                    body["_source"] = source
+                if search_after is not None:
+                    body["search_after"] = search_after
+
+                response = self.search(None, body)
+                response.raise_for_status()
+                es_data = self.parse_json(response)
+                pit_id = es_data.get("pit_id", pit_id)
+
+                hits = es_data.get("hits", {}).get("hits", [])
+                if not hits:
+                    return
+                yield from hits
+                if len(hits) < page_size:
+                    return
+                search_after = hits[-1]["sort"]
+        finally:
+            if owned:
+                self.close_pit(pit_id)
+
+    def pool_stats(self):
+        """Connection reuse counters aggregated over all host pools.
+
+        A hit is a request served on an already-open keep-alive connection,
+        a miss is a request that had to open a new connection.
+        """
+        total_requests = 0
+        opened = 0
+        available = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            total_requests += pool.num_requests
+            opened += pool.num_connections
+            if pool.pool is not None:
+                available += pool.pool.qsize()
+
+        hits = max(total_requests - opened, 0)
+        return {
+            "pool_size": self.pool_size,
+            "requests": total_requests,
+            "hits": hits,
+            "misses": opened,
+            "hit_ratio": round(hits / total_requests, 4) if total_requests else 0.0,
+            "available_slots": available,
+            "timeouts": self.timeouts
+        }
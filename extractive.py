@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Local extractive pros/cons engine for the Agentic AI mode.
+
+Computes pros and cons straight from the retrieved reviews, CPU only and in
+a few milliseconds: every sentence is tagged with the product aspects it
+mentions (display, battery, health tracking, ...) and given a polarity from
+a small sentiment lexicon plus the review's star rating. Aspects are
+generic (GENERAL_ASPECTS) plus those of the product category, if known.
+Aspect scores are polarity sums weighted by helpful_votes; the top aspects
+become the pros and cons, each represented by its strongest sentence. The
+personalized recommendation is a template filled only from the user
+profile's fields, and neutral when there is no profile.
+
+Used as the explicit "fast" mode of /agentic-summary and as the fallback
+whenever the OpenAI call fails or misses its latency budget.
+"""
+
+import math
+import re
+from collections import defaultdict
+
+# Aspect -> words that mark a sentence as being about it, for any product
+GENERAL_ASPECTS = {
+    "display": {"display", "screen", "brightness", "bright", "brighter", "readable", "oled", "resolution"},
+    "battery life": {"battery", "charge", "charging", "charger"},
+    "performance": {"performance", "chip", "fast", "faster", "lag", "smooth", "responsive", "response",
+                    "apps", "app", "slow", "speed"},
+    "design and comfort": {"design", "titanium", "aluminum", "lightweight", "thin", "thinner", "comfortable",
+                           "case", "weight", "premium", "size"},
+    "build quality": {"quality", "durable", "durability", "sturdy", "scratch", "scratches", "cracked", "broke"},
+    "ease of use": {"setup", "intuitive", "interface", "menu", "menus", "instructions", "easy"},
+    "price and value": {"price", "cost", "expensive", "afford", "budget", "money", "value", "subscription",
+                        "subscriptions", "pricey", "overpriced", "worth", "upgrade"},
+    "connectivity": {"bluetooth", "wifi", "pairing", "connected", "connection", "notifications", "ecosystem"}
+}
+
+# Extra aspects and words per product category, merged over GENERAL_ASPECTS
+CATEGORY_ASPECTS = {
+    "smartwatch": {
+        "display": {"always"},
+        "health tracking": {"health", "heart", "sleep", "ecg", "temperature", "oxygen", "rhythm", "cardiac",
+                            "fall", "period", "medication", "meditation", "breathing", "stress"},
+        "fitness and workouts": {"workout", "workouts", "fitness", "running", "runs", "hiking", "step", "steps",
+                                 "activity", "rings", "training", "swim", "swimming"},
+        "GPS": {"gps", "location", "navigation"},
+        "performance": {"s10", "siri"},
+        "design and comfort": {"strap", "band"},
+        "connectivity": {"cellular", "calls", "iphone", "messages", "calendar"}
+    }
+}
+
+
+def aspect_lexicon(category=None):
+    """GENERAL_ASPECTS plus the aspects of `category` (see CATEGORY_ASPECTS)"""
+    lexicon = {name: set(words) for name, words in GENERAL_ASPECTS.items()}
+    for name, words in CATEGORY_ASPECTS.get(category, {}).items():
+        lexicon[name] = lexicon.get(name, set()) | words
+    return lexicon
+
+POSITIVE_WORDS = {
+    "accurate", "amazing", "best", "better", "bright", "brighter", "clear", "comfortable", "confidence",
+    "easier", "easy", "excellent", "fantastic", "flawlessly", "good", "great", "happy", "helpful",
+    "impressive", "incredible", "incredibly", "intuitive", "love", "motivated", "nice", "peace", "perfect",
+    "perfectly", "precise", "premium", "recommend", "reliable", "responsive", "smooth", "solid", "spot",
+    "useful", "well", "worth", "improved", "essential", "seamless", "withstands", "lightweight"
+}
+NEGATIVE_WORDS = {
+    "annoying", "bad", "broke", "broken", "bug", "bugs", "complaint", "concern", "concerns", "costly",
+    "difficult", "disappointing", "drain", "drains", "errors", "expensive", "hard", "heavy", "inaccurate",
+    "inconsistent", "issue", "issues", "lacking", "lacks", "lag", "limited", "occasional", "overpriced",
+    "poor", "pricey", "problem", "problems", "require", "requires", "short", "slow", "struggle",
+    "subscriptions", "unfortunately", "worse", "worst", "worried", "adding"
+}
+NEGATIONS = {"not", "no", "never", "without", "isn't", "doesn't", "don't", "didn't", "wasn't", "cannot"}
+
+SENTENCE = re.compile(r"[^.!?]+[.!?]?")
+TOKEN = re.compile(r"[a-z0-9']+")
+
+MIN_SENTENCE_WORDS = 5
+MAX_SENTENCE_WORDS = 40
+
+
+def split_sentences(text):
+    return [sentence.strip() for sentence in SENTENCE.findall(text or "") if sentence.strip()]
+
+
+def sentence_polarity(tokens):
+    """Lexicon score of one sentence; a negation flips the next two words"""
+    score = 0
+    flip_until = -1
+    for i, token in enumerate(tokens):
+        if token in NEGATIONS:
+            flip_until = i + 2
+            continue
+        sign = -1 if i <= flip_until else 1
+        if token in POSITIVE_WORDS:
+            score += sign
+        elif token in NEGATIVE_WORDS:
+            score -= sign
+    return score
+
+
+def review_weight(source):
+    """Helpful votes raise a review's weight logarithmically"""
+    try:
+        votes = max(int(source.get('helpful_votes') or 0), 0)
+    except (TypeError, ValueError):
+        votes = 0
+    return 1.0 + math.log1p(votes)
+
+
+def score_aspects(hits, aspects=None):
+    """Return (scores, best_sentences, stats) for the reviews in `hits`.
+
+    `aspects` is an aspect -> words lexicon (default: aspect_lexicon()).
+
+    scores[(aspect, "pro"|"con")] is the weighted polarity mass,
+    best_sentences[(aspect, side)] the (strength, sentence) that represents it.
+    """
+    aspects = aspects or aspect_lexicon()
+    scores = defaultdict(float)
+    best = {}
+    stars_total = 0.0
+    reviews = 0
+    sentences = 0
+    for hit in hits:
+        source = hit.get('_source', hit)
+        # Unrated reviews count as neutral; 0 stars is a rating
+        try:
+            stars = 3.0 if source.get('stars') is None else float(source['stars'])
+        except (TypeError, ValueError):
+            stars = 3.0
+        weight = review_weight(source)
+        stars_total += stars
+        reviews += 1
+        for sentence in split_sentences(source.get('review_text', '')):
+            sentences += 1
+            tokens = TOKEN.findall(sentence.lower())
+            mentioned = [name for name, words in aspects.items() if words.intersection(tokens)]
+            if not mentioned:
+                continue
+            polarity = sentence_polarity(tokens) + (stars - 3) * 0.5
+            if polarity == 0:
+                continue
+            side = "pro" if polarity > 0 else "con"
+            strength = weight * abs(polarity)
+            usable = MIN_SENTENCE_WORDS <= len(tokens) <= MAX_SENTENCE_WORDS
+            for aspect in mentioned:
+                scores[(aspect, side)] += strength / len(mentioned)
+                key = (aspect, side)
+                if usable and (key not in best or strength > best[key][0]):
+                    best[key] = (strength, sentence)
+    stats = {
+        "reviews": reviews,
+        "sentences": sentences,
+        "average_stars": round(stars_total / reviews, 2) if reviews else None
+    }
+    return scores, best, stats
+
+
+def _top_points(scores, best, side, limit=3):
+    """Highest scoring aspects of one side, each with its own representative sentence"""
+    ranked = sorted(
+        ((score, aspect) for (aspect, s), score in scores.items() if s == side and (aspect, s) in best),
+        reverse=True
+    )
+    points = []
+    used = set()
+    for score, aspect in ranked:
+        sentence = best[(aspect, side)][1]
+        if sentence in used:
+            continue
+        used.add(sentence)
+        points.append({"aspect": aspect, "score": round(score, 2), "point": sentence.rstrip('.') + '.'})
+        if len(points) == limit:
+            break
+    return points
+
+
+def build_recommendation(user_profile, pros, cons, average_stars, product="this product"):
+    """Template recommendation from the profile's fields and the extracted points"""
+    rating = f"{average_stars:.1f}/5 stars" if average_stars is not None else "mixed ratings"
+    strengths = " and ".join(point["aspect"] for point in pros[:2]) or "its overall feature set"
+    weakness = cons[0]["aspect"] if cons else "its price"
+    text = f"Reviewers give {product} {rating}, praising {strengths}; the most common criticism is {weakness}."
+    if not user_profile:
+        return text + " Weigh those against what you need from it and what you want to spend."
+
+    preferences = user_profile.get('preferences') or {}
+    sensitivity = preferences.get('price_sensitivity')
+    if user_profile.get('budget_conscious') or sensitivity in ("high", "very_high"):
+        text += " Given your budget"
+        if user_profile.get('credit_limit'):
+            text += f" and ${user_profile['credit_limit']:,} credit limit"
+        text += ", compare it with lower-priced alternatives that cover your priorities before buying."
+    elif sensitivity in ("low", "very_low"):
+        text += f" Price matters less to you, so {weakness} is the main thing to check before buying."
+    else:
+        text += " Weigh those against what you need from it and what you want to spend."
+    priorities = [p.replace('_', ' ') for p in preferences.get('feature_priorities', [])]
+    if priorities:
+        text += f" Your priorities ({', '.join(priorities[:3])}) were weighed against what reviewers report."
+    return text
+
+
+def summarize_reviews(hits, user_profile, product="this product", category=None):
+    """Pros/cons/recommendation computed locally from review hits.
+
+    `category` selects extra aspects from CATEGORY_ASPECTS. Returns
+    (summary, report); summary has the same fields as the LLM answer,
+    report the aspect scores behind it.
+    """
+    scores, best, stats = score_aspects(hits, aspect_lexicon(category))
+    pros = _top_points(scores, best, "pro")
+    cons = _top_points(scores, best, "con")
+    summary = {
+        "pros": [point["point"] for point in pros] or ["Reviewers did not agree on a clear strength"],
+        "cons": [point["point"] for point in cons] or ["Reviewers did not report a consistent problem"],
+        "personalized_recommendation": build_recommendation(
+            user_profile, pros, cons, stats["average_stars"], product
+        )
+    }
+    report = dict(stats, pros=pros, cons=cons)
+    return summary, report
+
+
+def summarize_points(points, user_profile, product="this product"):
+    """Same output from already merged pros/cons ({"point", "mentions"} items)"""
+    pros = [
+        {"aspect": item.get("point", "").rstrip('.').lower(), "point": item.get("point", "")}
+        for item in points.get("pros", [])[:3]
+    ]
+    cons = [
+        {"aspect": item.get("point", "").rstrip('.').lower(), "point": item.get("point", "")}
+        for item in points.get("cons", [])[:3]
+    ]
+    return {
+        "pros": [point["point"] for point in pros] or ["Reviewers did not agree on a clear strength"],
+        "cons": [point["point"] for point in cons] or ["Reviewers did not report a consistent problem"],
+        "personalized_recommendation": build_recommendation(user_profile, pros, cons, None, product)
+    }
@@ -0,0 +1,744 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for Elasticsearch and the OpenAI chat completions API.
+
+Used by bench.py to load-test the backend without an Elastic Cloud cluster
+or an OpenAI key. Both servers add configurable latency (fixed + random
+jitter) and fail a configurable fraction of requests.
+
+FakeElasticsearch is seeded from the console requests in "Elastic build.txt"
+(the review_index bulk load and the user_profile documents) and implements
+the subset of the REST API the backend uses: _search (match_all,
+multi_match, semantic, sparse_vector, match, term, ids, range, bool; sort,
+search_after, point-in-time, _source filtering, filter_path, max/min/avg/sum/
+value_count/terms/date_histogram/top_hits aggregations, runtime fields that
+emit a _source field, rrf and linear retrievers), _msearch, _mget, _pit, _doc
+get/put, _bulk, _inference (a word-weight stand-in for ELSER) and
+_cluster/health.
+Scoring is plain term overlap - good enough to exercise the code paths, not
+to judge relevance.
+
+FakeOpenAI answers /v1/chat/completions (blocking and streaming) with
+canned content shaped like what each prompt asks for, and /v1/models.
+
+Usage: python3 fake_services.py [--es-port 9200] [--openai-port 9300]
+"""
+
+import argparse
+import datetime
+import functools
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+DEFAULT_SEED_FILE = "Elastic build.txt"
+
+REQUEST_LINE = re.compile(r"^(GET|POST|PUT|DELETE|HEAD)\s+(\S+)")
+WORD = re.compile(r"\w+")
+# Runtime field scripts the fake understands: emit(params._source.<field>...)
+RUNTIME_SOURCE_FIELD = re.compile(r"params\._source\.(\w+)")
+
+
+def load_console_file(path=DEFAULT_SEED_FILE):
+    """Documents indexed by the Kibana console requests in `path`: {index: {id: source}}"""
+    blocks = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            match = REQUEST_LINE.match(line)
+            if match:
+                blocks.append((match.group(1), match.group(2), []))
+            elif blocks and not line.lstrip().startswith("#"):
+                blocks[-1][2].append(line)
+
+    indices = {}
+    for method, path, body_lines in blocks:
+        path = path.strip("/")
+        if path.endswith("/_bulk"):
+            index = path.split("/")[0]
+            lines = [line for line in body_lines if line.strip()]
+            for action_line, doc_line in zip(lines[::2], lines[1::2]):
+                action = json.loads(action_line)
+                meta = action.get("index") or action.get("create") or {}
+                indices.setdefault(meta.get("_index", index), {})[meta["_id"]] = json.loads(doc_line)
+        elif "/_doc/" in path and method in ("PUT", "POST"):
+            index, _, doc_id = path.partition("/_doc/")
+            indices.setdefault(index, {})[doc_id] = json.loads("".join(body_lines))
+    return indices
+
+
+def _words(text):
+    return WORD.findall(str(text).lower())
+
+
+def _field_value(source, field):
+    """Value of a (possibly dotted) field; "review_text.semantic" reads review_text"""
+    field = field.split("^")[0]
+    if field.endswith(".semantic") or field.endswith(".keyword"):
+        field = field.rsplit(".", 1)[0]
+    value = source
+    for part in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def apply_filter_path(body, filter_path):
+    """Keep only the dotted paths listed in a filter_path parameter ("*" matches any one key)"""
+    tree = {}
+    for path in filter_path.split(","):
+        node = tree
+        for part in path.strip().split("."):
+            node = node.setdefault(part, {})
+
+    def walk(value, node):
+        if not node:
+            return value
+        if isinstance(value, list):
+            kept = [walk(item, node) for item in value]
+            return [item for item in kept if item not in (None, {})]
+        if isinstance(value, dict):
+            kept = {}
+            for key, child in node.items():
+                for name in (value if key == "*" else [key] if key in value else []):
+                    kept[name] = walk(value[name], child)
+            return {key: item for key, item in kept.items() if item not in (None, {}, [])}
+        return None
+
+    return walk(body, tree) or {}
+
+
+class ShapeError(ValueError):
+    """Request the fake does not understand (answered with HTTP 400)"""
+
+
+class Injector:
+    """Latency and error injection shared by both fakes"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=503):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "injected_errors": 0}
+
+    def delay(self):
+        """Sleep for the configured latency; returns the milliseconds slept"""
+        ms = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if ms > 0:
+            time.sleep(ms / 1000)
+        return ms
+
+    def should_fail(self):
+        with self._lock:
+            self.stats["requests"] += 1
+            if random.random() < self.error_rate:
+                self.stats["injected_errors"] += 1
+                return True
+        return False
+
+
+class FakeElasticsearch:
+    """In-memory Elasticsearch subset over the seed documents"""
+
+    def __init__(self, seed_file=DEFAULT_SEED_FILE, **injector_options):
+        self.injector = Injector(**injector_options)
+        self._lock = threading.Lock()
+        self._seq_no = itertools.count()
+        self.docs = {}
+        for index, docs in load_console_file(seed_file).items():
+            for doc_id, source in docs.items():
+                self._store(index, doc_id, source)
+        self._pits = {}
+        self._pit_ids = itertools.count(1)
+
+    def _store(self, index, doc_id, source):
+        with self._lock:
+            existed = doc_id in self.docs.setdefault(index, {})
+            self.docs[index][doc_id] = {"_source": source, "_seq_no": next(self._seq_no)}
+        return "updated" if existed else "created"
+
+    # Query evaluation -------------------------------------------------
+
+    def _evaluate(self, query, doc_id, source, seq_no=None):
+        """Return (matches, score) of one document against a query clause"""
+        if not query:
+            return True, 1.0
+        (kind, spec), = query.items()
+
+        if kind == "match_all":
+            return True, 1.0
+        if kind == "multi_match":
+            terms = set(_words(spec["query"]))
+            score = 0.0
+            for field in spec.get("fields", ["*"]):
+                boost = float(field.split("^")[1]) if "^" in field else 1.0
+                text_words = _words(_field_value(source, field) or "")
+                score += boost * sum(1 for word in text_words if word in terms)
+            return score > 0, score
+        if kind == "semantic":
+            # Every document is "semantically" related; overlap decides the order
+            terms = set(_words(spec["query"]))
+            text_words = set(_words(_field_value(source, spec["field"]) or ""))
+            return True, 0.1 + len(terms & text_words) / max(len(terms), 1)
+        if kind == "sparse_vector":
+            # Same overlap scoring as "semantic", weighted by the expansion
+            text_words = set(_words(_field_value(source, spec["field"]) or ""))
+            score = sum(weight for token, weight in spec["query_vector"].items() if token in text_words)
+            return score > 0, score
+        if kind == "match":
+            (field, value), = spec.items()
+            terms = set(_words(value["query"] if isinstance(value, dict) else value))
+            score = float(sum(1 for word in _words(_field_value(source, field) or "") if word in terms))
+            return score > 0, score
+        if kind == "term":
+            (field, value), = spec.items()
+            value = value["value"] if isinstance(value, dict) else value
+            return _field_value(source, field) == value, 1.0
+        if kind == "terms":
+            (field, values), = spec.items()
+            return _field_value(source, field) in values, 1.0
+        if kind == "ids":
+            return doc_id in spec.get("values", []), 1.0
+        if kind == "range":
+            (field, bounds), = spec.items()
+            value = seq_no if field == "_seq_no" else _field_value(source, field)
+            if value is None:
+                return False, 0.0
+            checks = {
+                "gte": lambda b: value >= b, "gt": lambda b: value > b,
+                "lte": lambda b: value <= b, "lt": lambda b: value < b
+            }
+            return all(checks[op](bound) for op, bound in bounds.items() if op in checks), 1.0
+        if kind == "exists":
+            return _field_value(source, spec["field"]) is not None, 1.0
+        if kind == "bool":
+            score = 0.0
+            for clause in spec.get("must", []):
+                matched, clause_score = self._evaluate(clause, doc_id, source, seq_no)
+                if not matched:
+                    return False, 0.0
+                score += clause_score
+            for clause in spec.get("filter", []):
+                if not self._evaluate(clause, doc_id, source, seq_no)[0]:
+                    return False, 0.0
+            for clause in spec.get("must_not", []):
+                if self._evaluate(clause, doc_id, source, seq_no)[0]:
+                    return False, 0.0
+            should = [self._evaluate(clause, doc_id, source, seq_no) for clause in spec.get("should", [])]
+            if should and not spec.get("must") and not spec.get("filter"):
+                if not any(matched for matched, _ in should):
+                    return False, 0.0
+            score += sum(clause_score for matched, clause_score in should if matched)
+            return True, score or 1.0
+        raise ShapeError(f"unsupported query [{kind}]")
+
+    def _matching(self, index, query, doc_ids=None):
+        docs = self.docs.get(index, {})
+        hits = []
+        for position, doc_id in enumerate(doc_ids if doc_ids is not None else list(docs)):
+            doc = docs.get(doc_id)
+            if doc is None:
+                continue
+            matched, score = self._evaluate(query, doc_id, doc["_source"], doc["_seq_no"])
+            if matched:
+                hits.append({"_index": index, "_id": doc_id, "_score": score, "_source": doc["_source"],
+                             "_position": position, "_seq_no": doc["_seq_no"]})
+        return hits
+
+    @staticmethod
+    def _sort_specs(sort):
+        specs = []
+        for item in sort:
+            if isinstance(item, str):
+                specs.append((item, "desc" if item == "_score" else "asc"))
+            else:
+                (field, order), = item.items()
+                specs.append((field, order.get("order", "asc") if isinstance(order, dict) else order))
+        return specs
+
+    @staticmethod
+    def _sort_value(hit, field):
+        if field == "_score":
+            return hit["_score"]
+        if field in ("_shard_doc", "_doc"):
+            return hit["_position"]
+        if field == "_seq_no":
+            return hit["_seq_no"]
+        return _field_value(hit["_source"], field)
+
+    @staticmethod
+    def _compare(values_a, values_b, specs):
+        for a, b, (_, order) in zip(values_a, values_b, specs):
+            if a == b:
+                continue
+            if a is None or b is None:
+                # Missing values sort last in either direction
+                return 1 if a is None else -1
+            result = -1 if a < b else 1
+            return -result if order == "desc" else result
+        return 0
+
+    @staticmethod
+    def _runtime_fields(runtime_mappings):
+        """{runtime field: _source field} for scripts of the form emit(params._source.<field>...)"""
+        fields = {}
+        for name, spec in (runtime_mappings or {}).items():
+            script = spec.get("script", "")
+            match = RUNTIME_SOURCE_FIELD.search(script.get("source", "") if isinstance(script, dict) else script)
+            if not match:
+                raise ShapeError(f"unsupported runtime field script for [{name}]")
+            fields[name] = match.group(1)
+        return fields
+
+    def _aggregate(self, aggs, hits, runtime=None):
+        runtime = runtime or {}
+        results = {}
+        for name, spec in (aggs or {}).items():
+            kind = next(key for key in spec if key not in ("aggs", "aggregations", "meta"))
+            options = spec[kind]
+            field = runtime.get(options.get("field", ""), options.get("field", ""))
+            values = [_field_value(hit["_source"], field) for hit in hits]
+            values = [value for value in values if value is not None]
+            if kind in ("max", "min"):
+                value = (max if kind == "max" else min)(values) if values else None
+                result = {"value": value}
+                if isinstance(value, str):
+                    result["value_as_string"] = value
+                results[name] = result
+            elif kind == "avg":
+                numbers = [v for v in values if isinstance(v, (int, float))]
+                results[name] = {"value": sum(numbers) / len(numbers) if numbers else None}
+            elif kind == "sum":
+                results[name] = {"value": sum(v for v in values if isinstance(v, (int, float)))}
+            elif kind == "value_count":
+                results[name] = {"value": len(values)}
+            elif kind == "terms":
+                groups = {}
+                for hit in hits:
+                    key = _field_value(hit["_source"], field)
+                    if key is not None:
+                        groups.setdefault(key, []).append(hit)
+                ranked = sorted(groups.items(), key=lambda kv: (-len(kv[1]), str(kv[0])))[:options.get("size", 10)]
+                buckets = []
+                for key, bucket_hits in ranked:
+                    bucket = {"key": key, "doc_count": len(bucket_hits)}
+                    bucket.update(self._aggregate(spec.get("aggs") or spec.get("aggregations"), bucket_hits, runtime))
+                    buckets.append(bucket)
+                results[name] = {"buckets": buckets, "sum_other_doc_count": sum(map(len, groups.values()))
+                                 - sum(bucket["doc_count"] for bucket in buckets)}
+            elif kind == "date_histogram":
+                # yyyy-MM-dd dates; buckets keyed by the start of their day, week (Monday) or month
+                interval = options.get("calendar_interval", "day")
+                groups = {}
+                for hit in hits:
+                    date = _field_value(hit["_source"], field)
+                    if date is None:
+                        continue
+                    day = datetime.date.fromisoformat(str(date)[:10])
+                    if interval in ("week", "1w"):
+                        day -= datetime.timedelta(days=day.weekday())
+                    elif interval in ("month", "1M"):
+                        day = day.replace(day=1)
+                    elif interval not in ("day", "1d"):
+                        raise ShapeError(f"unsupported calendar_interval [{interval}]")
+                    groups.setdefault(day, []).append(hit)
+                buckets = []
+                for day in sorted(groups):
+                    if len(groups[day]) < options.get("min_doc_count", 0):
+                        continue
+                    start = datetime.datetime(day.year, day.month, day.day, tzinfo=datetime.timezone.utc)
+                    bucket = {"key_as_string": day.isoformat(), "key": int(start.timestamp() * 1000),
+                              "doc_count": len(groups[day])}
+                    bucket.update(self._aggregate(spec.get("aggs") or spec.get("aggregations"), groups[day], runtime))
+                    buckets.append(bucket)
+                results[name] = {"buckets": buckets}
+            elif kind == "top_hits":
+                specs = self._sort_specs(options.get("sort") or ["_score"])
+                ranked = sorted(hits, key=functools.cmp_to_key(lambda a, b: self._compare(
+                    [self._sort_value(a, f) for f, _ in specs], [self._sort_value(b, f) for f, _ in specs], specs
+                )))[:options.get("size", 3)]
+                source_filter = options.get("_source", True)
+                top = []
+                for hit in ranked:
+                    rendered = {"_id": hit["_id"], "_score": None if options.get("sort") else hit["_score"]}
+                    if source_filter is True:
+                        rendered["_source"] = hit["_source"]
+                    elif isinstance(source_filter, list):
+                        rendered["_source"] = {k: v for k, v in hit["_source"].items() if k in source_filter}
+                    top.append(rendered)
+                results[name] = {"hits": {"total": {"value": len(hits), "relation": "eq"}, "hits": top}}
+            else:
+                raise ShapeError(f"unsupported aggregation [{kind}]")
+        return results
+
+    def _retrieve(self, index, retriever, window):
+        """Ranked hits of a retriever tree (standard, rrf, linear)"""
+        (kind, spec), = retriever.items()
+        if kind == "standard":
+            hits = self._matching(index, spec.get("query"))
+            hits.sort(key=lambda hit: (-hit["_score"], hit["_position"]))
+            return hits[:window]
+        if kind not in ("rrf", "linear"):
+            raise ShapeError(f"unknown retriever [{kind}]")
+
+        scores = {}
+        by_id = {}
+        window = spec.get("rank_window_size", window)
+        for child in spec.get("retrievers", []):
+            weight = 1.0
+            if kind == "linear":
+                weight = child.get("weight", 1.0)
+                child = child["retriever"]
+            hits = self._retrieve(index, child, window)
+            high = max((hit["_score"] for hit in hits), default=0) or 1.0
+            for rank, hit in enumerate(hits, 1):
+                if kind == "rrf":
+                    contribution = 1.0 / (spec.get("rank_constant", 60) + rank)
+                else:
+                    contribution = weight * hit["_score"] / high
+                scores[hit["_id"]] = scores.get(hit["_id"], 0.0) + contribution
+                by_id.setdefault(hit["_id"], hit)
+        ranked = sorted(scores.items(), key=lambda kv: -kv[1])[:window]
+        return [dict(by_id[doc_id], _score=score) for doc_id, score in ranked]
+
+    def search(self, index, body):
+        body = body or {}
+        pit_id = None
+        doc_ids = None
+        if "pit" in body:
+            pit_id = body["pit"]["id"]
+            if pit_id not in self._pits:
+                return 404, {"error": {"type": "search_context_missing_exception",
+                                       "reason": "No search context found for id"}, "status": 404}
+            index, doc_ids = self._pits[pit_id]
+
+        size = body.get("size", 10)
+        if "retriever" in body:
+            hits = self._retrieve(index, body["retriever"], max(size, 10))
+            specs = []
+        else:
+            hits = self._matching(index, body.get("query"), doc_ids)
+            specs = self._sort_specs(body.get("sort") or ["_score", "_doc"])
+            for hit in hits:
+                hit["sort"] = [self._sort_value(hit, field) for field, _ in specs]
+            hits.sort(key=functools.cmp_to_key(lambda a, b: self._compare(a["sort"], b["sort"], specs)))
+            if "search_after" in body:
+                after = body["search_after"]
+                hits = [hit for hit in hits if self._compare(hit["sort"], after, specs) > 0]
+
+        total = len(hits)
+        aggregations = self._aggregate(body.get("aggs") or body.get("aggregations"), hits,
+                                       self._runtime_fields(body.get("runtime_mappings")))
+        start = body.get("from", 0)
+        page = hits[start:start + size]
+
+        source_filter = body.get("_source", True)
+        out = []
+        for hit in page:
+            rendered = {"_index": hit["_index"], "_id": hit["_id"], "_score": hit["_score"], "_ignored": []}
+            if source_filter is True:
+                rendered["_source"] = hit["_source"]
+            elif isinstance(source_filter, list):
+                rendered["_source"] = {k: v for k, v in hit["_source"].items() if k in source_filter}
+            if specs and (body.get("sort") or pit_id):
+                rendered["sort"] = hit["sort"]
+            out.append(rendered)
+
+        result = {"timed_out": False,
+                  "_shards": {"total": 3, "successful": 3, "skipped": 0, "failed": 0},
+                  "hits": {"max_score": max((h["_score"] for h in page), default=None), "hits": out}}
+        if body.get("track_total_hits", True) is not False:
+            result["hits"]["total"] = {"value": total, "relation": "eq"}
+        if aggregations:
+            result["aggregations"] = aggregations
+        if pit_id:
+            result["pit_id"] = pit_id
+        return 200, result
+
+    def open_pit(self, index):
+        pit_id = f"fake-pit-{next(self._pit_ids)}"
+        with self._lock:
+            self._pits[pit_id] = (index, list(self.docs.get(index, {})))
+        return pit_id
+
+    def close_pit(self, pit_id):
+        with self._lock:
+            return self._pits.pop(pit_id, None) is not None
+
+    # HTTP ---------------------------------------------------------------
+
+    def handle(self, method, path, query_string, raw_body):
+        """Route one request; returns (status, body) with body a dict or NDJSON-ready list"""
+        parts = [part for part in path.split("/") if part]
+        if parts[:2] == ["_cluster", "health"]:
+            return 200, {"cluster_name": "fake", "status": "green", "number_of_nodes": 1}
+        if parts == ["_pit"] and method == "DELETE":
+            pit_id = json.loads(raw_body or b"{}").get("id")
+            return 200, {"succeeded": self.close_pit(pit_id), "num_freed": 1}
+        if parts and parts[-1] == "_pit" and method == "POST":
+            return 200, {"id": self.open_pit(parts[0])}
+        if parts and parts[-1] == "_msearch":
+            lines = [line for line in raw_body.decode("utf-8").splitlines() if line.strip()]
+            responses = []
+            for header_line, body_line in zip(lines[::2], lines[1::2]):
+                header = json.loads(header_line)
+                status, result = self.search(header.get("index", parts[0]), json.loads(body_line))
+                responses.append(dict(result, status=status, took=0))
+            return 200, {"responses": responses}
+        if len(parts) == 2 and parts[1] == "_mget":
+            ids = json.loads(raw_body or b"{}").get("ids", [])
+            return 200, {"docs": [self.get_doc(parts[0], doc_id)[1] for doc_id in ids]}
+        if parts and parts[-1] == "_search":
+            index = parts[0] if len(parts) > 1 else None
+            return self.search(index, json.loads(raw_body or b"{}"))
+        if parts[:1] == ["_inference"] and method == "POST":
+            # Stand-in for ELSER: every word of the input weighted by its length
+            text = json.loads(raw_body or b"{}").get("input", "")
+            texts = text if isinstance(text, list) else [text]
+            return 200, {"sparse_embedding": [
+                {"is_truncated": False, "embedding": {word: round(len(word) / 4, 3) for word in _words(item)}}
+                for item in texts
+            ]}
+        if parts and parts[-1] == "_bulk":
+            return self._bulk(parts[0] if len(parts) > 1 else None, raw_body)
+        if len(parts) == 3 and parts[1] == "_doc":
+            index, _, doc_id = parts
+            if method == "GET":
+                return self.get_doc(index, doc_id)
+            if method in ("PUT", "POST"):
+                result = self._store(index, doc_id, json.loads(raw_body or b"{}"))
+                return (201 if result == "created" else 200), {"_index": index, "_id": doc_id, "result": result}
+        if method in ("GET", "HEAD") and not parts:
+            return 200, {"name": "fake-elasticsearch", "version": {"number": "8.15.0"}}
+        return 400, {"error": {"type": "illegal_argument_exception", "reason": f"unsupported: {method} {path}"},
+                     "status": 400}
+
+    def get_doc(self, index, doc_id):
+        doc = self.docs.get(index, {}).get(doc_id)
+        if doc is None:
+            return 404, {"_index": index, "_id": doc_id, "found": False}
+        return 200, {"_index": index, "_id": doc_id, "_seq_no": doc["_seq_no"], "_primary_term": 1,
+                     "found": True, "_source": doc["_source"]}
+
+    def _bulk(self, default_index, raw_body):
+        lines = [line for line in raw_body.decode("utf-8").splitlines() if line.strip()]
+        items = []
+        i = 0
+        while i < len(lines):
+            action = json.loads(lines[i])
+            (op, meta), = action.items()
+            index = meta.get("_index", default_index)
+            if op == "delete":
+                with self._lock:
+                    found = self.docs.get(index, {}).pop(meta["_id"], None) is not None
+                items.append({op: {"_index": index, "_id": meta["_id"], "status": 200 if found else 404}})
+                i += 1
+                continue
+            source = json.loads(lines[i + 1])
+            doc_id = meta.get("_id") or f"auto-{next(self._seq_no)}"
+            if op == "update":
+                existing = self.docs.get(index, {}).get(doc_id, {}).get("_source", {})
+                source = dict(existing, **source.get("doc", {}))
+            result = self._store(index, doc_id, source)
+            items.append({op: {"_index": index, "_id": doc_id, "result": result,
+                               "status": 201 if result == "created" else 200}})
+            i += 2
+        return 200, {"took": 0, "errors": False, "items": items}
+
+
+def _canned_completion(messages, options):
+    """Content shaped like what the prompt asks for"""
+    system = messages[0]["content"] if messages else ""
+    user = messages[-1]["content"] if messages else ""
+    if "Merge them into a single list" in system:
+        pros = re.findall(r"^(P\d+):", user, re.M)
+        cons = re.findall(r"^(C\d+):", user, re.M)
+        return json.dumps({
+            "pros": [{"point": "Bright, larger display", "sources": pros[:2]}] if pros else [],
+            "cons": [{"point": "Battery life under heavy use", "sources": cons[:2]}] if cons else []
+        })
+    if "list the main pros and cons" in system:
+        count = len(re.findall(r"^Review \d+:", user, re.M)) or 1
+        return json.dumps({
+            "pros": [{"point": "Bright, larger display", "mentions": count, "reviews": list(range(1, count + 1))}],
+            "cons": [{"point": "Battery life under heavy use", "mentions": 1, "reviews": [1]}]
+        })
+    if "personalized_recommendation" in system:
+        return json.dumps({
+            "pros": [
+                "The larger wide-angle OLED display is noticeably brighter and easier to read outdoors",
+                "Health tracking including heart rate, sleep and temperature sensing is accurate and detailed",
+                "Fast S10 performance keeps apps and workouts smooth throughout the day"
+            ],
+            "cons": [
+                "Battery life still needs a daily charge, especially with GPS workouts",
+                "Pricing is high compared with capable budget fitness bands",
+                "Several features depend on a recent iPhone and paid subscriptions"
+            ],
+            "personalized_recommendation": "Based on your profile, weigh the Series 10's display and health features against its price; if budget matters most, a capable fitness band covers the essentials for far less."
+        })
+    if (options.get("response_format") or {}).get("type") == "json_object":
+        return json.dumps({"result": "ok"})
+    return ("Reviewers consistently praise the brighter, larger display and the accuracy of the health "
+            "tracking, while the most common complaint is battery life under heavy GPS use. Several reviews "
+            "mention that the price is hard to justify when upgrading from a recent model.")
+
+
+class FakeOpenAI:
+    """OpenAI-compatible /v1/chat/completions responder"""
+
+    def __init__(self, **injector_options):
+        self.injector = Injector(**injector_options)
+        self._ids = itertools.count(1)
+
+    def completion(self, body):
+        content = _canned_completion(body.get("messages", []), body)
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+        return {
+            "id": f"chatcmpl-fake-{next(self._ids)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-3.5-turbo"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                      "total_tokens": prompt_tokens + len(content) // 4}
+        }
+
+    def stream_chunks(self, completion):
+        """Split a completion into chat.completion.chunk payloads of a few characters each"""
+        content = completion["choices"][0]["message"]["content"]
+        base = {"id": completion["id"], "object": "chat.completion.chunk",
+                "created": completion["created"], "model": completion["model"]}
+        yield dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        for i in range(0, len(content), 16):
+            yield dict(base, choices=[{"index": 0, "delta": {"content": content[i:i + 16]}, "finish_reason": None}])
+        yield dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+
+
+def _make_handler(es=None, openai=None):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _handle(self):
+            raw_body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            path, _, query_string = self.path.partition("?")
+            if openai is not None:
+                return self._handle_openai(path, raw_body)
+
+            slept_ms = es.injector.delay()
+            if es.injector.should_fail():
+                return self._send_json(es.injector.error_status, {
+                    "error": {"type": "es_rejected_execution_exception", "reason": "injected failure"},
+                    "status": es.injector.error_status
+                })
+            try:
+                status, body = es.handle(self.command, path, query_string, raw_body)
+            except (ShapeError, ValueError, KeyError) as e:
+                status, body = 400, {"error": {"type": "parsing_exception", "reason": str(e)}, "status": 400}
+            if isinstance(body, dict) and path.rstrip("/").endswith(("_search", "_msearch")):
+                body.setdefault("took", int(slept_ms))
+            filter_path = parse_qs(query_string).get("filter_path")
+            if filter_path and isinstance(body, dict):
+                body = apply_filter_path(body, filter_path[0])
+            self._send_json(status, body)
+
+        def _handle_openai(self, path, raw_body):
+            if path.rstrip("/").endswith("/models"):
+                return self._send_json(200, {"object": "list", "data": [{"id": "gpt-4", "object": "model"}]})
+            if not path.rstrip("/").endswith("/chat/completions"):
+                return self._send_json(404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}})
+            body = json.loads(raw_body or b"{}")
+            if openai.injector.should_fail():
+                openai.injector.delay()
+                return self._send_json(openai.injector.error_status, {
+                    "error": {"message": "Injected failure", "type": "server_error"}
+                })
+            completion = openai.completion(body)
+            if not body.get("stream"):
+                openai.injector.delay()
+                return self._send_json(200, completion)
+
+            # Latency is spread over the chunks like a model generating tokens
+            chunks = list(openai.stream_chunks(completion))
+            total_ms = openai.injector.latency_ms + random.uniform(0, openai.injector.jitter_ms)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for chunk in chunks:
+                time.sleep(total_ms / 1000 / len(chunks))
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+        def _handle_request(self):
+            try:
+                self._handle()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up (timeout or deadline) before the answer was sent
+                self.close_connection = True
+
+        do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _handle_request
+
+    return Handler
+
+
+def serve(service, host="127.0.0.1", port=0):
+    """Serve a FakeElasticsearch or FakeOpenAI on a daemon thread; returns the server"""
+    if isinstance(service, FakeOpenAI):
+        handler = _make_handler(openai=service)
+    else:
+        handler = _make_handler(es=service)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=type(service).__name__, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local Elasticsearch and OpenAI stand-ins")
+    parser.add_argument("--es-port", type=int, default=9200)
+    parser.add_argument("--openai-port", type=int, default=9300)
+    parser.add_argument("--seed-file", default=DEFAULT_SEED_FILE)
+    parser.add_argument("--es-latency", type=float, default=20.0, help="ms added to every ES request")
+    parser.add_argument("--es-jitter", type=float, default=10.0, help="random extra ms for ES")
+    parser.add_argument("--es-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=800.0, help="ms per chat completion")
+    parser.add_argument("--llm-jitter", type=float, default=400.0, help="random extra ms for OpenAI")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    es_server = serve(FakeElasticsearch(args.seed_file, latency_ms=args.es_latency, jitter_ms=args.es_jitter,
+                                        error_rate=args.es_error_rate), port=args.es_port)
+    openai_server = serve(FakeOpenAI(latency_ms=args.llm_latency, jitter_ms=args.llm_jitter,
+                                     error_rate=args.llm_error_rate), port=args.openai_port)
+    print(f"🧪 Fake Elasticsearch: http://127.0.0.1:{es_server.server_port}")
+    print(f"🧪 Fake OpenAI:        http://127.0.0.1:{openai_server.server_port}/v1")
+    print(f"   ES_URL=http://127.0.0.1:{es_server.server_port} OPENAI_BASE_URL=http://127.0.0.1:{openai_server.server_port}/v1 python3 backend.py")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Hybrid (lexical + semantic) search over review_index.
+
+Both retrievers run inside a single Elasticsearch request using the retriever
+API: "rrf" fuses them by reciprocal rank, "linear" by a weighted sum of
+min-max normalized scores. Clusters without the retriever API (or without
+the license for it) get the same two queries through one _msearch request
+instead, fused here in-process with the same formulas - still one round trip.
+Only errors that say the retriever itself is unavailable switch a method to
+the fallback, and it is tried with a retriever again after reprobe_seconds.
+"""
+
+import json
+import re
+import time
+
+from observability import ComponentLogger
+
+log = ComponentLogger("hybrid")
+
+FUSION_METHODS = ("rrf", "linear")
+DEFAULT_WEIGHTS = {"lexical": 0.5, "semantic": 0.5}
+
+# (error type, reason pattern) pairs that mean the cluster cannot run a
+# retriever at all, not that this query is wrong: a retriever type it does not
+# know, a body key it does not know (no retriever API), or a license check
+RETRIEVER_UNSUPPORTED_ERRORS = (
+    (("x_content_parse_exception", "parsing_exception", "illegal_argument_exception"),
+     re.compile(r"unknown retriever \[|unknown (?:field|key) \[retriever\]|unknown key for a \w+ in \[retriever\]")),
+    (("security_exception",), re.compile(r"license")),
+)
+# Seconds before a method the cluster rejected is tried with a retriever again
+DEFAULT_REPROBE_SECONDS = 300
+
+
+def _error_causes(error):
+    """(type, reason) of an ES error and of its root causes and caused_by chain"""
+    causes = []
+    pending = [error]
+    while pending:
+        item = pending.pop()
+        if not isinstance(item, dict):
+            continue
+        causes.append((str(item.get("type", "")), str(item.get("reason", "")).lower()))
+        pending.extend(item.get("root_cause") or [])
+        pending.append(item.get("caused_by"))
+    return causes
+
+
+def retriever_unsupported(status_code, body):
+    """True if an error response says the cluster cannot run the retriever at all"""
+    if status_code not in (400, 403):
+        return False
+    try:
+        error = json.loads(body).get("error")
+    except (ValueError, AttributeError):
+        return False
+    return any(
+        error_type in types and pattern.search(reason)
+        for error_type, reason in _error_causes(error)
+        for types, pattern in RETRIEVER_UNSUPPORTED_ERRORS
+    )
+
+
+def lexical_query(text):
+    """Same multi-match as /keyword-search"""
+    return {
+        "multi_match": {
+            "query": text,
+            "fields": ["title^2", "review_text"],
+            "type": "best_fields",
+            "fuzziness": "AUTO"
+        }
+    }
+
+
+def semantic_query(text):
+    """Same ELSER query as /semantic-search"""
+    return {
+        "semantic": {
+            "field": "review_text.semantic",
+            "query": text
+        }
+    }
+
+
+def rrf_fuse(ranked_lists, size, rank_constant=60):
+    """Reciprocal rank fusion: score = sum over lists of 1 / (rank_constant + rank)"""
+    scores = {}
+    hits_by_id = {}
+    for hits in ranked_lists:
+        for rank, hit in enumerate(hits, 1):
+            scores[hit['_id']] = scores.get(hit['_id'], 0.0) + 1.0 / (rank_constant + rank)
+            hits_by_id.setdefault(hit['_id'], hit)
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:size]
+    return [dict(hits_by_id[doc_id], _score=score) for doc_id, score in ranked]
+
+
+def linear_fuse(ranked_lists, weights, size):
+    """Weighted sum of per-list min-max normalized scores (missing from a list = 0)"""
+    scores = {}
+    hits_by_id = {}
+    for hits, weight in zip(ranked_lists, weights):
+        if not hits:
+            continue
+        raw = [hit.get('_score') or 0.0 for hit in hits]
+        low, high = min(raw), max(raw)
+        for hit, score in zip(hits, raw):
+            normalized = (score - low) / (high - low) if high > low else 1.0
+            scores[hit['_id']] = scores.get(hit['_id'], 0.0) + weight * normalized
+            hits_by_id.setdefault(hit['_id'], hit)
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:size]
+    return [dict(hits_by_id[doc_id], _score=score) for doc_id, score in ranked]
+
+
+class HybridSearcher:
+    """Runs lexical + semantic retrieval in one request and fuses the rankings"""
+
+    def __init__(self, es, index="review_index", rank_window_size=50, rank_constant=60,
+                 reprobe_seconds=DEFAULT_REPROBE_SECONDS):
+        self.es = es
+        self.index = index
+        self.rank_window_size = rank_window_size
+        self.rank_constant = rank_constant
+        self.reprobe_seconds = reprobe_seconds
+        # Fusion method -> monotonic time until which it goes straight to the
+        # fallback (the cluster rejected its retriever)
+        self.unsupported = {}
+
+    def retriever_body(self, text, size, method, weights, source):
+        lexical = {"standard": {"query": lexical_query(text)}}
+        semantic = {"standard": {"query": semantic_query(text)}}
+        if method == "rrf":
+            retriever = {
+                "rrf": {
+                    "retrievers": [lexical, semantic],
+                    "rank_window_size": self.rank_window_size,
+                    "rank_constant": self.rank_constant
+                }
+            }
+        else:
+            retriever = {
+                "linear": {
+                    "retrievers": [
+                        {"retriever": lexical, "weight": weights["lexical"], "normalizer": "minmax"},
+                        {"retriever": semantic, "weight": weights["semantic"], "normalizer": "minmax"}
+                    ],
+                    "rank_window_size": self.rank_window_size
+                }
+            }
+        return {"retriever": retriever, "size": size, "_source": source}
+
+    def _fallback(self, text, size, method, weights, source):
+        response = self.es.msearch(self.index, [
+            {"query": lexical_query(text), "size": self.rank_window_size, "_source": source},
+            {"query": semantic_query(text), "size": self.rank_window_size, "_source": source}
+        ])
+        if response.status_code != 200:
+            return response, None
+        responses = self.es.parse_json(response).get('responses', [])
+        ranked_lists = []
+        for name, item in zip(("lexical", "semantic"), responses):
+            if 'error' in item:
+                # One retriever failing still leaves a usable ranking
+                log.warning("hybrid retriever failed", retriever=name, error=item['error'])
+                ranked_lists.append([])
+            else:
+                ranked_lists.append(item.get('hits', {}).get('hits', []))
+
+        if method == "rrf":
+            hits = rrf_fuse(ranked_lists, size, self.rank_constant)
+        else:
+            hits = linear_fuse(ranked_lists, (weights["lexical"], weights["semantic"]), size)
+        # Like the retrievers' hits.total: every document either list contributed
+        candidates = len({hit['_id'] for ranked in ranked_lists for hit in ranked})
+        return response, {
+            "took": max((item.get('took', 0) for item in responses), default=0),
+            "hits": {"total": {"value": candidates, "relation": "eq"}, "hits": hits},
+            "retriever_hits": {"lexical": len(ranked_lists[0]), "semantic": len(ranked_lists[1])}
+        }
+
+    def search(self, text, size=10, method="rrf", weights=None, source=None):
+        """Return (response, es_data, engine).
+
+        engine is "retriever" when Elasticsearch fused the results and
+        "in_process" for the _msearch fallback; es_data is None on failure.
+        """
+        weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        if time.monotonic() >= self.unsupported.get(method, 0.0):
+            response = self.es.search(self.index, self.retriever_body(text, size, method, weights, source))
+            if response.status_code == 200:
+                self.unsupported.pop(method, None)
+                return response, self.es.parse_json(response), "retriever"
+            if not retriever_unsupported(response.status_code, response.text):
+                return response, None, "retriever"
+            log.warning("retriever not available, fusing in-process", method=method,
+                        status=response.status_code, reprobe_seconds=self.reprobe_seconds)
+            self.unsupported[method] = time.monotonic() + self.reprobe_seconds
+
+        response, es_data = self._fallback(text, size, method, weights, source)
+        return response, es_data, "in_process"
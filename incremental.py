@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Checkpoint for processing review_index incrementally.
+
+Background jobs that maintain derived data (materialized pros/cons, rollups)
+only need the reviews indexed since their last run. Reviews carry a `date`
+(day resolution), so the checkpoint is the latest date processed plus the ids
+already processed on that date; the next run asks for reviews on or after
+that date, excluding those ids.
+
+The id list is capped at MAX_IDS so a bulk load on one date cannot grow the
+checkpoint document and the `must_not` clause without bound. Past the cap
+the tiebreaker becomes the highest _seq_no processed on the date (reviews
+are processed in date, _seq_no order). _seq_no is per shard, so a review a
+lagging shard indexes later on that same date with a lower _seq_no can be
+missed; the exact id list resumes with the next date.
+"""
+
+# Ids kept for the checkpoint date before falling back to the _seq_no watermark
+MAX_IDS = 1000
+
+
+class DateCheckpoint:
+    """High-water mark over review `date` plus the ids (or _seq_no) already seen on that date"""
+
+    # Sort that makes checkpoint advancement safe: date first, then a tiebreaker
+    SORT = [{"date": {"order": "asc"}}, {"_seq_no": {"order": "asc"}}]
+
+    def __init__(self, date=None, ids=None, seq_no=None, capped=False):
+        self.date = date
+        self.ids = set(ids or [])
+        # Highest _seq_no processed on `date`; the tiebreaker once `capped`
+        self.seq_no = seq_no
+        self.capped = capped
+
+    def query(self):
+        """ES query matching only reviews not yet covered by this checkpoint"""
+        if self.date is None:
+            return {"match_all": {}}
+        if self.capped:
+            return {"bool": {"should": [
+                {"range": {"date": {"gt": self.date}}},
+                {"bool": {"filter": [
+                    {"term": {"date": self.date}},
+                    {"range": {"_seq_no": {"gt": self.seq_no}}}
+                ]}}
+            ], "minimum_should_match": 1}}
+        query = {"bool": {"filter": [{"range": {"date": {"gte": self.date}}}]}}
+        if self.ids:
+            query["bool"]["must_not"] = [{"ids": {"values": sorted(self.ids)}}]
+        return query
+
+    def advance(self, hit):
+        """Move the checkpoint past one processed hit (hits must arrive in SORT order)"""
+        date = hit.get('_source', {}).get('date')
+        if date is None:
+            return
+        sort = hit.get('sort') or []
+        seq_no = sort[1] if len(sort) > 1 else None
+        if self.date is None or date > self.date:
+            self.date = date
+            self.ids = {hit['_id']}
+            self.seq_no = seq_no
+            self.capped = False
+        elif date == self.date:
+            if seq_no is not None and (self.seq_no is None or seq_no > self.seq_no):
+                self.seq_no = seq_no
+            if not self.capped:
+                self.ids.add(hit['_id'])
+                if len(self.ids) > MAX_IDS and self.seq_no is not None:
+                    self.ids = set()
+                    self.capped = True
+
+    def to_dict(self):
+        return {"date": self.date, "ids": sorted(self.ids), "seq_no": self.seq_no, "capped": self.capped}
+
+    @classmethod
+    def from_dict(cls, data):
+        data = data or {}
+        return cls(data.get("date"), data.get("ids"), data.get("seq_no"), data.get("capped", False))
@@ -0,0 +1,545 @@
+#!/usr/bin/env python3
+"""
+Restartable bulk loader for review_index and user_profile.
+
+Streams records from a JSONL or CSV file, checks each one against the
+target index's mapping (fetched from the cluster, or the copy of the
+"Elastic build.txt" mapping below when it cannot be read) and sends them in
+parallel _bulk batches capped by document count and size. The input is
+never held in memory.
+
+Every review_text is embedded by ELSER while its _bulk request runs
+(review_text.semantic is a semantic_text field), so large loads are easy to
+push into 429 rejections. The loader backs off from them: concurrency is
+halved on every rejection and grows back one batch at a time after
+successful ones. Items rejected with 429 or 5xx are retried on their own,
+with jittered backoff; items Elasticsearch refuses as invalid are reported
+and skipped.
+
+Progress is checkpointed to a JSON file after each batch: the number of
+input records below which every batch has been indexed. Rerunning the same
+command resumes from there. Documents get deterministic ids (the record's
+"id"/"_id", the username for profiles, or a hash of the content), so the
+few records replayed after a restart are overwritten, not duplicated.
+
+The JSON report gives docs/sec overall and the time spent in _bulk
+requests, Elasticsearch's own processing time, and the ELSER inference time
+taken from the model's deployment stats.
+
+Usage: python3 ingest.py reviews.jsonl
+       python3 ingest.py reviews.csv --batch-docs 200 --workers 4
+       python3 ingest.py profiles.jsonl --index user_profile
+       python3 ingest.py reviews.jsonl --restart     # ignore the checkpoint
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime
+
+import requests
+
+from es_client import ESClient
+from fastjson import dumps, loads
+from resilience import backoff_delay
+
+ELSER_MODEL_ID = ".elser_model_2_linux-x86_64"
+
+# Top-level field types of the mappings created in "Elastic build.txt";
+# used when GET {index}/_mapping is not available
+BUILTIN_MAPPINGS = {
+    "review_index": {
+        "date": "date", "username": "keyword", "location": "keyword", "product": "text",
+        "stars": "integer", "title": "text", "review_text": "text", "helpful_votes": "integer",
+        "verified": "boolean"
+    },
+    "user_profile": {
+        "username": "keyword", "full_name": "text", "age": "integer", "occupation": "text",
+        "location": "keyword", "income_level": "keyword", "annual_income": "integer",
+        "has_credit_card": "boolean", "credit_limit": "integer", "budget_conscious": "boolean",
+        "interests": "keyword", "past_reviews": "nested", "past_purchases": "nested",
+        "preferences": "object"
+    }
+}
+
+# Fields the backend cannot do without
+REQUIRED_FIELDS = {
+    "review_index": ("date", "username", "title", "review_text"),
+    "user_profile": ("username",)
+}
+
+# Source field used as the document id
+ID_FIELDS = {"user_profile": "username"}
+
+INTEGER_TYPES = ("integer", "long", "short", "byte")
+FLOAT_TYPES = ("float", "double", "half_float", "scaled_float")
+STRING_TYPES = ("text", "keyword", "semantic_text", "match_only_text", "wildcard")
+
+# Item statuses worth sending again (rejected execution, overload, shard unavailable)
+RETRY_ITEM_STATUSES = (429, 500, 502, 503, 504)
+RETRY_REQUEST_STATUSES = (429, 502, 503, 504)
+
+
+class IngestError(RuntimeError):
+    """The load stopped; rerun the command to resume from the checkpoint"""
+
+
+class InvalidRecord(ValueError):
+    """A record that does not fit the index mapping"""
+
+
+# Input ----------------------------------------------------------------
+
+def iter_records(path):
+    """Yield dicts from a .csv file (header row) or a JSONL file ("-" for stdin)"""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                # Empty cells mean "no value"
+                yield {key: value for key, value in row.items() if key and value not in (None, "")}
+        return
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in f:
+            if line.strip():
+                try:
+                    yield loads(line)
+                except ValueError as e:
+                    yield InvalidRecord(f"not valid JSON: {e}")
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def load_field_types(es, index):
+    """{field: mapping type} for the index's top-level properties"""
+    try:
+        response = es.get(f"{index}/_mapping", op="get")
+        if response.status_code == 200:
+            body = es.parse_json(response)
+            properties = next(iter(body.values()), {}).get("mappings", {}).get("properties", {})
+            if properties:
+                return {
+                    field: spec.get("type", "object" if "properties" in spec else "keyword")
+                    for field, spec in properties.items()
+                }
+    except requests.exceptions.RequestException:
+        pass
+    if index not in BUILTIN_MAPPINGS:
+        raise IngestError(f"cannot read the mapping of {index} and have no built-in copy of it")
+    print(f"  Using the built-in {index} mapping", file=sys.stderr)
+    return BUILTIN_MAPPINGS[index]
+
+
+def _coerce(field, kind, value):
+    """Value converted to what the mapping type accepts (CSV cells arrive as strings)"""
+    if isinstance(value, list) and kind not in ("nested", "object"):
+        return [_coerce(field, kind, item) for item in value]
+    if kind in STRING_TYPES:
+        if isinstance(value, (dict, list)):
+            raise InvalidRecord(f"{field}: expected a string")
+        return str(value)
+    if kind in INTEGER_TYPES:
+        if isinstance(value, bool):
+            raise InvalidRecord(f"{field}: expected an integer, got {value!r}")
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise InvalidRecord(f"{field}: expected an integer, got {value!r}")
+        if not number.is_integer():
+            raise InvalidRecord(f"{field}: expected an integer, got {value!r}")
+        return int(number)
+    if kind in FLOAT_TYPES:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise InvalidRecord(f"{field}: expected a number, got {value!r}")
+    if kind == "boolean":
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in ("true", "1", "yes"):
+            return True
+        if text in ("false", "0", "no"):
+            return False
+        raise InvalidRecord(f"{field}: expected true/false, got {value!r}")
+    if kind == "date":
+        text = str(value).strip()
+        try:
+            # Both mappings store dates as yyyy-MM-dd
+            if len(text) != 10:
+                raise ValueError(text)
+            date.fromisoformat(text)
+        except ValueError:
+            raise InvalidRecord(f"{field}: expected a yyyy-MM-dd date, got {value!r}")
+        return text
+    if kind in ("nested", "object"):
+        if isinstance(value, str):
+            # CSV cells carry objects as JSON
+            try:
+                value = loads(value)
+            except ValueError:
+                raise InvalidRecord(f"{field}: expected a JSON object")
+        if not isinstance(value, (dict, list)):
+            raise InvalidRecord(f"{field}: expected an object")
+        return value
+    return value
+
+
+def prepare_document(record, index, field_types):
+    """(doc_id, source) for a record, or InvalidRecord"""
+    if isinstance(record, InvalidRecord):
+        raise record
+    if not isinstance(record, dict):
+        raise InvalidRecord("expected a JSON object")
+    record = dict(record)
+    doc_id = record.pop("_id", None) or (record.pop("id", None) if "id" not in field_types else None)
+
+    source = {}
+    for field, value in record.items():
+        kind = field_types.get(field)
+        if kind is None:
+            # Would silently widen the mapping
+            raise InvalidRecord(f"{field}: not in the {index} mapping")
+        source[field] = _coerce(field, kind, value)
+    missing = [field for field in REQUIRED_FIELDS.get(index, ()) if not source.get(field)]
+    if missing:
+        raise InvalidRecord(f"missing {', '.join(missing)}")
+
+    id_field = ID_FIELDS.get(index)
+    if doc_id is None and id_field:
+        doc_id = source.get(id_field)
+    if doc_id is None:
+        doc_id = "review-" + hashlib.sha1(dumps(source).encode("utf-8")).hexdigest()[:20]
+    return str(doc_id), source
+
+
+# Checkpoint -------------------------------------------------------------
+
+class FileCheckpoint:
+    """Input offset below which every record is indexed, kept in a JSON file"""
+
+    def __init__(self, path, input_path, index):
+        self.path = path
+        self.key = {"input": os.path.abspath(input_path) if input_path != "-" else "-", "index": index}
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        if {"input": data.get("input"), "index": data.get("index")} != self.key:
+            raise IngestError(f"{self.path} belongs to another load ({data.get('input')} -> {data.get('index')})")
+        return data.get("offset", 0)
+
+    def save(self, offset, stats):
+        # Written aside and renamed, so a crash never leaves a torn file
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(dict(self.key, offset=offset, updated_at=datetime.utcnow().isoformat(), stats=stats), f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# Backpressure -----------------------------------------------------------
+
+class AdaptiveConcurrency:
+    """Batches allowed in flight: halved on rejection, +1 after `grow_after` clean batches"""
+
+    def __init__(self, maximum, grow_after=4):
+        self.maximum = maximum
+        self.limit = maximum
+        self.grow_after = grow_after
+        self._clean = 0
+        self._lock = threading.Lock()
+        self.reductions = 0
+
+    def rejected(self):
+        with self._lock:
+            self._clean = 0
+            if self.limit > 1:
+                self.limit = max(self.limit // 2, 1)
+                self.reductions += 1
+
+    def succeeded(self):
+        with self._lock:
+            self._clean += 1
+            if self._clean >= self.grow_after and self.limit < self.maximum:
+                self.limit += 1
+                self._clean = 0
+
+
+# Loader -------------------------------------------------------------------
+
+class BulkIngester:
+    """Parallel, size-capped _bulk batches with backpressure, item retries and a checkpoint"""
+
+    def __init__(self, es, index="review_index", batch_docs=500, batch_bytes=5 * 1024 * 1024,
+                 workers=4, max_retries=8, elser_model=ELSER_MODEL_ID):
+        self.es = es
+        self.index = index
+        self.batch_docs = batch_docs
+        self.batch_bytes = batch_bytes
+        self.workers = workers
+        self.max_retries = max_retries
+        self.elser_model = elser_model
+        self.concurrency = AdaptiveConcurrency(workers)
+        self._lock = threading.Lock()
+        self._stats = {
+            "docs_indexed": 0,
+            "docs_invalid": 0,
+            "docs_refused": 0,
+            "batches": 0,
+            "bulk_requests": 0,
+            "rejections": 0,
+            "items_retried": 0,
+            "bulk_seconds": 0.0,
+            "es_took_seconds": 0.0
+        }
+        self.errors = []
+
+    def _count(self, **amounts):
+        with self._lock:
+            for counter, amount in amounts.items():
+                self._stats[counter] += amount
+
+    def _error(self, position, doc_id, reason):
+        with self._lock:
+            if len(self.errors) < 20:
+                self.errors.append({"record": position, "id": doc_id, "error": reason})
+
+    def _batches(self, records, offset, field_types):
+        """Yield (end_offset, [(position, doc_id, action_line, source_line)]) from `offset` on"""
+        batch, size, position = [], 0, offset
+        for position, record in enumerate(records):
+            if position < offset:
+                continue
+            try:
+                doc_id, source = prepare_document(record, self.index, field_types)
+            except InvalidRecord as e:
+                self._count(docs_invalid=1)
+                self._error(position, None, str(e))
+                continue
+            action = dumps({"index": {"_id": doc_id}})
+            line = dumps(source)
+            batch.append((position, doc_id, action, line))
+            size += len(action) + len(line) + 2
+            if len(batch) >= self.batch_docs or size >= self.batch_bytes:
+                yield position + 1, batch
+                batch, size = [], 0
+        if batch:
+            yield position + 1, batch
+
+    def _send(self, items):
+        """Index one batch, retrying rejected requests and items until they succeed or are refused"""
+        pending = items
+        for attempt in range(self.max_retries + 1):
+            body = "".join(f"{action}\n{line}\n" for _, _, action, line in pending)
+            request_start = time.perf_counter()
+            try:
+                response = self.es.bulk(self.index, body)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                reason = str(e)
+                response = None
+            self._count(bulk_requests=1, bulk_seconds=time.perf_counter() - request_start)
+
+            if response is not None and response.status_code == 200:
+                result = self.es.parse_json(response)
+                self._count(es_took_seconds=(result.get("took") or 0) / 1000)
+                retry = []
+                indexed = 0
+                throttled = False
+                for item, outcome in zip(pending, result.get("items", [])):
+                    outcome = next(iter(outcome.values()), {})
+                    status = outcome.get("status", 500)
+                    if status < 300:
+                        indexed += 1
+                    elif status in RETRY_ITEM_STATUSES:
+                        throttled = throttled or status == 429
+                        retry.append(item)
+                    else:
+                        self._count(docs_refused=1)
+                        self._error(item[0], item[1], outcome.get("error"))
+                self._count(docs_indexed=indexed)
+                if not retry:
+                    self.concurrency.succeeded()
+                    return
+                if throttled:
+                    self._count(rejections=1)
+                    self.concurrency.rejected()
+                self._count(items_retried=len(retry))
+                pending = retry
+                reason = f"{len(retry)} items rejected"
+            elif response is not None and response.status_code not in RETRY_REQUEST_STATUSES:
+                raise IngestError(f"_bulk failed with HTTP {response.status_code}: {response.text[:500]}")
+            elif response is not None:
+                reason = f"HTTP {response.status_code}"
+                if response.status_code == 429:
+                    self._count(rejections=1)
+                self.concurrency.rejected()
+            else:
+                self.concurrency.rejected()
+
+            time.sleep(backoff_delay(attempt, base=0.5, cap=30.0))
+        raise IngestError(f"gave up on {len(pending)} documents after {self.max_retries} retries ({reason})")
+
+    def _elser_inference(self):
+        """(inference count, inference ms) summed over the ELSER deployment's nodes, or None"""
+        try:
+            response = self.es.get(f"_ml/trained_models/{self.elser_model}/_stats", op="get")
+            if response.status_code != 200:
+                return None
+            count = total_ms = 0
+            for model in self.es.parse_json(response).get("trained_model_stats", []):
+                for node in model.get("deployment_stats", {}).get("nodes", []):
+                    node_count = node.get("inference_count", 0)
+                    count += node_count
+                    total_ms += node_count * node.get("average_inference_time_ms", 0)
+            return count, total_ms
+        except requests.exceptions.RequestException:
+            return None
+
+    def run(self, records, checkpoint=None):
+        """Load `records`, resuming from the checkpoint; returns the throughput report"""
+        field_types = load_field_types(self.es, self.index)
+        offset = checkpoint.load() if checkpoint else 0
+        if offset:
+            print(f"  Resuming after record {offset}", file=sys.stderr)
+        elser_before = self._elser_inference()
+        run_start = time.time()
+
+        # Batches finish out of order; the checkpoint only moves past a batch
+        # once every batch before it is done too
+        in_flight = {}
+        finished = {}
+        order = deque()
+        committed = offset
+        failure = None
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bulk") as pool:
+            def collect(block):
+                nonlocal committed, failure
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED if block else ALL_COMPLETED)
+                for future in done:
+                    end_offset = in_flight.pop(future)
+                    try:
+                        future.result()
+                        finished[end_offset] = True
+                    except Exception as e:
+                        failure = failure or e
+                while order and finished.pop(order[0], False):
+                    committed = order.popleft()
+                    self._count(batches=1)
+                    if checkpoint:
+                        checkpoint.save(committed, self.stats())
+
+            for end_offset, batch in self._batches(records, offset, field_types):
+                while len(in_flight) >= self.concurrency.limit and failure is None:
+                    collect(block=True)
+                if failure is not None:
+                    break
+                order.append(end_offset)
+                in_flight[pool.submit(self._send, batch)] = end_offset
+            if in_flight:
+                collect(block=False)
+
+        elapsed = time.time() - run_start
+        elser_after = self._elser_inference() if elser_before is not None else None
+        report = self.report(offset, committed, elapsed, elser_before, elser_after)
+        if failure is not None:
+            report["error"] = str(failure)
+            print(f"  Ingest stopped at record {committed}: {failure}", file=sys.stderr)
+        return report
+
+    def stats(self):
+        with self._lock:
+            return {key: round(value, 3) if isinstance(value, float) else value
+                    for key, value in self._stats.items()}
+
+    def report(self, resumed_from, offset, elapsed, elser_before, elser_after):
+        stats = self.stats()
+        report = dict(
+            stats,
+            index=self.index,
+            resumed_from=resumed_from,
+            offset=offset,
+            elapsed_seconds=round(elapsed, 3),
+            docs_per_second=round(stats["docs_indexed"] / elapsed, 1) if elapsed else 0.0,
+            final_concurrency=self.concurrency.limit,
+            concurrency_reductions=self.concurrency.reductions,
+            elser=None,
+            errors=list(self.errors)
+        )
+        if elser_before is not None and elser_after is not None:
+            # Deployment-wide counters: concurrent semantic searches are included
+            inference_seconds = (elser_after[1] - elser_before[1]) / 1000
+            report["elser"] = {
+                "model_id": self.elser_model,
+                "inferences": elser_after[0] - elser_before[0],
+                "inference_seconds": round(inference_seconds, 3),
+                "share_of_es_time": round(inference_seconds / stats["es_took_seconds"], 3)
+                if stats["es_took_seconds"] else None
+            }
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load reviews or user profiles into Elasticsearch")
+    parser.add_argument("input", help="JSONL or .csv file ('-' reads JSONL from stdin)")
+    parser.add_argument("--index", default="review_index", help="target index (review_index or user_profile)")
+    parser.add_argument("--batch-docs", type=int, default=500, help="documents per _bulk request")
+    parser.add_argument("--batch-mb", type=float, default=5.0, help="maximum _bulk body size in MB")
+    parser.add_argument("--workers", type=int, default=4, help="maximum concurrent _bulk requests")
+    parser.add_argument("--max-retries", type=int, default=8, help="retries per batch before the load stops")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <input>.<index>.checkpoint.json)")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and load from the start")
+    parser.add_argument("--elser-model", default=ELSER_MODEL_ID, help="trained model whose inference time is reported")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    es = ESClient(
+        os.environ.get("ES_URL", "<YOUR ES URL>"),
+        os.environ.get("ES_API_KEY", "<YOUR ES API KEY>"),
+        pool_size=args.workers + 2,
+        timeouts={"bulk": float(os.environ.get("ES_BULK_TIMEOUT", "120"))}
+    )
+    checkpoint = None
+    if args.input != "-":
+        checkpoint = FileCheckpoint(args.checkpoint or f"{args.input}.{args.index}.checkpoint.json",
+                                    args.input, args.index)
+        if args.restart:
+            checkpoint.clear()
+
+    ingester = BulkIngester(
+        es,
+        index=args.index,
+        batch_docs=args.batch_docs,
+        batch_bytes=int(args.batch_mb * 1024 * 1024),
+        workers=args.workers,
+        max_retries=args.max_retries,
+        elser_model=args.elser_model
+    )
+    print(f"📥 Loading {args.input} into {args.index} ({args.workers} workers, {args.batch_docs} docs per batch)",
+          file=sys.stderr)
+    report = ingester.run(iter_records(args.input), checkpoint)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    sys.exit(1 if "error" in report else 0)
+
+
+if __name__ == '__main__':
+    main()
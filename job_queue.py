@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Persistent job queue for long-running requests (agentic summaries).
+
+A POST enqueues a job and returns its id at once. A bounded pool of worker
+threads runs the jobs in priority order (then oldest first), so LLM work
+drains in the background instead of holding a request thread per caller;
+clients poll or long-poll the job for its result.
+
+Jobs live in a local SQLite file, which keeps queued work across restarts
+and lets every worker process on the host share one queue: a job is claimed
+with a conditional UPDATE, so exactly one worker runs it. Running jobs send
+a heartbeat; a job whose worker stopped heartbeating (crash, restart) is put
+back in the queue, up to max_attempts runs.
+
+Cancelling a queued job removes it from the queue. A running job cannot be
+interrupted mid-call; it is marked cancelled and its result discarded.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from observability import ComponentLogger
+
+log = ComponentLogger("job_queue")
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+
+
+class QueueFull(RuntimeError):
+    """Too many jobs are waiting; the caller should retry later"""
+
+
+class JobQueue:
+    """SQLite-backed priority queue of jobs with status, result and cancellation"""
+
+    def __init__(self, path, table="jobs", max_queued=1000, stale_seconds=60, max_attempts=3,
+                 retention_seconds=86400):
+        self.path = path
+        self.table = table
+        self.max_queued = max_queued
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        # Signalled when a job is added or finishes in this process
+        self._changed = threading.Condition(self._lock)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+            "priority INTEGER NOT NULL, status TEXT NOT NULL, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL, heartbeat_at REAL, "
+            "owner TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+            "cancel_requested INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_queue ON {table} (status, priority, created_at)"
+        )
+        self._conn.commit()
+
+    def _row(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        job["priority"] = next((name for name, value in PRIORITIES.items() if value == job["priority"]),
+                               job["priority"])
+        return job
+
+    def enqueue(self, kind, payload, priority="normal"):
+        """Add a job and return its id; raises QueueFull past max_queued waiting jobs"""
+        job_id = uuid.uuid4().hex
+        with self._changed:
+            queued = self._conn.execute(
+                f"SELECT COUNT(*) FROM {self.table} WHERE status = 'queued'"
+            ).fetchone()[0]
+            if queued >= self.max_queued:
+                raise QueueFull(f"{queued} jobs are already queued")
+            self._conn.execute(
+                f"INSERT INTO {self.table} (id, kind, payload, priority, status, created_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, kind, json.dumps(payload), PRIORITIES[priority], time.time())
+            )
+            self._conn.commit()
+            self._changed.notify_all()
+        return job_id
+
+    def claim(self):
+        """Take the most urgent queued job for this process, or None"""
+        with self._lock:
+            while True:
+                row = self._conn.execute(
+                    f"SELECT id FROM {self.table} WHERE status = 'queued' "
+                    "ORDER BY priority, created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                # Another process may have claimed it in between
+                claimed = self._conn.execute(
+                    f"UPDATE {self.table} SET status = 'running', started_at = ?, heartbeat_at = ?, "
+                    "owner = ?, attempts = attempts + 1 WHERE id = ? AND status = 'queued'",
+                    (now, now, self.owner, row["id"])
+                ).rowcount
+                self._conn.commit()
+                if claimed:
+                    return self._row(self._conn.execute(
+                        f"SELECT * FROM {self.table} WHERE id = ?", (row["id"],)
+                    ).fetchone())
+
+    def heartbeat(self, job_ids):
+        """Mark running jobs as still alive"""
+        if not job_ids:
+            return
+        with self._lock:
+            self._conn.executemany(
+                f"UPDATE {self.table} SET heartbeat_at = ? WHERE id = ? AND status = 'running'",
+                [(time.time(), job_id) for job_id in job_ids]
+            )
+            self._conn.commit()
+
+    def finish(self, job_id, status, result=None, error=None):
+        """Store the outcome of a running job (a cancel request turns it into "cancelled")"""
+        with self._changed:
+            self._conn.execute(
+                f"UPDATE {self.table} SET "
+                "status = CASE WHEN cancel_requested THEN 'cancelled' ELSE ? END, "
+                "result = CASE WHEN cancel_requested THEN NULL ELSE ? END, "
+                "error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+            self._conn.commit()
+            self._changed.notify_all()
+
+    def cancel(self, job_id):
+        """Cancel a job; returns its new state, or None if there is no such job"""
+        with self._changed:
+            self._conn.execute(
+                f"UPDATE {self.table} SET status = 'cancelled', finished_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            )
+            self._conn.execute(
+                f"UPDATE {self.table} SET cancel_requested = 1 WHERE id = ? AND status = 'running'",
+                (job_id,)
+            )
+            self._conn.commit()
+            self._changed.notify_all()
+            return self._row(self._conn.execute(
+                f"SELECT * FROM {self.table} WHERE id = ?", (job_id,)
+            ).fetchone())
+
+    def get(self, job_id):
+        with self._lock:
+            return self._row(self._conn.execute(
+                f"SELECT * FROM {self.table} WHERE id = ?", (job_id,)
+            ).fetchone())
+
+    def wait(self, job_id, timeout):
+        """Return the job once it is finished or `timeout` seconds have passed"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in FINISHED_STATES or remaining <= 0:
+                return job
+            with self._changed:
+                # Woken by jobs finishing here; jobs run by other processes are seen on the next check
+                self._changed.wait(min(remaining, 0.5))
+
+    def position(self, job_id):
+        """Number of queued jobs that run before this one"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT priority, created_at FROM {self.table} WHERE id = ? AND status = 'queued'", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM {self.table} WHERE status = 'queued' AND "
+                "(priority < ? OR (priority = ? AND created_at < ?))",
+                (row["priority"], row["priority"], row["created_at"])
+            ).fetchone()[0]
+
+    def maintain(self):
+        """Requeue jobs whose worker stopped heartbeating and drop old finished jobs"""
+        now = time.time()
+        with self._changed:
+            requeued = self._conn.execute(
+                f"UPDATE {self.table} SET status = 'queued', owner = NULL "
+                "WHERE status = 'running' AND heartbeat_at < ? AND attempts < ? AND NOT cancel_requested",
+                (now - self.stale_seconds, self.max_attempts)
+            ).rowcount
+            abandoned = self._conn.execute(
+                f"UPDATE {self.table} SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'failed' END, "
+                "error = 'worker stopped before the job finished', finished_at = ? "
+                "WHERE status = 'running' AND heartbeat_at < ?",
+                (now, now - self.stale_seconds)
+            ).rowcount
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE status IN ('succeeded', 'failed', 'cancelled') "
+                "AND finished_at < ?",
+                (now - self.retention_seconds,)
+            )
+            self._conn.commit()
+            if requeued:
+                self._changed.notify_all()
+        if requeued or abandoned:
+            log.warning("recovered jobs of stopped workers", requeued=requeued, failed=abandoned)
+        return requeued
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute(
+                f"SELECT status, COUNT(*) FROM {self.table} GROUP BY status"
+            ).fetchall())
+            oldest = self._conn.execute(
+                f"SELECT MIN(created_at) FROM {self.table} WHERE status = 'queued'"
+            ).fetchone()[0]
+        return {
+            "path": self.path,
+            "counts": {state: counts.get(state, 0) for state in ("queued", "running") + FINISHED_STATES},
+            "oldest_queued_seconds": round(time.time() - oldest, 1) if oldest else None,
+            "max_queued": self.max_queued
+        }
+
+
+class JobWorkers:
+    """Bounded pool of threads running queued jobs with handlers[kind](job_id, payload)"""
+
+    def __init__(self, queue, handlers, workers=4, heartbeat_seconds=10):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.heartbeat_seconds = heartbeat_seconds
+        self._running = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._stats = {"started": 0, "succeeded": 0, "failed": 0}
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def _work(self):
+        while not self._stop.is_set():
+            job = self.queue.claim()
+            if job is None:
+                with self.queue._changed:
+                    # New jobs from this process wake us; others are picked up within a second
+                    self.queue._changed.wait(1.0)
+                continue
+            with self._lock:
+                self._running[job["id"]] = job["kind"]
+            self._count("started")
+            try:
+                status, result = self.handlers[job["kind"]](job["id"], job["payload"])
+                self.queue.finish(job["id"], status, result=result,
+                                  error=None if status == "succeeded" else (result or {}).get("message"))
+                self._count(status if status in ("succeeded", "failed") else "failed")
+            except Exception as e:
+                log.error("job failed", job_id=job["id"], kind=job["kind"], error=str(e))
+                self.queue.finish(job["id"], "failed", error=str(e))
+                self._count("failed")
+            finally:
+                with self._lock:
+                    self._running.pop(job["id"], None)
+
+    def _maintain(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                with self._lock:
+                    running = list(self._running)
+                self.queue.heartbeat(running)
+                self.queue.maintain()
+            except Exception as e:
+                log.error("job queue maintenance failed", error=str(e))
+
+    def start(self):
+        """Requeue work left by stopped workers, then start the threads"""
+        if self._threads:
+            return
+        self._stop.clear()
+        self.queue.maintain()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        self._threads.append(threading.Thread(target=self._maintain, name="job-heartbeat", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, running=len(self._running))
+        stats["workers"] = self.workers
+        stats["alive"] = sum(1 for thread in self._threads if thread.is_alive())
+        return stats
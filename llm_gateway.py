@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Admission control and fair queueing for OpenAI calls.
+
+Every chat completion asks the LLMGateway for a permit first. Permits are
+limited by two token buckets - requests per minute and estimated tokens
+per minute, sized to the account's OpenAI limits - and by the number of
+calls in flight. A burst therefore waits here, in order, instead of hitting
+the provider's rate limits and failing slowly all together.
+
+Waiting calls are queued per flow, an (endpoint, user) pair taken from the
+current contextvars context (see flow_scope()). Permits are handed out
+round-robin across endpoints and, within an endpoint, across users, so one
+busy user or a batch job cannot starve everyone else.
+
+A call is rejected at once with GatewayRejected when the queue is full or
+when the time until the buckets could admit it is longer than it may wait;
+a call still waiting when its timeout runs out is rejected too. The
+gateway reports queue depth, wait times and rejections by reason.
+"""
+
+import contextvars
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# Calls made outside any request (materializer, map-reduce chunks) share this flow
+BACKGROUND_FLOW = ("background", "-")
+
+_current_flow = contextvars.ContextVar("llm_flow", default=BACKGROUND_FLOW)
+
+
+def current_flow():
+    """(endpoint, user) that LLM calls in this context are queued under"""
+    return _current_flow.get()
+
+
+def set_current_flow(flow):
+    """Make `flow` current; returns a token for reset_current_flow()"""
+    return _current_flow.set(flow)
+
+
+def reset_current_flow(token):
+    _current_flow.reset(token)
+
+
+@contextmanager
+def flow_scope(flow):
+    """Queue LLM calls made in this block under `flow`"""
+    token = _current_flow.set(flow)
+    try:
+        yield
+    finally:
+        _current_flow.reset(token)
+
+
+class GatewayRejected(RuntimeError):
+    """The gateway is over capacity; the call was not sent to the provider"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"LLM gateway over capacity ({reason}), retry in {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Refills at rate_per_minute, holding at most burst_seconds worth; 0 means unlimited"""
+
+    def __init__(self, rate_per_minute, burst_seconds=10.0):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(self.rate * burst_seconds, 1.0) if rate_per_minute else 0.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now):
+        if self.rate:
+            self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def fit(self, amount):
+        """Largest charge the bucket can ever admit"""
+        return min(amount, self.capacity) if self.rate else amount
+
+    def seconds_until(self, amount):
+        """Time until `amount` is available (the bucket must be refilled first)"""
+        if not self.rate or self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        if self.rate:
+            self.level -= amount
+
+    def give(self, amount):
+        """Return an over-estimated charge (negative amounts charge more)"""
+        if self.rate:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class _Ticket:
+    __slots__ = ("flow", "tokens", "enqueued", "granted")
+
+    def __init__(self, flow, tokens):
+        self.flow = flow
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.granted = False
+
+
+class Permit:
+    """Admission for one call; release() it when the call is done"""
+
+    def __init__(self, gateway, flow, tokens, waited):
+        self.gateway = gateway
+        self.flow = flow
+        self.tokens = tokens
+        self.waited = waited
+        self._released = False
+
+    def release(self, used_tokens=None):
+        """Free the in-flight slot; used_tokens (when known) corrects the token estimate"""
+        if not self._released:
+            self._released = True
+            self.gateway._release(self, used_tokens)
+
+
+class LLMGateway:
+    """Token-bucket admission control with round-robin queueing across endpoints and users"""
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, max_in_flight=0, max_queue=100,
+                 burst_seconds=10.0, name="openai"):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute, burst_seconds)
+        self.tokens = TokenBucket(tokens_per_minute, burst_seconds)
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        # Called with (flow, wait_seconds, outcome) for every admission decision
+        self.observer = None
+        self._cond = threading.Condition()
+        # endpoint -> user -> waiting tickets; both levels rotate round-robin
+        self._queues = OrderedDict()
+        self._queued = 0
+        self._in_flight = 0
+        self._stats = {"admitted": 0, "queued": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+                       "estimated_tokens": 0, "used_tokens": 0}
+        self._rejected = {}
+
+    def _next_ticket(self):
+        """Head ticket of the next user of the next endpoint, without removing it"""
+        for users in self._queues.values():
+            for tickets in users.values():
+                return tickets[0]
+        return None
+
+    def _pop(self, ticket):
+        """Remove the granted ticket and rotate its endpoint and user to the back"""
+        endpoint, user = ticket.flow
+        users = self._queues[endpoint]
+        users[user].popleft()
+        if users[user]:
+            users.move_to_end(user)
+        else:
+            del users[user]
+        if users:
+            self._queues.move_to_end(endpoint)
+        else:
+            del self._queues[endpoint]
+        self._queued -= 1
+
+    def _remove(self, ticket):
+        endpoint, user = ticket.flow
+        users = self._queues[endpoint]
+        users[user].remove(ticket)
+        if not users[user]:
+            del users[user]
+            if not users:
+                del self._queues[endpoint]
+        self._queued -= 1
+
+    def _admissible_in(self, tokens):
+        """Seconds until both buckets hold enough for one call of `tokens`"""
+        return max(self.requests.seconds_until(1), self.tokens.seconds_until(tokens))
+
+    def _dispatch(self):
+        """Grant tickets in fair order while capacity lasts; returns seconds until the next may fit"""
+        now = time.monotonic()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        while True:
+            ticket = self._next_ticket()
+            if ticket is None:
+                return None
+            if self.max_in_flight and self._in_flight >= self.max_in_flight:
+                # Woken by a release
+                return None
+            delay = self._admissible_in(ticket.tokens)
+            if delay > 0:
+                return delay
+            self.requests.take(1)
+            self.tokens.take(ticket.tokens)
+            self._in_flight += 1
+            ticket.granted = True
+            self._pop(ticket)
+            self._cond.notify_all()
+
+    def _reject(self, flow, reason, retry_after, waited=0.0):
+        self._rejected[reason] = self._rejected.get(reason, 0) + 1
+        if self.observer:
+            self.observer(flow, waited, f"rejected_{reason}")
+        raise GatewayRejected(reason, retry_after)
+
+    def _backlog_seconds(self, tokens, flow):
+        """Rough time until a new call of `tokens` from `flow` would be admitted: round-robin
+        serves about as many calls of every other flow as are already queued in this one"""
+        endpoint, user = flow
+        turn = len(self._queues.get(endpoint, {}).get(user, ())) + 1
+        pending_requests, pending_tokens = 1, tokens
+        for users in self._queues.values():
+            for tickets in users.values():
+                ahead = list(tickets)[:turn]
+                pending_requests += len(ahead)
+                pending_tokens += sum(ticket.tokens for ticket in ahead)
+        return max(self.requests.seconds_until(pending_requests), self.tokens.seconds_until(pending_tokens))
+
+    def acquire(self, tokens, timeout, flow=None):
+        """Wait (at most `timeout` seconds) for a permit to send a call of about `tokens` tokens.
+
+        Raises GatewayRejected when the call cannot be admitted in time.
+        """
+        flow = flow or current_flow()
+        tokens = self.tokens.fit(tokens)
+        with self._cond:
+            self._dispatch()
+            if self._queued >= self.max_queue:
+                self._reject(flow, "queue_full", self._backlog_seconds(tokens, flow) or 1.0)
+            backlog = self._backlog_seconds(tokens, flow)
+            if backlog > timeout:
+                # Would time out in the queue anyway - say so now
+                self._reject(flow, "over_capacity", backlog)
+            ticket = _Ticket(flow, tokens)
+            self._queues.setdefault(flow[0], OrderedDict()).setdefault(flow[1], deque()).append(ticket)
+            self._queued += 1
+            self._stats["queued"] += 1
+            deadline = ticket.enqueued + timeout
+            while True:
+                delay = self._dispatch()
+                if ticket.granted:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._remove(ticket)
+                    self._reject(flow, "queue_timeout", self._backlog_seconds(tokens, flow) or 1.0, timeout)
+                self._cond.wait(min(remaining, delay) if delay else remaining)
+            waited = time.monotonic() - ticket.enqueued
+            self._stats["admitted"] += 1
+            self._stats["wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+            self._stats["estimated_tokens"] += tokens
+        if self.observer:
+            self.observer(flow, waited, "admitted")
+        return Permit(self, flow, tokens, waited)
+
+    def _release(self, permit, used_tokens):
+        with self._cond:
+            self._in_flight -= 1
+            if used_tokens is not None:
+                self._stats["used_tokens"] += used_tokens
+                self.tokens.give(permit.tokens - used_tokens)
+            else:
+                self._stats["used_tokens"] += permit.tokens
+            self._dispatch()
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            stats = dict(self._stats)
+            stats.update({
+                "name": self.name,
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": self._queued,
+                "queue_depth_by_endpoint": {
+                    endpoint: sum(len(tickets) for tickets in users.values())
+                    for endpoint, users in self._queues.items()
+                },
+                "waiting_users": sum(len(users) for users in self._queues.values()),
+                "requests_available": round(self.requests.level, 1) if self.requests.rate else None,
+                "tokens_available": int(self.tokens.level) if self.tokens.rate else None,
+                "rejected": dict(self._rejected)
+            })
+        stats["avg_wait_ms"] = round(stats["wait_seconds"] / stats["admitted"] * 1000, 1) if stats["admitted"] else 0.0
+        stats["max_wait_ms"] = round(stats.pop("max_wait_seconds") * 1000, 1)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        return stats
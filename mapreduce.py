@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Map-reduce summarization of the full review corpus for the Agentic AI mode.
+
+Instead of packing an arbitrary 100 reviews into one prompt, every matching
+review is streamed from Elasticsearch (see ESClient.scan) and:
+
+1. map    - fixed-size chunks are summarized into weighted pros/cons lists,
+            in parallel under a concurrency limit, while later pages are
+            still being fetched
+2. reduce - partial lists are merged in a tree (fan_in partials per call)
+            until one list remains
+3. final  - the merged pros/cons + the user profile go through the regular
+            agentic prompt to produce the 3 pros, 3 cons and recommendation
+"""
+
+import json
+import threading
+import time
+
+from agentic import AGENTIC_SYSTEM_PROMPT, build_reviews_text, build_user_context, select_guidance
+from observability import ComponentLogger
+from resilience import ContextThreadPoolExecutor
+
+log = ComponentLogger("mapreduce")
+
+# Completion settings for map and reduce calls
+MAPREDUCE_COMPLETION_OPTIONS = {
+    "model": "gpt-3.5-turbo",
+    "max_tokens": 600,
+    "temperature": 0.2,
+    "response_format": {"type": "json_object"}
+}
+
+MAP_SYSTEM_PROMPT = """You are an expert product analyst. Read the provided Apple Watch Series 10 reviews and list the main pros and cons they mention.
+
+Your response must be in this exact JSON format:
+{
+    "pros": [{"point": "Short specific pro", "mentions": 3, "reviews": [1, 4, 7]}],
+    "cons": [{"point": "Short specific con", "mentions": 2, "reviews": [2, 5]}]
+}
+
+Rules:
+1. "mentions" is the number of reviews in this batch that raise the point
+2. "reviews" lists the numbers of the reviews that raise the point
+3. Merge points that mean the same thing
+4. List at most 8 pros and 8 cons, most mentioned first"""
+
+REDUCE_SYSTEM_PROMPT = """You are an expert product analyst. You are given numbered pros (P1, P2, ...) and cons (C1, C2, ...), each extracted from a different batch of Apple Watch Series 10 reviews, with the number of reviews mentioning each point.
+
+Merge them into a single list in this exact JSON format:
+{
+    "pros": [{"point": "Short specific pro", "sources": ["P1", "P4"]}],
+    "cons": [{"point": "Short specific con", "sources": ["C2"]}]
+}
+
+Rules:
+1. Combine points that mean the same thing and list every numbered point you combined in "sources"
+2. Keep the wording specific
+3. List at most 8 pros and 8 cons, most mentioned first"""
+
+# Review ids kept per point as evidence
+MAX_EVIDENCE = 5
+
+
+class MapFailed(RuntimeError):
+    """Raised when no map chunk produced a partial, so there is nothing to reduce"""
+
+
+def iter_chunks(items, chunk_size):
+    """Group any iterable into lists of chunk_size items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def merge_locally(partials, keep_points=8):
+    """Merge partial pros/cons lists without an LLM (exact-text match, summed mentions)"""
+    merged = {}
+    for side in ("pros", "cons"):
+        totals = {}
+        labels = {}
+        evidence = {}
+        for partial in partials:
+            for item in partial.get(side, []):
+                key = " ".join(item["point"].lower().split())
+                totals[key] = totals.get(key, 0) + item["mentions"]
+                labels.setdefault(key, item["point"])
+                ids = evidence.setdefault(key, [])
+                ids.extend(i for i in item.get("evidence", []) if i not in ids)
+        ranked = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:keep_points]
+        merged[side] = [
+            {"point": labels[key], "mentions": mentions, "evidence": evidence[key][:MAX_EVIDENCE]}
+            for key, mentions in ranked
+        ]
+    return merged
+
+
+class MapReduceSummarizer:
+    """Parallel chunked pros/cons extraction over an arbitrarily large review stream"""
+
+    def __init__(self, complete, chunk_size=50, max_concurrency=8, fan_in=8, keep_points=8):
+        # complete(messages, **options) -> completion text
+        self.complete = complete
+        self.chunk_size = chunk_size
+        self.max_concurrency = max_concurrency
+        self.fan_in = max(fan_in, 2)
+        self.keep_points = keep_points
+        # Context-copying, so chunk calls keep the caller's deadline and LLM gateway flow
+        self._executor = ContextThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="mapreduce")
+
+    def _parse_partial(self, content, chunk):
+        """Validate a map answer into {"pros": [...], "cons": [...]}.
+
+        Reviews are cited by their number in the chunk; those are translated
+        to review ids so evidence survives later merges.
+        """
+        data = json.loads(content)
+        partial = {}
+        for side in ("pros", "cons"):
+            items = []
+            for item in data.get(side, []):
+                if isinstance(item, str):
+                    item = {"point": item, "mentions": 1}
+                point = str(item.get("point", "")).strip()
+                if not point:
+                    continue
+                evidence = [
+                    chunk[number - 1]['_id'] for number in item.get("reviews", [])
+                    if isinstance(number, int) and 1 <= number <= len(chunk)
+                ]
+                items.append({
+                    "point": point,
+                    "mentions": max(int(item.get("mentions", 1) or 1), 1),
+                    "evidence": list(dict.fromkeys(evidence))[:MAX_EVIDENCE]
+                })
+            items.sort(key=lambda item: item["mentions"], reverse=True)
+            partial[side] = items[:self.keep_points]
+        return partial
+
+    def _map_chunk(self, chunk):
+        content = self.complete(
+            [
+                {"role": "system", "content": MAP_SYSTEM_PROMPT},
+                {"role": "user", "content": f"Reviews ({len(chunk)}):\n\n{build_reviews_text(chunk)}"}
+            ],
+            **MAPREDUCE_COMPLETION_OPTIONS
+        )
+        return self._parse_partial(content, chunk)
+
+    def _reduce_group(self, group):
+        if len(group) == 1:
+            return group[0]
+
+        # Points are referenced by label so mentions and evidence are summed
+        # locally and exactly, whatever wording the model picks
+        labeled = {}
+        lines = []
+        for side, prefix in (("pros", "P"), ("cons", "C")):
+            lines.append(f"{side.capitalize()}:")
+            for item in (item for partial in group for item in partial.get(side, [])):
+                label = f"{prefix}{len(labeled) + 1}"
+                labeled[label] = item
+                lines.append(f"{label}: {item['point']} ({item['mentions']} mentions)")
+
+        try:
+            content = self.complete(
+                [
+                    {"role": "system", "content": REDUCE_SYSTEM_PROMPT},
+                    {"role": "user", "content": "\n".join(lines)}
+                ],
+                **MAPREDUCE_COMPLETION_OPTIONS
+            )
+            data = json.loads(content)
+            merged = {}
+            for side in ("pros", "cons"):
+                items = []
+                for item in data.get(side, []):
+                    sources = [labeled[label] for label in item.get("sources", []) if label in labeled]
+                    point = str(item.get("point", "")).strip()
+                    if not point or not sources:
+                        continue
+                    evidence = [i for source in sources for i in source.get("evidence", [])]
+                    items.append({
+                        "point": point,
+                        "mentions": sum(source["mentions"] for source in sources),
+                        "evidence": list(dict.fromkeys(evidence))[:MAX_EVIDENCE]
+                    })
+                items.sort(key=lambda item: item["mentions"], reverse=True)
+                merged[side] = items[:self.keep_points]
+            return merged
+        except Exception as e:
+            log.warning("map-reduce merge failed, merging locally", partials=len(group), error=str(e))
+            return merge_locally(group, self.keep_points)
+
+    def summarize(self, reviews):
+        """Map-reduce an iterable of review hits into one weighted pros/cons list.
+
+        Returns (merged, stats). Chunks are submitted as soon as they are read,
+        with at most 2 * max_concurrency chunks buffered, so fetching from ES
+        overlaps with LLM calls and memory stays bounded. Raises MapFailed
+        when every chunk failed.
+        """
+        stats = {"reviews": 0, "chunks": 0, "failed_chunks": 0, "reduce_rounds": 0}
+        map_start = time.time()
+
+        in_flight = threading.BoundedSemaphore(self.max_concurrency * 2)
+        futures = []
+        for chunk in iter_chunks(reviews, self.chunk_size):
+            stats["reviews"] += len(chunk)
+            stats["chunks"] += 1
+            in_flight.acquire()
+            future = self._executor.submit(self._map_chunk, chunk)
+            future.add_done_callback(lambda _: in_flight.release())
+            futures.append(future)
+
+        partials = []
+        for future in futures:
+            try:
+                partials.append(future.result())
+            except Exception as e:
+                stats["failed_chunks"] += 1
+                log.warning("map-reduce chunk failed", error=str(e))
+        stats["map_ms"] = int((time.time() - map_start) * 1000)
+        if stats["chunks"] and not partials:
+            raise MapFailed(f"all {stats['chunks']} map-reduce chunks failed")
+
+        reduce_start = time.time()
+        merged, stats["reduce_rounds"] = self.reduce(partials)
+        stats["reduce_ms"] = int((time.time() - reduce_start) * 1000)
+        return merged, stats
+
+    def reduce(self, partials):
+        """Tree-merge partial pros/cons lists; returns (merged, rounds)"""
+        rounds = 0
+        while len(partials) > 1:
+            groups = [partials[i:i + self.fan_in] for i in range(0, len(partials), self.fan_in)]
+            partials = list(self._executor.map(self._reduce_group, groups))
+            rounds += 1
+        merged = partials[0] if partials else {"pros": [], "cons": []}
+        return merged, rounds
+
+    def final_messages(self, username, user_profile, merged, total_reviews):
+        """Agentic prompt built from the merged pros/cons instead of raw reviews"""
+        lines = ["Most mentioned pros:"]
+        lines += [f"- {item['point']} ({item['mentions']} mentions)" for item in merged.get("pros", [])]
+        lines.append("\nMost mentioned cons:")
+        lines += [f"- {item['point']} ({item['mentions']} mentions)" for item in merged.get("cons", [])]
+        points_text = "\n".join(lines)
+
+        return [
+            {
+                "role": "system",
+                "content": AGENTIC_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": f"These pros and cons were extracted from all {total_reviews} Apple Watch Series 10 reviews (mention counts in parentheses). Use them to provide pros, cons, and a personalized recommendation for the user described after them:\n\n{points_text}\n{build_user_context(user_profile)}\n{select_guidance(username)}"
+            }
+        ]
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Background materializer for product-level pros/cons.
+
+Pros and cons are the same for every user - only the personalized
+recommendation depends on the profile. The materializer keeps one document
+per product family in a sidecar index (review_summary_index) holding the
+weighted pros/cons and the review ids behind each point, and updates it from
+only the reviews indexed since its last checkpoint. /agentic-summary in
+"materialized" mode then makes one small personalization call on top.
+
+Usage: python3 materializer.py          # run forever every MATERIALIZER_INTERVAL seconds
+       python3 materializer.py --once   # one incremental pass
+"""
+
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+from incremental import DateCheckpoint
+from mapreduce import iter_chunks
+from observability import ComponentLogger
+
+log = ComponentLogger("materializer")
+
+SUMMARY_INDEX = "review_summary_index"
+CHECKPOINT_ID = "_checkpoint"
+DEFAULT_PRODUCT = "Apple Watch Series 10"
+
+
+def product_family(product):
+    """'Apple Watch Series 10 GPS 46mm Black Titanium' -> 'Apple Watch Series 10'"""
+    family = re.split(r"\s+(?:GPS|Cellular)\b", product or "", maxsplit=1)[0].strip()
+    return family or "unknown"
+
+
+def product_doc_id(family):
+    """Sidecar document id for a product family"""
+    return re.sub(r"[^a-z0-9]+", "-", family.lower()).strip("-") or "unknown"
+
+
+class ProsConsMaterializer:
+    """Keeps per-product pros/cons in the sidecar index up to date incrementally"""
+
+    def __init__(self, es, summarizer, source_index="review_index", summary_index=SUMMARY_INDEX,
+                 interval=300, batch_size=2000):
+        self.es = es
+        self.summarizer = summarizer
+        self.source_index = source_index
+        self.summary_index = summary_index
+        self.interval = interval
+        self.batch_size = batch_size
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._status = {
+            "runs": 0,
+            "last_run": None,
+            "last_duration_ms": None,
+            "last_new_reviews": 0,
+            "last_error": None,
+            "checkpoint": None
+        }
+
+    def load_checkpoint(self):
+        response = self.es.get_doc(self.summary_index, CHECKPOINT_ID)
+        if response.status_code == 404:
+            return DateCheckpoint()
+        response.raise_for_status()
+        return DateCheckpoint.from_dict(self.es.parse_json(response).get('_source'))
+
+    def get_summary(self, product=DEFAULT_PRODUCT):
+        """Materialized pros/cons for a product family, or None if not built yet.
+
+        The returned document carries a "version" token (_seq_no:_primary_term)
+        that changes on every update, for use in cache keys.
+        """
+        response = self.es.get_doc(self.summary_index, product_doc_id(product_family(product)))
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        body = self.es.parse_json(response)
+        return dict(body.get('_source', {}), version=f"{body.get('_seq_no')}:{body.get('_primary_term')}")
+
+    def _summarize_product(self, family, hits):
+        """Pros/cons of one product's new reviews; raises if any map chunk failed.
+
+        A failed chunk (OpenAI down, gateway rejection, open breaker) must fail
+        the batch: its reviews would otherwise never be summarized, since the
+        checkpoint moves past them.
+        """
+        partial, stats = self.summarizer.summarize(hits)
+        if stats.get("failed_chunks"):
+            raise RuntimeError(
+                f"{stats['failed_chunks']} of {stats['chunks']} chunks failed for {family}; "
+                "the batch will be retried on the next run"
+            )
+        return partial, stats["reviews"]
+
+    def _merge_product(self, family, partial, summarized):
+        """Fold the pros/cons of `summarized` new reviews into a product's stored summary"""
+        existing = self.get_summary(family)
+        if existing:
+            merged, _ = self.summarizer.reduce([
+                {"pros": existing.get("pros", []), "cons": existing.get("cons", [])},
+                partial
+            ])
+            reviews_analyzed = existing.get("reviews_analyzed", 0) + summarized
+        else:
+            merged, reviews_analyzed = partial, summarized
+
+        response = self.es.put_doc(self.summary_index, product_doc_id(family), {
+            "product": family,
+            "pros": merged["pros"],
+            "cons": merged["cons"],
+            "reviews_analyzed": reviews_analyzed,
+            "updated_at": datetime.utcnow().isoformat()
+        })
+        response.raise_for_status()
+
+    def run_once(self):
+        """Process reviews indexed since the last checkpoint; returns how many were new.
+
+        Work is committed batch by batch (product documents first, then the
+        checkpoint), so an interrupted pass resumes where it stopped. A batch
+        with any failed LLM call is not committed and is retried next run.
+        """
+        with self._run_lock:
+            run_start = time.time()
+            checkpoint = self.load_checkpoint()
+            new_reviews = 0
+
+            reviews = self.es.scan(
+                self.source_index,
+                checkpoint.query(),
+                keep_alive="10m",
+                source=["date", "title", "review_text", "stars", "product"],
+                sort=DateCheckpoint.SORT
+            )
+            for batch in iter_chunks(reviews, self.batch_size):
+                by_product = {}
+                for hit in batch:
+                    by_product.setdefault(product_family(hit['_source'].get('product')), []).append(hit)
+                # Summarize every product before writing any, so a failed batch
+                # leaves no product document ahead of the checkpoint
+                partials = {family: self._summarize_product(family, hits) for family, hits in by_product.items()}
+                for family, (partial, summarized) in partials.items():
+                    self._merge_product(family, partial, summarized)
+
+                for hit in batch:
+                    checkpoint.advance(hit)
+                response = self.es.put_doc(self.summary_index, CHECKPOINT_ID, checkpoint.to_dict())
+                response.raise_for_status()
+                new_reviews += len(batch)
+
+            self._status.update({
+                "runs": self._status["runs"] + 1,
+                "last_run": datetime.utcnow().isoformat(),
+                "last_duration_ms": int((time.time() - run_start) * 1000),
+                "last_new_reviews": new_reviews,
+                "last_error": None,
+                "checkpoint": {"date": checkpoint.date, "ids_at_date": len(checkpoint.ids),
+                               "seq_no": checkpoint.seq_no, "capped": checkpoint.capped}
+            })
+            log.info("materializer pass done", new_reviews=new_reviews,
+                     duration_ms=self._status["last_duration_ms"])
+            return new_reviews
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self._status["last_error"] = str(e)
+                log.error("materializer pass failed", error=str(e))
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Run incremental passes every `interval` seconds on a daemon thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="materializer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        return dict(
+            self._status,
+            running=self._thread is not None and self._thread.is_alive(),
+            interval_seconds=self.interval
+        )
+
+
+if __name__ == '__main__':
+    from backend import materializer
+
+    if '--once' in sys.argv:
+        materializer.run_once()
+    else:
+        print(f"🧮 Materializing pros/cons every {materializer.interval}s (Ctrl+C to stop)")
+        while True:
+            try:
+                materializer.run_once()
+            except Exception as e:
+                log.error("materializer pass failed", error=str(e))
+            time.sleep(materializer.interval)
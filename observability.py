@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Metrics and structured logging for the search backend.
+
+Metrics: a small in-process registry of counters and histograms rendered in
+the Prometheus text exposition format (served at /metrics), so per-stage
+latency (ES request, ES took vs network overhead, hit transformation, prompt
+build, OpenAI call, JSON encoding) can be scraped per endpoint without an
+extra dependency.
+
+Logging: one JSON object per line, written by a background QueueListener so
+request threads only enqueue the record. Informational records can be
+sampled per request; warnings and errors are always kept. Modules log
+through a ComponentLogger, which tags their records with a component field.
+"""
+
+import json
+import logging
+import logging.handlers
+import math
+import queue
+import sys
+import threading
+import time
+
+# Seconds - covers sub-millisecond hit transformation up to long LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, labels), value) for labels, value in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, dict(series, counts=list(series["counts"]))) for labels, series in self._series.items()]
+        samples = []
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                samples.append((
+                    f"{self.name}_bucket",
+                    _format_labels(self.labelnames, labels, [("le", _format_value(bound))]),
+                    cumulative
+                ))
+            samples.append((f"{self.name}_sum", _format_labels(self.labelnames, labels), series["sum"]))
+            samples.append((f"{self.name}_count", _format_labels(self.labelnames, labels), series["count"]))
+        return samples
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge_collector(self, name, documentation, labelnames, collect):
+        """Register a gauge read at scrape time; collect() -> [(label_values, value), ...]"""
+        self._collectors.append((name, documentation, tuple(labelnames), collect))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines += [f"{name}{labels} {_format_value(value)}" for name, labels, value in metric.samples()]
+        for name, documentation, labelnames, collect in self._collectors:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            try:
+                for labels, value in collect():
+                    lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+            except Exception as e:
+                lines.append(f"# collector failed: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a log record as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname.lower(),
+            "msg": record.getMessage()
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(name, level="INFO", stream=None):
+    """Logger whose records are formatted and written on a background thread.
+
+    Returns (logger, listener); the listener is already started.
+    """
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=False)
+    listener.start()
+
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    logger.propagate = False
+    return logger, listener
+
+
+class ComponentLogger:
+    """Structured log calls for one module: log.warning("message", key=value, ...)
+
+    Records go to the shared JSON log (see setup_logging) with the keyword
+    arguments as fields, plus component=<component>.
+    """
+
+    def __init__(self, component, name="review_search"):
+        self.component = component
+        self.logger = logging.getLogger(name)
+
+    def log(self, level, message, **fields):
+        self.logger.log(level, message, extra={"fields": dict(fields, component=self.component)})
+
+    def info(self, message, **fields):
+        self.log(logging.INFO, message, **fields)
+
+    def warning(self, message, **fields):
+        self.log(logging.WARNING, message, **fields)
+
+    def error(self, message, **fields):
+        self.log(logging.ERROR, message, **fields)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Cursor-based paging for review listings.
+
+Deep `from` offsets make every shard collect and sort from + size hits, so
+pages get slower the further a client goes. Instead the first page opens a
+point-in-time (PIT) and every page continues with search_after from the sort
+values of the previous page's last hit; `_shard_doc` is used as the
+tiebreaker so ordering is total and stable. The PIT id and the search_after
+values travel back to the client as one opaque cursor token, together with
+the endpoint and page size that issued it so it cannot be replayed against a
+listing with a different sort.
+"""
+
+import base64
+import json
+
+MAX_PAGE_SIZE = 500
+PIT_KEEP_ALIVE = "2m"
+
+
+class CursorError(ValueError):
+    """Raised for cursor tokens that cannot be decoded or belong to another listing"""
+
+
+def encode_cursor(pit_id, search_after, **extra):
+    """Pack the PIT id, search_after values and any request context into a token"""
+    payload = dict(extra, pit=pit_id, after=search_after)
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token, endpoint=None):
+    """Unpack a cursor token; with `endpoint`, also check that it issued the cursor"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        if not isinstance(payload, dict):
+            raise ValueError("not an object")
+        if not payload.get("pit") or not isinstance(payload.get("after"), list):
+            raise ValueError("missing fields")
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise CursorError(f"Invalid cursor: {str(e)}")
+    if endpoint is not None and payload.get("endpoint") != endpoint:
+        # Its search_after values follow another sort and would make Elasticsearch answer 400
+        raise CursorError("Cursor belongs to a different endpoint")
+    return payload
+
+
+def page_size_from(data, default, cursor=None):
+    """Requested page size, clamped to 1..MAX_PAGE_SIZE.
+
+    A continued listing keeps the page size of its `cursor`; asking for a
+    different one raises CursorError.
+    """
+    try:
+        size = int(data.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    size = max(1, min(size, MAX_PAGE_SIZE))
+    if cursor is None or not isinstance(cursor.get("page_size"), int):
+        return size
+    if 'page_size' in data and size != cursor["page_size"]:
+        raise CursorError(f"Cursor was issued for page_size {cursor['page_size']}")
+    return cursor["page_size"]
+
+
+def paged_search(es, index, query, sort, page_size, cursor=None, source=None, **context):
+    """Run one page of a PIT + search_after listing.
+
+    `cursor` is the decoded cursor of the previous page, or None for the
+    first page (which opens a new PIT on `index`). The page size and any
+    extra keyword arguments (e.g. endpoint) are stored in the next cursor. Returns (response, es_data, next_cursor):
+    es_data is None if the search failed, and next_cursor is None on the
+    last page, whose PIT is released right away.
+    """
+    pit_id = cursor["pit"] if cursor else es.open_pit(index, PIT_KEEP_ALIVE)
+    body = {
+        "query": query,
+        "size": page_size,
+        "pit": {"id": pit_id, "keep_alive": PIT_KEEP_ALIVE},
+        "sort": sort + [{"_shard_doc": "asc"}]
+    }
+    if source is not None:
+        body["_source"] = source
+    if cursor:
+        body["search_after"] = cursor["after"]
+        # The total is counted once on the first page and carried in the cursor
+        body["track_total_hits"] = False
+
+    try:
+        response = es.search(None, body)
+        if response.status_code != 200:
+            if not cursor:
+                es.close_pit(pit_id)
+            return response, None, None
+        es_data = es.parse_json(response)
+    except Exception:
+        # A PIT opened for this page would otherwise stay open until keep_alive
+        if not cursor:
+            es.close_pit(pit_id)
+        raise
+
+    hits_section = es_data.setdefault('hits', {})
+    if cursor:
+        hits_section['total'] = {"value": cursor.get("total", 0)}
+    context["total"] = hits_section.get('total', {}).get('value', 0)
+    context["page_size"] = page_size
+
+    hits = hits_section.get('hits', [])
+    if len(hits) < page_size:
+        es.close_pit(es_data.get('pit_id', pit_id))
+        return response, es_data, None
+    return response, es_data, encode_cursor(es_data.get('pit_id', pit_id), hits[-1]['sort'], **context)
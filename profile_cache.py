@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+In-process cache of user_profile documents.
+
+Profiles change rarely but are read on every /agentic-summary call. Entries
+are fresh for ttl_seconds; after that they are served stale for up to
+stale_seconds while a background refresh revalidates them. Revalidation is
+conditional: it asks Elasticsearch only for the document's _seq_no and
+_primary_term (no _source) and downloads the profile again only when they
+changed. Unknown usernames are cached as misses for negative_ttl_seconds so
+a bad name cannot turn every request into an ES round trip.
+
+Call invalidate(username) after writing a profile (or invalidate() to drop
+everything) so the next read fetches the new version.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from observability import ComponentLogger
+from resilience import deadline_scope
+
+log = ComponentLogger("profile_cache")
+
+# Version-only lookup used to revalidate stale entries
+VERSION_FILTER_PATH = "_seq_no,_primary_term,found"
+
+
+class ProfileCache:
+    """TTL + LRU cache of user profiles with stale-while-revalidate"""
+
+    def __init__(self, es, index="user_profile", ttl_seconds=60, stale_seconds=600,
+                 negative_ttl_seconds=30, max_entries=10000, executor=None, name="user_profile"):
+        self.es = es
+        self.index = index
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_entries = max_entries
+        self.executor = executor
+        self.name = name
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0, "stale_hits": 0, "negative_hits": 0, "misses": 0, "expired": 0,
+            "stores": 0, "evictions": 0, "invalidations": 0,
+            "revalidated_unchanged": 0, "revalidated_changed": 0, "refresh_errors": 0
+        }
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self._stats[counter] += amount
+
+    def get(self, username):
+        """Return the profile _source, or None for an unknown user.
+
+        Raises when Elasticsearch fails and there is no usable cached copy.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None:
+                self._entries.move_to_end(username)
+
+        if entry is not None:
+            if now < entry["fresh_until"]:
+                self._count("hits" if entry["profile"] is not None else "negative_hits")
+                return entry["profile"]
+            if entry["profile"] is not None and now < entry["fresh_until"] + self.stale_seconds:
+                self._count("stale_hits")
+                self._schedule_refresh(username, entry)
+                return entry["profile"]
+            self._count("expired")
+
+        self._count("misses")
+        return self._load(username)
+
+    def get_many(self, usernames):
+        """Return {username: profile or None}, loading every miss with one _mget"""
+        profiles = {}
+        missing = []
+        now = time.time()
+        for username in dict.fromkeys(usernames):
+            with self._lock:
+                entry = self._entries.get(username)
+                if entry is not None:
+                    self._entries.move_to_end(username)
+            if entry is not None and now < entry["fresh_until"]:
+                self._count("hits" if entry["profile"] is not None else "negative_hits")
+                profiles[username] = entry["profile"]
+            elif entry is not None and entry["profile"] is not None and now < entry["fresh_until"] + self.stale_seconds:
+                self._count("stale_hits")
+                self._schedule_refresh(username, entry)
+                profiles[username] = entry["profile"]
+            else:
+                if entry is not None:
+                    self._count("expired")
+                self._count("misses")
+                missing.append(username)
+
+        if missing:
+            response = self.es.mget(self.index, missing)
+            if response.status_code != 200:
+                raise RuntimeError(f"profile lookup failed with HTTP {response.status_code}")
+            for doc in self.es.parse_json(response).get('docs', []):
+                if 'error' in doc:
+                    raise RuntimeError(f"profile lookup failed for {doc.get('_id')}: {doc['error']}")
+                if doc.get('found'):
+                    profile = doc.get('_source', {})
+                    self._store(doc['_id'], profile, doc.get('_seq_no'), doc.get('_primary_term'))
+                else:
+                    profile = None
+                    self._store(doc['_id'], None, None, None)
+                profiles[doc['_id']] = profile
+        return profiles
+
+    def _load(self, username):
+        """Fetch the full document and store it (or the negative result)"""
+        response = self.es.get_doc(self.index, username)
+        if response.status_code == 404:
+            self._store(username, None, None, None)
+            return None
+        if response.status_code != 200:
+            raise RuntimeError(f"profile lookup failed with HTTP {response.status_code}")
+        doc = self.es.parse_json(response)
+        profile = doc.get('_source', {})
+        self._store(username, profile, doc.get('_seq_no'), doc.get('_primary_term'))
+        return profile
+
+    def _store(self, username, profile, seq_no, primary_term):
+        ttl = self.ttl_seconds if profile is not None else self.negative_ttl_seconds
+        with self._lock:
+            self._entries[username] = {
+                "profile": profile,
+                "seq_no": seq_no,
+                "primary_term": primary_term,
+                "fresh_until": time.time() + ttl
+            }
+            self._entries.move_to_end(username)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _schedule_refresh(self, username, entry):
+        with self._lock:
+            if username in self._refreshing:
+                return
+            self._refreshing.add(username)
+        if self.executor is not None:
+            self.executor.submit(self._refresh, username, entry)
+        else:
+            threading.Thread(target=self._refresh, args=(username, entry), daemon=True).start()
+
+    def _refresh(self, username, entry):
+        """Revalidate a stale entry in the background (not bound by the deadline of
+        the request that triggered it)"""
+        try:
+            with deadline_scope(None):
+                self._revalidate(username, entry)
+        except Exception as e:
+            # The stale copy keeps being served until stale_seconds runs out
+            self._count("refresh_errors")
+            log.warning("profile refresh failed", username=username, error=str(e))
+        finally:
+            with self._lock:
+                self._refreshing.discard(username)
+
+    def _revalidate(self, username, entry):
+        """Compare versions; re-fetch the profile only if it changed"""
+        response = self.es.get_doc(self.index, username, filter_path=VERSION_FILTER_PATH,
+                                   params={"_source": "false"})
+        if response.status_code == 404:
+            self._count("revalidated_changed")
+            self._store(username, None, None, None)
+            return
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        version = self.es.parse_json(response)
+        if (version.get('_seq_no'), version.get('_primary_term')) == (entry["seq_no"], entry["primary_term"]):
+            self._count("revalidated_unchanged")
+            with self._lock:
+                # Keep the cached document, unless it was invalidated meanwhile
+                if self._entries.get(username) is entry:
+                    entry["fresh_until"] = time.time() + self.ttl_seconds
+            return
+        self._count("revalidated_changed")
+        self._load(username)
+
+    def invalidate(self, username=None):
+        """Drop one user's entry, or every entry when username is None"""
+        with self._lock:
+            if username is None:
+                self._stats["invalidations"] += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(username, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._entries)
+            negative = sum(1 for entry in self._entries.values() if entry["profile"] is None)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["negative_hits"] + stats["misses"]
+        stats.update({
+            "name": self.name,
+            "backend": type(self).__name__,
+            "entries": entries,
+            "negative_entries": negative,
+            "ttl_seconds": self.ttl_seconds,
+            "stale_seconds": self.stale_seconds,
+            "negative_ttl_seconds": self.negative_ttl_seconds,
+            "hit_rate": round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+        })
+        return stats
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Cached ELSER query expansion for semantic search.
+
+A `semantic` query on review_text.semantic makes the cluster run ELSER on
+the query text for every search, and our single ELSER allocation is the
+throughput bottleneck. ElserExpander calls the inference endpoint once per
+distinct normalized query, keeps the sparse token weights in a result cache
+(bounded LRU in memory, or the shared SQLite file) and builds a
+`sparse_vector` query from them, which Elasticsearch scores without
+running the model.
+
+Clusters that cannot run `sparse_vector` on the semantic_text field reject
+the query with HTTP 400; call disable() then and query() goes back to the
+plain `semantic` query for the rest of the process.
+"""
+
+import threading
+import time
+
+from observability import ComponentLogger
+from result_cache import make_key, normalize_query
+
+log = ComponentLogger("query_expansion")
+
+
+class ElserExpander:
+    """Sparse ELSER expansions of query text, cached by normalized text"""
+
+    def __init__(self, es, cache, flight, inference_id="elser-inference", field="review_text.semantic"):
+        self.es = es
+        self.cache = cache
+        # Concurrent misses for the same text share one inference call
+        self.flight = flight
+        self.inference_id = inference_id
+        self.field = field
+        self.sparse_vector_supported = True
+        self._lock = threading.Lock()
+        self._stats = {"inferences": 0, "inference_ms": 0.0, "cache_hits": 0, "errors": 0, "semantic_queries": 0}
+        self.last_error = None
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self._stats[counter] += amount
+
+    def _infer(self, text):
+        """Run ELSER once through the inference endpoint; returns {token: weight}"""
+        infer_start = time.perf_counter()
+        response = self.es.post(f"_inference/sparse_embedding/{self.inference_id}", {"input": text}, op="inference")
+        if response.status_code != 200:
+            raise RuntimeError(f"inference failed with HTTP {response.status_code}: {response.text[:200]}")
+        results = self.es.parse_json(response).get("sparse_embedding", [])
+        if not results:
+            raise RuntimeError("inference returned no embedding")
+        self._count("inferences")
+        self._count("inference_ms", (time.perf_counter() - infer_start) * 1000)
+        return results[0].get("embedding", {})
+
+    def expand(self, text):
+        """Return ({token: weight}, "cache" | "inference") for the normalized text"""
+        normalized = normalize_query(text)
+        if not normalized:
+            return {}, "cache"
+        key = make_key("elser_expansion", self.inference_id, normalized)
+        tokens = self.cache.get(key)
+        if tokens is not None:
+            self._count("cache_hits")
+            return tokens, "cache"
+        tokens = self.flight.do(("elser_expansion", self.inference_id, normalized), self._infer, normalized)
+        self.cache.set(key, tokens)
+        return tokens, "inference"
+
+    def query(self, text):
+        """Return (query, report): a sparse_vector query from the cached expansion when possible.
+
+        Falls back to the semantic query (report "expansion": "semantic") when
+        expansion is disabled or the inference call fails.
+        """
+        if self.sparse_vector_supported:
+            try:
+                tokens, source = self.expand(text)
+            except Exception as e:
+                tokens = None
+                self._count("errors")
+                self.last_error = str(e)
+                log.warning("ELSER expansion failed, using a semantic query", error=str(e))
+            # Text without any word has no expansion to search with
+            if tokens:
+                return {
+                    "sparse_vector": {
+                        "field": self.field,
+                        "query_vector": tokens
+                    }
+                }, {"expansion": source, "tokens": len(tokens)}
+        self._count("semantic_queries")
+        return {
+            "semantic": {
+                "field": self.field,
+                "query": text
+            }
+        }, {"expansion": "semantic"}
+
+    def disable(self, reason):
+        """Stop building sparse_vector queries (the cluster rejected one)"""
+        if self.sparse_vector_supported:
+            log.warning("sparse_vector not supported, using semantic queries", field=self.field, reason=reason)
+        self.sparse_vector_supported = False
+        self.last_error = reason
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        average_ms = stats["inference_ms"] / stats["inferences"] if stats["inferences"] else 0.0
+        stats.update({
+            "inference_id": self.inference_id,
+            "field": self.field,
+            "sparse_vector_supported": self.sparse_vector_supported,
+            "inference_ms": round(stats["inference_ms"], 1),
+            "avg_inference_ms": round(average_ms, 1),
+            # Every cache hit is one ELSER inference the cluster did not run
+            "inference_ms_saved": round(stats["cache_hits"] * average_ms, 1),
+            "last_error": self.last_error,
+            "cache": self.cache.stats()
+        })
+        return stats
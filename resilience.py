@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Deadlines, retries and circuit breakers for upstream (Elasticsearch, OpenAI) calls.
+
+A Deadline is created per request and made current with deadline_scope();
+upstream clients read it with deadline_timeout() so every call's timeout is
+the smaller of its own cap and the time the request has left, and a call
+that would start after the deadline fails at once with DeadlineExceeded.
+The current deadline lives in a contextvar, so work submitted to a
+ContextThreadPoolExecutor inherits it. Deadline.split() carves a stage
+budget out of the remaining time (e.g. ES lookups get 40% of it, leaving
+the rest for the LLM call).
+
+CircuitBreaker fails fast with CircuitOpenError after a run of consecutive
+failures, lets one trial call through after reset_seconds and closes again
+when it succeeds.
+"""
+
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+_current_deadline = contextvars.ContextVar("deadline", default=None)
+
+# Shortest timeout worth starting a call with
+MIN_CALL_SECONDS = 0.05
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed before an upstream call could finish"""
+
+    def __init__(self, stage):
+        super().__init__(f"request deadline exceeded before {stage}")
+        self.stage = stage
+
+
+class CircuitOpenError(RuntimeError):
+    """The upstream's circuit breaker is open; the call was not attempted"""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} circuit breaker is open, retry in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class _EventCounts:
+    """Thread-safe {label: count} for monitoring"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def inc(self, label):
+        with self._lock:
+            self._counts[label] = self._counts.get(label, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+# Deadline-exceeded events by stage ("es:search", "openai", ...), since start
+deadline_exceeded = _EventCounts()
+
+
+class Deadline:
+    """Absolute point in time by which a request must be answered"""
+
+    def __init__(self, seconds, parent=None):
+        self.expires_at = time.monotonic() + seconds
+        if parent is not None:
+            self.expires_at = min(self.expires_at, parent.expires_at)
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def remaining_ms(self):
+        return int(self.remaining() * 1000)
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def split(self, share):
+        """Child deadline covering `share` of the remaining time"""
+        return Deadline(self.remaining() * share, parent=self)
+
+
+def current_deadline():
+    return _current_deadline.get()
+
+
+def set_current_deadline(deadline):
+    """Make `deadline` current until reset_current_deadline(token) (for request hooks)"""
+    return _current_deadline.set(deadline)
+
+
+def reset_current_deadline(token):
+    _current_deadline.reset(token)
+
+
+def deadline_error(stage):
+    """Count a deadline-exceeded event for `stage` and return the exception to raise"""
+    deadline_exceeded.inc(stage)
+    return DeadlineExceeded(stage)
+
+
+@contextmanager
+def deadline_scope(deadline):
+    """Make `deadline` (or None for no deadline) current inside the block"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def deadline_timeout(cap, stage):
+    """Timeout for a call: its own cap, shortened to the current deadline.
+
+    Raises DeadlineExceeded when too little time is left to start the call.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return cap
+    remaining = deadline.remaining()
+    if remaining < MIN_CALL_SECONDS:
+        raise deadline_error(stage)
+    return min(cap, remaining) if cap else remaining
+
+
+def backoff_delay(attempt, base=0.05, cap=1.0):
+    """Exponential backoff with full jitter for retry number `attempt` (0-based)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def sleep_before_retry(attempt, base=0.05, cap=1.0):
+    """Sleep before another attempt; False if the deadline leaves no room for it"""
+    delay = backoff_delay(attempt, base, cap)
+    deadline = _current_deadline.get()
+    if deadline is not None and deadline.remaining() < delay + MIN_CALL_SECONDS:
+        return False
+    time.sleep(delay)
+    return True
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor whose tasks run in the submitter's contextvars context
+    (so they see its current deadline)"""
+
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker: closed -> open -> half_open -> closed"""
+
+    def __init__(self, name, failure_threshold=5, reset_seconds=30.0, ignored=()):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        # Exceptions that mean the request was wrong, not that the upstream is unhealthy
+        self.ignored = tuple(ignored)
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._stats = {"calls": 0, "successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._state = "half_open"
+            self._trial_in_flight = False
+        return self._state
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        with self._lock:
+            state = self._current_state()
+            if state == "closed" or (state == "half_open" and not self._trial_in_flight):
+                if state == "half_open":
+                    self._trial_in_flight = True
+                self._stats["calls"] += 1
+                return
+            self._stats["rejected"] += 1
+            retry_in = max(self.reset_seconds - (time.monotonic() - self._opened_at), 0.0)
+        raise CircuitOpenError(self.name, retry_in)
+
+    def record_success(self):
+        with self._lock:
+            self._stats["successes"] += 1
+            self._failures = 0
+            self._state = "closed"
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._stats["failures"] += 1
+            self._failures += 1
+            if self._state == "half_open" or (self._state == "closed" and self._failures >= self.failure_threshold):
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+                self._stats["opened"] += 1
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn through the breaker; exceptions other than `ignored` count as failures"""
+        self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except self.ignored:
+            self.record_success()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "name": self.name,
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_seconds": self.reset_seconds
+            })
+        return stats
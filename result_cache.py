@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+TTL + LRU result cache with pluggable storage backends.
+
+Used to keep expensive LLM answers around for as long as their inputs are
+unchanged. Callers build the key from everything the answer depends on (see
+make_key/fingerprint), so stale entries are never served - they simply stop
+being looked up and age out through TTL/LRU eviction.
+
+Backends:
+- MemoryBackend: in-process OrderedDict, fastest, lost on restart
+- SQLiteBackend: local SQLite file, survives restarts and is shared by
+  every worker process on the host; LRU order is kept to touch_interval
+  seconds so that reads rarely write
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def fingerprint(obj):
+    """Stable short hash of any JSON-serializable value"""
+    canonical = json.dumps(obj, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def normalize_query(text):
+    """Canonical form of free-text queries so trivially different spellings share a key.
+
+    "  Battery LIFE?? " and "battery life" both become "battery life".
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def make_key(*parts):
+    """Build a cache key from the parts an entry depends on"""
+    return hashlib.sha256(
+        json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+    ).hexdigest()
+
+
+class MemoryBackend:
+    """In-process LRU store"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (expires_at, value) or None, marking the entry as recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, expires_at, value):
+        """Store an entry and return how many entries were evicted"""
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteBackend:
+    """Persistent LRU store in a local SQLite file (values must be JSON-serializable)"""
+
+    def __init__(self, path, table="result_cache", max_entries=10000, touch_interval=60):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        # Recency is only written back once an entry's last_access is this many
+        # seconds old, so most reads don't take the SQLite write lock
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_last_access ON {table} (last_access)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT expires_at, value, last_access FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[2] >= self.touch_interval:
+                self._conn.execute(
+                    f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key)
+                )
+                self._conn.commit()
+        return row[0], json.loads(row[1])
+
+    def set(self, key, expires_at, value):
+        payload = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, payload, expires_at, time.time())
+            )
+            # Expired rows go first, then least recently used ones over the cap
+            self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (time.time(),))
+            count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            evicted = max(count - self.max_entries, 0)
+            if evicted:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY last_access LIMIT ?)",
+                    (evicted,)
+                )
+            self._conn.commit()
+            return evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+def build_backend(kind="memory", path="result_cache.sqlite3", table="result_cache", max_entries=1000):
+    """Create a storage backend by name ("memory" or "sqlite")"""
+    if kind == "sqlite":
+        return SQLiteBackend(path, table=table, max_entries=max_entries)
+    if kind == "memory":
+        return MemoryBackend(max_entries=max_entries)
+    raise ValueError(f"Unknown cache backend: {kind}")
+
+
+class ResultCache:
+    """TTL cache in front of a storage backend, with hit/miss counters"""
+
+    def __init__(self, backend, ttl_seconds=3600, name="cache"):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "stores": 0, "evictions": 0}
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self._stats[counter] += amount
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or an expired entry"""
+        entry = self.backend.get(key)
+        if entry is None:
+            self._count("misses")
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.time():
+            self.backend.delete(key)
+            self._count("expired")
+            self._count("misses")
+            return None
+
+        self._count("hits")
+        return value
+
+    def set(self, key, value, ttl_seconds=None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        evicted = self.backend.set(key, time.time() + ttl, value)
+        self._count("stores")
+        if evicted:
+            self._count("evictions", evicted)
+
+    def invalidate(self, key):
+        self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "name": self.name,
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "ttl_seconds": self.ttl_seconds,
+            "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0
+        })
+        return stats
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+In-process read replica of review_index for browse and keyword search.
+
+The review corpus is small next to RAM and mostly append-only, so the
+backend can keep its own copy and answer /search-reviews and
+/keyword-search without a round trip to Elastic Cloud. The replica is
+loaded with a point-in-time scan, then follows new reviews incrementally
+with the same date checkpoint as the materializer (see incremental.py) and
+is rebuilt from scratch every resync_interval seconds to pick up edits and
+deletions.
+
+Keyword search is BM25 (k1=1.2, b=0.75, the Elasticsearch defaults) over
+an inverted index of title and review_text, combined like the
+/keyword-search multi_match: best_fields with title boosted 2x and
+fuzziness AUTO (terms within 1 edit for 3-5 characters, 2 edits above,
+scored by their similarity). Browse uses an array of documents kept sorted
+by date. Both answer in Elasticsearch's response shape so callers treat
+them like an ES search; scores come close to ES but are not identical.
+
+When the last successful sync is older than max_staleness seconds, is_fresh()
+is False and callers go to Elasticsearch instead.
+"""
+
+import math
+import re
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from datetime import datetime
+
+from incremental import DateCheckpoint
+from mapreduce import iter_chunks
+from observability import ComponentLogger
+
+log = ComponentLogger("review_replica")
+
+TOKEN = re.compile(r"\w+")
+
+# multi_match fields and boosts, as in /keyword-search
+FIELD_BOOSTS = {"title": 2.0, "review_text": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_EXPANSIONS = 50
+# Query terms whose fuzzy expansions are remembered per field
+MAX_CACHED_EXPANSIONS = 10000
+
+
+def analyze(text):
+    """Lowercased word tokens, close to the standard analyzer"""
+    return TOKEN.findall(str(text or "").lower())
+
+
+def auto_fuzziness(term):
+    """Edit distance allowed by fuzziness AUTO for a term of this length"""
+    if len(term) <= 2:
+        return 0
+    return 1 if len(term) <= 5 else 2
+
+
+def bounded_edit_distance(a, b, limit):
+    """Levenshtein distance of a and b, or limit + 1 as soon as it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _grams(term):
+    """Bigrams of a term padded with a boundary marker on each side"""
+    padded = f"\0{term}\0"
+    return [padded[i:i + 2] for i in range(len(padded) - 1)]
+
+
+class _GramIndex:
+    """Bigram index for finding the strings within a few edits of a term.
+
+    Two strings within k edits share at least max(len) + 1 - 2k padded
+    bigrams (one edit breaks at most two), so only the strings sharing that
+    many get an edit distance computed. The lists only grow, so lookups are
+    safe without the replica lock while strings are being added.
+    """
+
+    def __init__(self):
+        self.terms = {}           # bigram -> strings containing it, once per occurrence
+        self.size = 0
+
+    def add(self, term):
+        for gram in _grams(term):
+            self.terms.setdefault(gram, []).append(term)
+        self.size += 1
+
+    def near(self, term, limit=None):
+        """[(distance, string)] within `limit` edits of term (None: auto_fuzziness of each string)"""
+        shared = {}
+        for gram, wanted in Counter(_grams(term)).items():
+            for candidate, count in Counter(self.terms.get(gram, ())).items():
+                shared[candidate] = shared.get(candidate, 0) + min(wanted, count)
+        matches = []
+        for candidate, count in shared.items():
+            allowed = auto_fuzziness(candidate) if limit is None else limit
+            if count >= max(len(term), len(candidate)) + 1 - 2 * allowed:
+                distance = bounded_edit_distance(term, candidate, allowed)
+                if distance <= allowed:
+                    matches.append((distance, candidate))
+        return matches
+
+    def memory_bytes(self):
+        return sys.getsizeof(self.terms) + sum(sys.getsizeof(terms) for terms in self.terms.values())
+
+
+class _FieldIndex:
+    """Postings of one text field: term -> (doc numbers, term frequencies)"""
+
+    def __init__(self):
+        self.postings = {}
+        self.lengths = array('I')
+        self.total_length = 0
+        self.vocabulary = _GramIndex()
+        # query term -> fuzzy expansions; a new term only drops the entries it could expand
+        self.expansions = {}
+        self.cached_terms = _GramIndex()
+        # Bumped whenever a term is indexed, so an expansion computed meanwhile is not cached
+        self.version = 0
+
+    def add(self, doc, tokens):
+        self.lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            if token not in self.postings:
+                self.postings[token] = (array('I'), array('H'))
+                self.vocabulary.add(token)
+                self.version += 1
+                if self.expansions:
+                    for _, query_term in self.cached_terms.near(token):
+                        self.expansions.pop(query_term, None)
+            docs, tfs = self.postings[token]
+            docs.append(doc)
+            tfs.append(min(tf, 65535))
+
+    def remember(self, term, expansions):
+        """Cache the fuzzy expansions of a query term"""
+        if len(self.expansions) >= MAX_CACHED_EXPANSIONS:
+            self.expansions.clear()
+            self.cached_terms = _GramIndex()
+        if term not in self.expansions:
+            self.cached_terms.add(term)
+        self.expansions[term] = expansions
+
+    def memory_bytes(self):
+        size = sys.getsizeof(self.postings) + self.lengths.itemsize * len(self.lengths)
+        size += self.vocabulary.memory_bytes()
+        for term, (docs, tfs) in self.postings.items():
+            size += sys.getsizeof(term) + docs.itemsize * len(docs) + tfs.itemsize * len(tfs)
+        return size
+
+
+class _Snapshot:
+    """Documents plus their indexes; replaced wholesale on a full resync"""
+
+    def __init__(self):
+        self.ids = []
+        self.sources = []
+        self.positions = {}       # _id -> doc number of its live version
+        self.deleted = set()      # doc numbers superseded by a newer version
+        self.fields = {field: _FieldIndex() for field in FIELD_BOOSTS}
+        # (negated date ordinal key, doc number); ascending = newest first after sort_by_date()
+        self.by_date = []
+
+    def add(self, doc_id, source):
+        doc = len(self.ids)
+        previous = self.positions.get(doc_id)
+        if previous is not None:
+            self.deleted.add(previous)
+        self.ids.append(doc_id)
+        self.sources.append(source)
+        self.positions[doc_id] = doc
+        for field, index in self.fields.items():
+            index.add(doc, analyze(source.get(field)))
+        # Appended, not inserted: scans arrive oldest first, so each insort
+        # would go to the front of the list
+        self.by_date.append((_date_key(source.get('date')), doc))
+
+    def sort_by_date(self):
+        """Restore date order after a batch of add() calls (one near-linear timsort)"""
+        self.by_date.sort()
+
+    @property
+    def live_count(self):
+        return len(self.ids) - len(self.deleted)
+
+
+def _date_key(date):
+    """Sort key putting the newest date first and undated reviews last, as
+    Elasticsearch sorts missing values (dates are ISO strings)"""
+    if not date:
+        return (1,)
+    # The trailing 1 puts "2024-01-02T10:00" before its prefix "2024-01-02"
+    return (0,) + tuple(-ord(ch) for ch in str(date)) + (1,)
+
+
+class ReviewReplica:
+    """Local copy of review_index with BM25 keyword search and date browse"""
+
+    def __init__(self, es, index="review_index", source=None, refresh_interval=30,
+                 max_staleness=120, resync_interval=3600, page_size=1000):
+        self.es = es
+        self.index = index
+        self.source = source
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.resync_interval = resync_interval
+        self.page_size = page_size
+        self._snapshot = None
+        self._checkpoint = DateCheckpoint()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._status = {
+            "syncs": 0,
+            "full_loads": 0,
+            "last_sync": None,
+            "last_sync_at": None,
+            "last_full_load_at": None,
+            "last_sync_ms": None,
+            "last_new_docs": 0,
+            "sync_errors": 0,
+            "last_error": None,
+            "memory_bytes": 0,
+            "served": 0,
+            "fallbacks": 0
+        }
+
+    # Sync -------------------------------------------------------------
+
+    def _scan(self, checkpoint):
+        return self.es.scan(
+            self.index,
+            checkpoint.query(),
+            page_size=self.page_size,
+            keep_alive="5m",
+            source=self.source,
+            sort=DateCheckpoint.SORT
+        )
+
+    def sync(self):
+        """Full load on first use or every resync_interval, otherwise fetch only new reviews"""
+        with self._sync_lock:
+            sync_start = time.time()
+            full = (
+                self._snapshot is None
+                or time.time() - (self._status["last_full_load_at"] or 0) >= self.resync_interval
+            )
+            if full:
+                # Built aside and swapped in, so searches never see a half-loaded index
+                snapshot = _Snapshot()
+                checkpoint = DateCheckpoint()
+                for hit in self._scan(checkpoint):
+                    snapshot.add(hit['_id'], hit.get('_source', {}))
+                    checkpoint.advance(hit)
+                snapshot.sort_by_date()
+                new_docs = snapshot.live_count
+                with self._lock:
+                    self._snapshot = snapshot
+                    self._checkpoint = checkpoint
+                self._status["full_loads"] += 1
+                self._status["last_full_load_at"] = time.time()
+            else:
+                checkpoint = DateCheckpoint.from_dict(self._checkpoint.to_dict())
+                new_docs = 0
+                # Added a page at a time so browse never sees by_date unsorted
+                for page in iter_chunks(self._scan(checkpoint), self.page_size):
+                    with self._lock:
+                        for hit in page:
+                            self._snapshot.add(hit['_id'], hit.get('_source', {}))
+                        self._snapshot.sort_by_date()
+                    for hit in page:
+                        checkpoint.advance(hit)
+                    new_docs += len(page)
+                with self._lock:
+                    self._checkpoint = checkpoint
+
+            self._status.update({
+                "syncs": self._status["syncs"] + 1,
+                "last_sync": datetime.utcnow().isoformat(),
+                "last_sync_at": time.time(),
+                "last_sync_ms": int((time.time() - sync_start) * 1000),
+                "last_new_docs": new_docs,
+                "last_error": None,
+                "memory_bytes": self.memory_bytes()
+            })
+            log.info("replica loaded" if full else "replica synced", new_docs=new_docs,
+                     duration_ms=self._status["last_sync_ms"])
+            return new_docs
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                self._status["sync_errors"] += 1
+                self._status["last_error"] = str(e)
+                log.error("replica sync failed", error=str(e))
+            self._stop.wait(self.refresh_interval)
+
+    def start(self):
+        """Load, then follow new reviews every refresh_interval seconds on a daemon thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="review-replica", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # Queries ----------------------------------------------------------
+
+    def lag_seconds(self):
+        """Seconds since the last successful sync (None before the first one)"""
+        last = self._status["last_sync_at"]
+        return None if last is None else time.time() - last
+
+    def is_fresh(self):
+        lag = self.lag_seconds()
+        return self._snapshot is not None and lag is not None and lag <= self.max_staleness
+
+    def count_fallback(self):
+        self._status["fallbacks"] += 1
+
+    def _response(self, snapshot, scored, total, size, search_start):
+        self._status["served"] += 1
+        hits = [
+            {"_index": self.index, "_id": snapshot.ids[doc], "_score": score, "_source": snapshot.sources[doc]}
+            for score, doc in scored[:size]
+        ]
+        return {
+            "took": int((time.perf_counter() - search_start) * 1000),
+            "timed_out": False,
+            "hits": {
+                "total": {"value": total, "relation": "eq"},
+                "max_score": hits[0]["_score"] if hits else None,
+                "hits": hits
+            }
+        }
+
+    def browse(self, size=50):
+        """Newest reviews first, like a match_all sorted by date desc"""
+        search_start = time.perf_counter()
+        with self._lock:
+            snapshot = self._snapshot
+            live = [doc for _, doc in snapshot.by_date[:size + len(snapshot.deleted)] if doc not in snapshot.deleted]
+            return self._response(snapshot, [(None, doc) for doc in live], snapshot.live_count, size, search_start)
+
+    def _expand(self, index, term):
+        """[(indexed term, weight)] for a query term under fuzziness AUTO.
+
+        Runs without the lock. An expansion computed while new terms were
+        being indexed is used, but not cached.
+        """
+        expansions = index.expansions.get(term)
+        if expansions is None:
+            version = index.version
+            expansions = self._fuzzy_terms(index, term)
+            with self._lock:
+                if index.version == version:
+                    index.remember(term, expansions)
+        return expansions
+
+    def _fuzzy_terms(self, index, term):
+        limit = auto_fuzziness(term)
+        if limit == 0:
+            return [(term, 1.0)] if term in index.postings else []
+        # Exact matches count fully, fuzzy ones by their similarity
+        expansions = sorted(index.vocabulary.near(term, limit))
+        return [(candidate, 1.0 - distance / max(len(term), len(candidate)))
+                for distance, candidate in expansions[:MAX_EXPANSIONS]]
+
+    def _field_scores(self, snapshot, field, expanded):
+        """BM25 score per doc number for one field, from the expansions of each query term"""
+        index = snapshot.fields[field]
+        doc_count = len(snapshot.ids)
+        avg_length = index.total_length / doc_count if doc_count else 0.0
+        scores = {}
+        for expansions in expanded:
+            for indexed_term, weight in expansions:
+                docs, tfs = index.postings[indexed_term]
+                idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc, tf in zip(docs, tfs):
+                    norm = 1 - BM25_B + BM25_B * index.lengths[doc] / avg_length if avg_length else 1.0
+                    scores[doc] = scores.get(doc, 0.0) + weight * idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+        return scores
+
+    def keyword_search(self, text, size=20):
+        """multi_match best_fields over title^2 and review_text, sorted by score then date"""
+        search_start = time.perf_counter()
+        terms = list(dict.fromkeys(analyze(text)))
+        snapshot = self._snapshot
+        # Fuzzy expansion is the slow part; it runs before taking the lock
+        expanded = {
+            field: [self._expand(snapshot.fields[field], term) for term in terms]
+            for field in FIELD_BOOSTS
+        }
+        with self._lock:
+            best = {}
+            for field, boost in FIELD_BOOSTS.items():
+                for doc, score in self._field_scores(snapshot, field, expanded[field]).items():
+                    if doc not in snapshot.deleted and boost * score > best.get(doc, 0.0):
+                        best[doc] = boost * score
+            ranked = sorted(
+                best.items(),
+                key=lambda item: (-item[1], _date_key(snapshot.sources[item[0]].get('date')))
+            )
+            return self._response(snapshot, [(score, doc) for doc, score in ranked], len(best), size, search_start)
+
+    # Monitoring -------------------------------------------------------
+
+    def memory_bytes(self):
+        """Rough size of the replica: postings arrays, term strings and sources"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return 0
+        size = sum(index.memory_bytes() for index in snapshot.fields.values())
+        size += sys.getsizeof(snapshot.by_date) + 64 * len(snapshot.by_date)
+        for doc_id, source in zip(snapshot.ids, snapshot.sources):
+            size += sys.getsizeof(doc_id) + sys.getsizeof(source)
+            size += sum(sys.getsizeof(value) for value in source.values())
+        return size
+
+    def status(self):
+        snapshot = self._snapshot
+        lag = self.lag_seconds()
+        return dict(
+            self._status,
+            docs=snapshot.live_count if snapshot else 0,
+            terms=sum(len(index.postings) for index in snapshot.fields.values()) if snapshot else 0,
+            lag_seconds=round(lag, 3) if lag is not None else None,
+            fresh=self.is_fresh(),
+            running=self._thread is not None and self._thread.is_alive(),
+            refresh_interval_seconds=self.refresh_interval,
+            max_staleness_seconds=self.max_staleness
+        )
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Review analytics rollups from Elasticsearch aggregations.
+
+One `size: 0` search returns everything the trend views and the LLM prompts
+need about review_index: the star histogram, review count and average stars
+per product, review volume per day, the verified ratio and the most helpful
+reviews. ReviewStats keeps those figures in mergeable form (counts and sums,
+not averages) so they can be refreshed incrementally: a refresh aggregates
+only the reviews indexed since the last date checkpoint (see
+incremental.py) and adds them in. Every resync_interval seconds - or when
+more than max_increment_docs reviews arrived at once - the rollup is
+recomputed from scratch, which also picks up edits and deletions.
+
+Refreshes happen on read, at most every refresh_interval seconds, and one
+at a time; other readers keep getting the current rollup meanwhile.
+
+product is a text field, so products are grouped through a keyword
+runtime field (no reindex needed).
+"""
+
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from incremental import DateCheckpoint
+from observability import ComponentLogger
+
+log = ComponentLogger("review_stats")
+
+INTERVALS = ("day", "week", "month")
+PIT_KEEP_ALIVE = "1m"
+TOP_FIELDS = ["date", "username", "product", "stars", "title", "helpful_votes", "verified"]
+
+# Keyword view of the text `product` field for the per-product terms aggregation
+PRODUCT_RUNTIME_FIELD = {
+    "product_name": {
+        "type": "keyword",
+        "script": {"source": "if (params._source.product != null) { emit(params._source.product.toString()) }"}
+    }
+}
+
+
+def _empty_rollup():
+    return {
+        "reviews": 0,
+        "stars": {},
+        "products": {},
+        "daily": {},
+        "verified": 0,
+        "verified_known": 0,
+        "top_helpful": []
+    }
+
+
+def _is_true(bucket):
+    """Boolean terms buckets are keyed 1/0 with key_as_string "true"/"false" """
+    return str(bucket.get("key_as_string", bucket.get("key"))).lower() in ("true", "1")
+
+
+def _period(day, interval):
+    """Start date (yyyy-MM-dd) of the week or month a yyyy-MM-dd day belongs to"""
+    if interval == "day":
+        return day
+    parsed = date.fromisoformat(day)
+    if interval == "week":
+        return (parsed - timedelta(days=parsed.weekday())).isoformat()
+    return parsed.replace(day=1).isoformat()
+
+
+class ReviewStats:
+    """Incrementally refreshed aggregation rollup of review_index"""
+
+    def __init__(self, es, index="review_index", refresh_interval=60, resync_interval=3600,
+                 top_size=10, max_products=1000, max_increment_docs=1000):
+        self.es = es
+        self.index = index
+        self.refresh_interval = refresh_interval
+        self.resync_interval = resync_interval
+        self.top_size = top_size
+        self.max_products = max_products
+        self.max_increment_docs = max_increment_docs
+        self._rollup = None
+        self._checkpoint = DateCheckpoint()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._status = {
+            "refreshes": 0,
+            "full_rebuilds": 0,
+            "incremental_refreshes": 0,
+            "refresh_errors": 0,
+            "last_refresh": None,
+            "last_refresh_at": None,
+            "last_full_rebuild_at": None,
+            "last_refresh_ms": None,
+            "last_new_reviews": None,
+            "last_error": None,
+            "served": 0
+        }
+
+    def _body(self, query, size=0):
+        body = {
+            "size": size,
+            "track_total_hits": True,
+            "query": query,
+            "runtime_mappings": PRODUCT_RUNTIME_FIELD,
+            "aggs": {
+                "stars": {"terms": {"field": "stars", "size": 10}},
+                "products": {
+                    "terms": {"field": "product_name", "size": self.max_products},
+                    "aggs": {
+                        "stars_sum": {"sum": {"field": "stars"}},
+                        "rated": {"value_count": {"field": "stars"}}
+                    }
+                },
+                "daily": {
+                    "date_histogram": {
+                        "field": "date", "calendar_interval": "day", "format": "yyyy-MM-dd", "min_doc_count": 1
+                    }
+                },
+                "verified": {"terms": {"field": "verified", "size": 2}},
+                "top_helpful": {
+                    "top_hits": {
+                        "size": self.top_size,
+                        "sort": [{"helpful_votes": {"order": "desc"}}],
+                        "_source": TOP_FIELDS
+                    }
+                }
+            }
+        }
+        if size:
+            # The new reviews themselves (dates only) advance the checkpoint
+            body["sort"] = DateCheckpoint.SORT
+            body["_source"] = ["date"]
+        return body
+
+    def _search(self, body):
+        # Point-in-time searches name no index
+        response = self.es.search(None if "pit" in body else self.index, body)
+        if response.status_code != 200:
+            raise RuntimeError(f"review stats aggregation failed with HTTP {response.status_code}: {response.text[:200]}")
+        return self.es.parse_json(response)
+
+    def _partial(self, es_data):
+        """Mergeable rollup of one aggregation response"""
+        aggregations = es_data.get('aggregations', {})
+        partial = _empty_rollup()
+        partial["reviews"] = es_data.get('hits', {}).get('total', {}).get('value', 0)
+        for bucket in aggregations.get('stars', {}).get('buckets', []):
+            partial["stars"][str(int(bucket["key"]))] = bucket["doc_count"]
+        for bucket in aggregations.get('products', {}).get('buckets', []):
+            partial["products"][bucket["key"]] = {
+                "reviews": bucket["doc_count"],
+                "rated": bucket.get("rated", {}).get("value", 0),
+                "stars_sum": bucket.get("stars_sum", {}).get("value") or 0
+            }
+        for bucket in aggregations.get('daily', {}).get('buckets', []):
+            day = bucket.get("key_as_string") or datetime.utcfromtimestamp(bucket["key"] / 1000).date().isoformat()
+            partial["daily"][day[:10]] = bucket["doc_count"]
+        for bucket in aggregations.get('verified', {}).get('buckets', []):
+            partial["verified_known"] += bucket["doc_count"]
+            if _is_true(bucket):
+                partial["verified"] += bucket["doc_count"]
+        partial["top_helpful"] = [
+            dict(hit.get('_source', {}), id=hit['_id'])
+            for hit in aggregations.get('top_helpful', {}).get('hits', {}).get('hits', [])
+        ]
+        return partial
+
+    def _merge(self, rollup, partial):
+        """rollup + partial, as a new rollup"""
+        merged = {
+            "reviews": rollup["reviews"] + partial["reviews"],
+            "stars": dict(rollup["stars"]),
+            "products": {name: dict(values) for name, values in rollup["products"].items()},
+            "daily": dict(rollup["daily"]),
+            "verified": rollup["verified"] + partial["verified"],
+            "verified_known": rollup["verified_known"] + partial["verified_known"]
+        }
+        for stars, count in partial["stars"].items():
+            merged["stars"][stars] = merged["stars"].get(stars, 0) + count
+        for name, values in partial["products"].items():
+            current = merged["products"].setdefault(name, {"reviews": 0, "rated": 0, "stars_sum": 0})
+            for field in current:
+                current[field] += values[field]
+        for day, count in partial["daily"].items():
+            merged["daily"][day] = merged["daily"].get(day, 0) + count
+        top = {review["id"]: review for review in rollup["top_helpful"]}
+        top.update((review["id"], review) for review in partial["top_helpful"])
+        merged["top_helpful"] = sorted(
+            top.values(), key=lambda review: -(review.get("helpful_votes") or 0)
+        )[:self.top_size]
+        return merged
+
+    def _rebuild(self):
+        """Aggregate the whole index; the checkpoint covers every review on the newest date.
+
+        The aggregation and the scan of the newest date read one point-in-time,
+        so a review indexed in between is neither in the rollup without being
+        in the checkpoint nor the other way round.
+        """
+        pit_id = self.es.open_pit(self.index, PIT_KEEP_ALIVE)
+        try:
+            body = self._body({"match_all": {}})
+            body["pit"] = {"id": pit_id, "keep_alive": PIT_KEEP_ALIVE}
+            es_data = self._search(body)
+            pit_id = es_data.get('pit_id', pit_id)
+            rollup = self._partial(es_data)
+            checkpoint = DateCheckpoint()
+            if rollup["daily"]:
+                for hit in self.es.scan(None, {"term": {"date": max(rollup["daily"])}}, keep_alive=PIT_KEEP_ALIVE,
+                                        source=["date"], sort=DateCheckpoint.SORT, pit_id=pit_id):
+                    checkpoint.advance(hit)
+        finally:
+            self.es.close_pit(pit_id)
+        return rollup, checkpoint
+
+    def _refresh(self, full):
+        """refresh() body; the caller holds _refresh_lock"""
+        refresh_start = time.time()
+        full = (
+            full
+            or self._rollup is None
+            or time.time() - (self._status["last_full_rebuild_at"] or 0) >= self.resync_interval
+        )
+        if not full:
+            checkpoint = DateCheckpoint.from_dict(self._checkpoint.to_dict())
+            es_data = self._search(self._body(checkpoint.query(), size=self.max_increment_docs))
+            partial = self._partial(es_data)
+            if partial["reviews"] > self.max_increment_docs:
+                # Too many to advance the checkpoint from this response (a bulk load)
+                full = True
+            else:
+                for hit in es_data.get('hits', {}).get('hits', []):
+                    checkpoint.advance(hit)
+                new_reviews = partial["reviews"]
+                with self._lock:
+                    if new_reviews:
+                        self._rollup = self._merge(self._rollup, partial)
+                    self._checkpoint = checkpoint
+                self._status["incremental_refreshes"] += 1
+        if full:
+            rollup, checkpoint = self._rebuild()
+            new_reviews = rollup["reviews"]
+            with self._lock:
+                self._rollup = rollup
+                self._checkpoint = checkpoint
+            self._status["full_rebuilds"] += 1
+            self._status["last_full_rebuild_at"] = time.time()
+        self._status.update({
+            "refreshes": self._status["refreshes"] + 1,
+            "last_refresh": datetime.utcnow().isoformat(),
+            "last_refresh_at": time.time(),
+            "last_refresh_ms": int((time.time() - refresh_start) * 1000),
+            "last_new_reviews": new_reviews,
+            "last_error": None
+        })
+        return new_reviews
+
+    def refresh(self, full=False):
+        """Add the reviews indexed since the checkpoint, or rebuild; returns how many were new"""
+        with self._refresh_lock:
+            return self._refresh(full)
+
+    def _due(self):
+        return (
+            self._rollup is None
+            or time.time() - (self._status["last_refresh_at"] or 0) >= self.refresh_interval
+        )
+
+    def rollup(self):
+        """Current rollup, refreshed first when it is older than refresh_interval.
+
+        Only one caller refreshes; the others get the current rollup (or wait
+        for the first load). A failed refresh keeps serving the previous rollup.
+        """
+        if self._due():
+            # Until the first load there is nothing to serve, so wait for it
+            if self._refresh_lock.acquire(blocking=self._rollup is None):
+                try:
+                    if self._due():
+                        self._refresh(False)
+                except Exception as e:
+                    self._status["refresh_errors"] += 1
+                    self._status["last_error"] = str(e)
+                    log.error("review stats refresh failed", error=str(e))
+                    if self._rollup is None:
+                        raise
+                finally:
+                    self._refresh_lock.release()
+        self._status["served"] += 1
+        with self._lock:
+            return self._rollup
+
+    def stats(self, interval="month", top=5, products=20):
+        """Compact view of the rollup: star histogram, per-product averages, volume per
+        interval, verified ratio and the most helpful reviews"""
+        rollup = self.rollup()
+        rated = sum(rollup["stars"].values())
+        stars_sum = sum(int(stars) * count for stars, count in rollup["stars"].items())
+        volume = {}
+        for day, count in rollup["daily"].items():
+            period = _period(day, interval)
+            volume[period] = volume.get(period, 0) + count
+        ranked_products = sorted(rollup["products"].items(), key=lambda item: (-item[1]["reviews"], item[0]))
+        return {
+            "reviews": rollup["reviews"],
+            "average_stars": round(stars_sum / rated, 2) if rated else None,
+            "stars": {str(stars): rollup["stars"].get(str(stars), 0) for stars in range(1, 6)},
+            "verified_ratio": (
+                round(rollup["verified"] / rollup["verified_known"], 3) if rollup["verified_known"] else None
+            ),
+            "products": [
+                {
+                    "product": name,
+                    "reviews": values["reviews"],
+                    "average_stars": round(values["stars_sum"] / values["rated"], 2) if values["rated"] else None
+                }
+                for name, values in ranked_products[:products]
+            ],
+            "product_count": len(rollup["products"]),
+            "volume": {
+                "interval": interval,
+                "buckets": [{"period": period, "reviews": volume[period]} for period in sorted(volume)]
+            },
+            "first_review_date": min(rollup["daily"]) if rollup["daily"] else None,
+            "last_review_date": max(rollup["daily"]) if rollup["daily"] else None,
+            "top_helpful": rollup["top_helpful"][:top],
+            "as_of": self._status["last_refresh"]
+        }
+
+    def prompt_text(self, products=5):
+        """The rollup as a few compact lines for an LLM prompt (empty if unavailable)"""
+        stats = self.stats(interval="month", top=0, products=products)
+        if not stats["reviews"]:
+            return ""
+        lines = [f"Review statistics for all {stats['reviews']} reviews:"]
+        if stats["average_stars"] is not None:
+            histogram = ", ".join(
+                f"{stars} star{'s' if stars != '1' else ''}: {count}" for stars, count in reversed(list(stats["stars"].items()))
+            )
+            lines.append(f"- Average {stats['average_stars']}/5 stars ({histogram})")
+        if stats["verified_ratio"] is not None:
+            lines.append(f"- {round(stats['verified_ratio'] * 100)}% verified purchases")
+        if stats["products"]:
+            lines.append("- By product: " + "; ".join(
+                f"{product['product']}: {product['reviews']} reviews, {product['average_stars']} avg"
+                for product in stats["products"]
+            ))
+        recent = stats["volume"]["buckets"][-6:]
+        if recent:
+            lines.append("- Reviews per month: " + ", ".join(
+                f"{bucket['period'][:7]} {bucket['reviews']}" for bucket in recent
+            ))
+        return "\n".join(lines) + "\n\n"
+
+    def status(self):
+        with self._lock:
+            rollup = self._rollup
+            checkpoint = self._checkpoint.to_dict()
+        status = dict(self._status)
+        status.update({
+            "index": self.index,
+            "loaded": rollup is not None,
+            "reviews": rollup["reviews"] if rollup else None,
+            "days": len(rollup["daily"]) if rollup else None,
+            "products": len(rollup["products"]) if rollup else None,
+            "checkpoint_date": checkpoint["date"],
+            "refresh_interval": self.refresh_interval,
+            "resync_interval": self.resync_interval
+        })
+        return status
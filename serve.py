@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the backend.
+
+"python3 backend.py" runs Flask's debug server with the reloader, which is
+for development only. serve.py runs the same app under gunicorn with
+SERVE_WORKERS processes of SERVE_THREADS threads each (gthread workers).
+Each worker builds the app with backend.create_app() after it is forked,
+so connection pools and background threads are never shared across a
+fork. It warms up before accepting traffic: it opens pooled Elasticsearch
+connections, runs one ELSER inference on review_text.semantic and connects
+the OpenAI client. Cold start, warm-up stages and the first request's
+latency are logged and reported per worker by GET /startup-status and
+/metrics.
+
+gunicorn is in requirements.txt. Where it is not installed (it does not run
+on Windows) serve.py falls back to a single-process threaded Werkzeug
+server, still warmed up and without the debugger or reloader.
+
+Usage: python3 serve.py                          # SERVE_WORKERS / SERVE_THREADS / PORT
+       python3 serve.py --workers 4 --threads 16 --port 8001
+       python3 serve.py --no-warmup
+"""
+
+import time
+
+# Before any heavy import, so cold start includes loading the backend
+STARTED_AT = time.time()
+
+import argparse
+import os
+
+
+def default_workers():
+    return int(os.environ.get("SERVE_WORKERS") or min(os.cpu_count() or 1, 8))
+
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class ReviewSearchApplication(BaseApplication):
+        """gunicorn application that builds the backend in each worker"""
+
+        def load_config(self):
+            self.cfg.set("bind", f"{args.host}:{args.port}")
+            self.cfg.set("workers", args.workers)
+            self.cfg.set("threads", args.threads)
+            self.cfg.set("worker_class", "gthread")
+            # gthread workers heartbeat from their main loop, so long SSE and
+            # NDJSON responses are not killed by this
+            self.cfg.set("timeout", args.timeout)
+            self.cfg.set("graceful_timeout", 30)
+            self.cfg.set("keepalive", 5)
+            # Each worker imports the backend itself, after the fork
+            self.cfg.set("preload_app", False)
+
+        def load(self):
+            worker_started = time.time()
+            from backend import create_app
+            return create_app(started_at=worker_started, warm=args.warm)
+
+    ReviewSearchApplication().run()
+
+
+def run_werkzeug(args):
+    from werkzeug.serving import make_server
+
+    from backend import create_app
+
+    if args.workers > 1:
+        print(f"⚠️  gunicorn is not installed (pip install gunicorn) - serving from one process, "
+              f"not {args.workers}")
+    app = create_app(started_at=STARTED_AT, warm=args.warm)
+    server = make_server(args.host, args.port, app, threaded=True)
+    print(f"🌐 Serving on http://{args.host}:{args.port} (threaded Werkzeug server)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the backend with a production WSGI server")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=default_workers(), help="worker processes")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("SERVE_THREADS", "16")),
+                        help="request threads per worker")
+    parser.add_argument("--timeout", type=int, default=int(os.environ.get("SERVE_TIMEOUT", "120")),
+                        help="seconds before an unresponsive worker is restarted")
+    parser.add_argument("--no-warmup", dest="warm", action="store_false",
+                        help="accept traffic without warming up ES, ELSER and OpenAI first")
+    # Unset means WARMUP from the environment decides
+    parser.set_defaults(warm=None)
+    args = parser.parse_args()
+
+    print(f"🚀 Starting Multi-Search Experience Backend ({args.workers} workers x {args.threads} threads)")
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        run_werkzeug(args)
+    else:
+        run_gunicorn(args)
+
+
+if __name__ == '__main__':
+    main()
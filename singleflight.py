@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Single-flight coalescing of identical in-flight upstream calls.
+
+When many requests need the same thing at the same moment (a campaign link
+opening /agentic-summary for the default profile, a trending
+/semantic-search query), only the first caller runs the ES query or OpenAI
+call; callers arriving with the same key while it is running wait for it and
+receive the same result (or a copy of the same exception, chained to the
+original so its traceback is kept). Nothing is kept once the
+call finishes - that is the result caches' job - so this only removes
+duplicate work between concurrent requests.
+
+Waiting callers give up with DeadlineExceeded when their own request
+deadline (see resilience.py) runs out, even if the call they joined is hung.
+"""
+
+import threading
+
+from resilience import deadline_error, deadline_timeout
+
+
+class SingleFlightError(RuntimeError):
+    """The shared call stopped in a way a follower cannot re-raise as is"""
+
+
+def _follower_error(error):
+    """A fresh copy of the leader's exception for one follower to raise.
+
+    Raising the leader's own object on several threads would let each raise
+    overwrite its __traceback__. The copy keeps the type, so error handlers
+    still tell DeadlineExceeded from CircuitOpenError.
+    """
+    if not isinstance(error, Exception):
+        # KeyboardInterrupt/SystemExit stopped the leader's thread, not the followers'
+        return SingleFlightError(f"shared call was interrupted by {type(error).__name__}")
+    try:
+        copy = type(error).__new__(type(error), *error.args)
+        copy.__dict__.update(error.__dict__)
+    except Exception:
+        return SingleFlightError(f"shared call failed: {error!r}")
+    return copy
+
+
+class _Call:
+    """One in-flight execution and the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key"""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {"requests": 0, "executions": 0, "coalesced": 0, "errors": 0, "wait_timeouts": 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Return fn(*args, **kwargs), sharing one execution among concurrent callers with `key`"""
+        with self._lock:
+            self._stats["requests"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            stage = f"singleflight:{self.name}"
+            if not call.done.wait(deadline_timeout(None, stage)):
+                with self._lock:
+                    self._stats["wait_timeouts"] += 1
+                raise deadline_error(stage)
+            if call.error is not None:
+                raise _follower_error(call.error) from call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self._stats["executions"] += 1
+                if call.error is not None:
+                    self._stats["errors"] += 1
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, name=self.name, in_flight=len(self._calls))
+        stats["coalesce_rate"] = round(stats["coalesced"] / stats["requests"], 4) if stats["requests"] else 0.0
+        return stats
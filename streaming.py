@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Server-Sent Events helpers for the streaming LLM endpoints.
+
+Streaming responses send hits/metadata as soon as Elasticsearch answers and
+then forward the OpenAI completion as it is generated, so time-to-first-byte
+is roughly the ES latency instead of ES + full LLM generation.
+"""
+
+import json
+
+from fastjson import dumps
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+
+def iter_completion_text(openai_stream):
+    """Yield the text deltas of an OpenAI streaming chat completion"""
+    for chunk in openai_stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+class JsonFieldStreamer:
+    """Incrementally scans a streamed JSON object and reports values as soon as they complete.
+
+    Top-level string fields are reported once their closing quote arrives;
+    string items of top-level arrays are reported one by one. For the agentic
+    answer this yields ("pros", "..."), ("pros", "..."), ..., ("cons", "..."),
+    ("personalized_recommendation", "...") while the model is still writing.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.expect_key = False
+        self.key = None
+        self._buffer = []
+        self._text = []
+
+    @property
+    def text(self):
+        """Everything fed so far"""
+        return "".join(self._text)
+
+    def _decode(self, raw):
+        try:
+            return json.loads(f'"{raw}"')
+        except ValueError:
+            return raw
+
+    def feed(self, chunk):
+        """Consume a chunk of JSON text and return the (field, value) pairs it completed"""
+        self._text.append(chunk)
+        completed = []
+        for ch in chunk:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                    self._buffer.append(ch)
+                elif ch == '\\':
+                    self.escape = True
+                    self._buffer.append(ch)
+                elif ch == '"':
+                    self.in_string = False
+                    value = self._decode("".join(self._buffer))
+                    self._buffer = []
+                    if self.depth == 1 and self.expect_key:
+                        self.key = value
+                        self.expect_key = False
+                    elif self.key is not None and self.depth in (1, 2):
+                        completed.append((self.key, value))
+                else:
+                    self._buffer.append(ch)
+                continue
+
+            if ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.depth += 1
+                if ch == '{' and self.depth == 1:
+                    self.expect_key = True
+            elif ch in '}]':
+                self.depth -= 1
+            elif ch == ',' and self.depth == 1:
+                self.expect_key = True
+        return completed
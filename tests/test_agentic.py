@@ -0,0 +1,20 @@
+from agentic import AGENTIC_SYSTEM_PROMPT, BUDGET_GUIDANCE, PREMIUM_GUIDANCE, build_agentic_messages
+
+PROFILE = {"username": "TechUser92", "preferences": {"price_sensitivity": "low", "feature_priorities": ["gps"]}}
+
+
+def test_prompts_for_different_users_share_their_prefix():
+    premium = build_agentic_messages("TechUser92", PROFILE, "Review 1: ...\n", 1, stats_text="Stats\n")
+    budget = build_agentic_messages("Student2025", None, "Review 1: ...\n", 1, stats_text="Stats\n")
+    assert premium[0] == budget[0] == {"role": "system", "content": AGENTIC_SYSTEM_PROMPT}
+    shared = "Stats\nReview 1: ...\n"
+    assert shared in premium[1]["content"] and shared in budget[1]["content"]
+    prefix = premium[1]["content"].split(shared)[0] + shared
+    assert budget[1]["content"].startswith(prefix)
+
+
+def test_user_specific_text_follows_the_reviews():
+    content = build_agentic_messages("TechUser92", PROFILE, "REVIEWS\n", 1)[1]["content"]
+    assert content.index("REVIEWS") < content.index("User Profile:") < content.index(PREMIUM_GUIDANCE)
+    assert content.endswith(PREMIUM_GUIDANCE)
+    assert build_agentic_messages("anyone", None, "REVIEWS\n", 1)[1]["content"].endswith(BUDGET_GUIDANCE)
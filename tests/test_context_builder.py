@@ -0,0 +1,77 @@
+from context_builder import ContextBuilder, get_token_counter
+
+
+def render(number, source):
+    return f"Review {number}: {source.get('title', '')}\n{source.get('review_text', '')}\n\n"
+
+
+def _hit(doc_id, text, score=1.0, helpful=0, date="2025-01-01", title=None):
+    return {"_id": doc_id, "_score": score,
+            "_source": {"title": title or f"Title {doc_id}", "review_text": text, "helpful_votes": helpful, "date": date}}
+
+
+def test_token_counter_reports_its_name():
+    count, name = get_token_counter()
+    assert name in ("approximate", "cl100k_base")
+    assert count("") == 0 < count("battery life") < count("battery life is great, really great")
+
+
+def test_ranks_by_score_then_helpful_votes_then_date():
+    builder = ContextBuilder(render, budget_tokens=10000)
+    hits = [
+        _hit("old", "Old one.", helpful=5, date="2024-01-01"),
+        _hit("best", "Best score.", score=3.0),
+        _hit("new", "New one.", helpful=5, date="2025-06-01"),
+        _hit("plain", "Plain one."),
+    ]
+    text, included, report = builder.build(hits)
+    assert [hit["_id"] for hit in included] == ["best", "new", "old", "plain"]
+    assert text.startswith("Review 1: Title best")
+    assert report["reviews_included"] == 4 and report["tokens_used"] == builder.count_tokens(text)
+
+
+def test_stays_within_budget():
+    builder = ContextBuilder(render, budget_tokens=60, max_review_tokens=1000)
+    hits = [_hit(str(i), f"Review number {i} talks about strap comfort and screen {i * 7}.", score=10 - i)
+            for i in range(10)]
+    text, included, report = builder.build(hits)
+    assert 0 < len(included) < 10
+    assert builder.count_tokens(text) <= 60
+    assert report["over_budget_dropped"] == 10 - len(included)
+    assert report["tokens_available"] == 60
+
+
+def test_drops_near_duplicates():
+    builder = ContextBuilder(render, budget_tokens=10000)
+    text = "The battery easily lasts two full days with the always on display enabled"
+    hits = [_hit("a", text, score=2.0, title="Battery"), _hit("b", text + "!", title="Battery"),
+            _hit("c", "Strap broke after a week", title="Strap")]
+    _, included, report = builder.build(hits)
+    assert [hit["_id"] for hit in included] == ["a", "c"]
+    assert report["duplicates_dropped"] == 1
+
+
+def test_trim_keeps_focus_sentences_in_order():
+    builder = ContextBuilder(render, budget_tokens=10000, max_review_tokens=20)
+    text = ("The box was nice and the setup took ten minutes. "
+            "Battery life is two days. "
+            "The strap is a bit stiff at first but softens. "
+            "Sleep tracking is accurate and the battery charges fast.")
+    trimmed = builder.trim(text, focus_terms=["battery"])
+    assert trimmed == "Battery life is two days. Sleep tracking is accurate and the battery charges fast."
+    assert builder.count_tokens(trimmed) <= 20
+    assert builder.trim("Short.", focus_terms=["battery"]) == "Short."
+
+
+def test_trim_cuts_a_single_long_sentence():
+    builder = ContextBuilder(render, budget_tokens=10000, max_review_tokens=10)
+    trimmed = builder.trim(" ".join(["word"] * 50))
+    assert trimmed.endswith("...") and builder.count_tokens(trimmed) <= 12
+
+
+def test_trimmed_reviews_are_reported():
+    builder = ContextBuilder(render, budget_tokens=10000, max_review_tokens=10)
+    hit = _hit("a", "First sentence is here. Second sentence is here too. Third one closes it.")
+    text, _, report = builder.build([hit], focus_terms=["third"])
+    assert report["reviews_trimmed"] == 1
+    assert "Third one closes it." in text and hit["_source"]["review_text"].startswith("First")
@@ -0,0 +1,195 @@
+"""The backend in-process against the fake Elasticsearch and OpenAI (as bench.py runs it)"""
+
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import bench
+import fake_services
+
+# Reviews in fake_services.DEFAULT_SEED_FILE
+SEED_REVIEWS = 10
+REVIEW_KEYS = {"id", "date", "username", "location", "product_description", "stars", "title",
+               "description", "helpful_count", "verified_purchase", "images"}
+
+
+@pytest.fixture(scope="module")
+def stack(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("stack")
+    os.environ["JOB_DB_PATH"] = str(tmp / "jobs.sqlite3")
+    os.environ["CACHE_DB_PATH"] = str(tmp / "result_cache.sqlite3")
+    args = SimpleNamespace(seed_file=fake_services.DEFAULT_SEED_FILE, es_latency=0, es_jitter=0, es_error_rate=0,
+                           llm_latency=0, llm_jitter=0, llm_error_rate=0)
+    url, fakes = bench.start_local_stack(args)
+    import backend
+    backend.get_job_workers().start()
+    yield SimpleNamespace(url=url, fakes=fakes, backend=backend)
+    backend.get_job_workers().stop()
+
+
+def post(stack, path, body):
+    return requests.post(stack.url + path, json=body, timeout=30)
+
+
+def get(stack, path):
+    return requests.get(stack.url + path, timeout=30)
+
+
+def _seed_dates(stack):
+    docs = stack.fakes["elasticsearch"].docs["review_index"].values()
+    return sorted(doc["_source"]["date"] for doc in docs)
+
+
+@pytest.mark.parametrize("mode", bench.MODES)
+def test_bench_requests_return_valid_bodies(stack, mode):
+    path, body = bench.build_request(mode)
+    response = post(stack, path, body)
+    assert response.status_code == 200
+    assert bench.check_body(mode, response.json()) is None
+
+
+def test_browse_returns_newest_reviews_first(stack):
+    data = post(stack, "/search-reviews", {}).json()
+    assert data["status"] == "success" and data["search_mode"] == "date_browse"
+    assert data["total"] == SEED_REVIEWS
+    reviews = data["reviews"]
+    assert len(reviews) == SEED_REVIEWS
+    assert all(set(review) == REVIEW_KEYS for review in reviews)
+    assert [review["date"] for review in reviews] == sorted((r["date"] for r in reviews), reverse=True)
+
+
+def test_browse_pages_cover_every_review_once(stack):
+    open_pits = len(stack.fakes["elasticsearch"]._pits)
+    seen = []
+    data = post(stack, "/search-reviews", {"paginate": True, "page_size": 3}).json()
+    while True:
+        assert data["status"] == "success" and data["total"] == SEED_REVIEWS
+        seen.extend(review["id"] for review in data["reviews"])
+        if not data["next_cursor"]:
+            break
+        data = post(stack, "/search-reviews", {"cursor": data["next_cursor"]}).json()
+    assert len(seen) == len(set(seen)) == SEED_REVIEWS
+    # The last page released the PIT
+    assert len(stack.fakes["elasticsearch"]._pits) == open_pits
+
+
+def test_keyword_search_matches_the_query(stack):
+    data = post(stack, "/keyword-search", {"query": "battery"}).json()
+    assert data["status"] == "success" and data["search_mode"] == "keyword" and data["query"] == "battery"
+    assert data["total"] == len(data["reviews"]) > 0
+    for review in data["reviews"]:
+        assert "battery" in (review["title"] + " " + review["description"]).lower()
+    assert data["max_score"] > 0
+
+
+def test_keyword_cursor_is_tied_to_its_query(stack):
+    first = post(stack, "/keyword-search", {"query": "battery", "paginate": True, "page_size": 1}).json()
+    assert len(first["reviews"]) == 1 and first["next_cursor"]
+
+    second = post(stack, "/keyword-search", {"cursor": first["next_cursor"]}).json()
+    assert second["status"] == "success" and second["query"] == "battery"
+    assert second["reviews"][0]["id"] != first["reviews"][0]["id"]
+
+    response = post(stack, "/keyword-search", {"query": "display", "cursor": first["next_cursor"]})
+    assert response.status_code == 400
+    assert response.json() == {"status": "error", "message": "Cursor belongs to a different query"}
+
+    browse = post(stack, "/search-reviews", {"paginate": True, "page_size": 1}).json()
+    response = post(stack, "/keyword-search", {"query": "battery", "cursor": browse["next_cursor"]})
+    assert response.status_code == 400
+    assert response.json() == {"status": "error", "message": "Cursor belongs to a different endpoint"}
+    response = post(stack, "/search-reviews", {"cursor": first["next_cursor"]})
+    assert response.status_code == 400
+    response = post(stack, "/keyword-search", {"cursor": first["next_cursor"], "page_size": 5})
+    assert response.status_code == 400 and "page_size" in response.json()["message"]
+
+    response = post(stack, "/keyword-search", {"cursor": "garbage"})
+    assert response.status_code == 400 and response.json()["message"].startswith("Invalid cursor")
+
+
+@pytest.mark.parametrize("method", ["rrf", "linear"])
+def test_hybrid_search_fuses_results(stack, method):
+    data = post(stack, "/hybrid-search", {"query": "battery life", "method": method, "size": 5}).json()
+    assert data["status"] == "success" and data["search_mode"] == "hybrid"
+    assert 0 < len(data["reviews"]) <= 5
+    ids = [review["id"] for review in data["reviews"]]
+    assert len(ids) == len(set(ids))
+    assert data["fusion"]["method"] == method
+
+    one = post(stack, "/hybrid-search", {"query": "battery life", "method": method, "size": 1}).json()
+    assert len(one["reviews"]) == 1 and one["total"] == data["total"] > 1
+
+    response = post(stack, "/hybrid-search", {"query": "battery", "method": "nope"})
+    assert response.status_code == 400
+
+
+def test_semantic_search_summarizes(stack):
+    data = post(stack, "/semantic-search", {"text": "how long does the battery last"}).json()
+    assert data["status"] == "success" and data["search_mode"] == "ai_semantic"
+    assert isinstance(data["summary"], str) and data["summary"].strip()
+    assert data["total_results"] > 0
+
+    response = post(stack, "/semantic-search", {})
+    assert response.status_code == 400 and response.json()["message"] == "No search text provided"
+
+
+def test_agentic_summary_answer(stack):
+    data = post(stack, "/agentic-summary", {"username": "john_doe"}).json()
+    assert data["status"] == "success" and data["username"] == "john_doe"
+    for field in ("pros", "cons"):
+        assert len(data[field]) == 3 and all(isinstance(point, str) and point for point in data[field])
+    assert data["personalized_recommendation"]
+    assert data["total_reviews_analyzed"] == SEED_REVIEWS
+
+
+def test_mapreduce_pass_is_shared_across_users(stack):
+    first = post(stack, "/agentic-summary", {"username": "john_doe", "mode": "mapreduce"}).json()
+    assert first["status"] == "success" and first["total_reviews_analyzed"] == SEED_REVIEWS
+    assert first["mapreduce"]["reviews"] == SEED_REVIEWS
+    second = post(stack, "/agentic-summary", {"username": "someone_else", "mode": "mapreduce"}).json()
+    assert second["status"] == "success" and second["mapreduce"]["cached"] is True
+    assert len(second["pros"]) == 3 and second["personalized_recommendation"]
+
+
+def test_batch_streams_one_answer_per_user(stack):
+    response = post(stack, "/agentic-summary/batch", {"usernames": ["john_doe", "TechUser92", "john_doe"]})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["type"] == "meta" and lines[0]["users"] == 2
+    users = {line["username"]: line for line in lines if line.get("type") == "user"}
+    assert set(users) == {"john_doe", "TechUser92"}
+    for answer in users.values():
+        assert answer["mode"] == "batch" and len(answer["pros"]) == 3 and answer["personalized_recommendation"]
+    assert lines[-1]["type"] == "done"
+
+
+def test_review_stats_add_up(stack):
+    data = get(stack, "/review-stats?interval=day&top=3").json()
+    assert data["status"] == "success"
+    assert data["reviews"] == SEED_REVIEWS
+    assert sum(data["stars"].values()) == SEED_REVIEWS
+    assert sum(bucket["reviews"] for bucket in data["volume"]["buckets"]) == SEED_REVIEWS
+    assert sum(product["reviews"] for product in data["products"]) == SEED_REVIEWS
+    assert len(data["top_helpful"]) == 3
+    dates = _seed_dates(stack)
+    assert (data["first_review_date"], data["last_review_date"]) == (dates[0], dates[-1])
+
+    assert get(stack, "/review-stats?interval=century").status_code == 400
+
+
+def test_agentic_job_runs_to_completion(stack):
+    response = post(stack, "/agentic-summary/jobs", {"username": "john_doe", "priority": "high"})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "accepted" and job["priority"] == "high"
+    assert response.headers["Location"] == job["status_url"]
+
+    done = get(stack, f"{job['status_url']}?wait=20").json()
+    assert done["state"] == "succeeded"
+    assert len(done["result"]["pros"]) == 3 and done["result"]["personalized_recommendation"]
+
+    assert get(stack, "/jobs/missing").status_code == 404
+    assert post(stack, "/agentic-summary/jobs", {"priority": "urgent"}).status_code == 400
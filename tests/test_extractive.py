@@ -0,0 +1,73 @@
+from extractive import aspect_lexicon, build_recommendation, score_aspects, sentence_polarity, summarize_points, summarize_reviews
+
+
+def _hit(text, stars=4, helpful=0):
+    return {"_id": text[:8], "_source": {"review_text": text, "stars": stars, "helpful_votes": helpful}}
+
+
+HITS = [
+    _hit("The battery easily lasts two full days of use. The screen is bright and clear outdoors.", stars=5, helpful=40),
+    _hit("Battery life is great for a whole weekend away. Sadly the price is too expensive for students.", stars=4),
+    _hit("The strap broke after one month of light use. Setup was easy and intuitive for my parents.", stars=2),
+    _hit("Sleep tracking is accurate and helpful every single night. The price is pricey for what it offers.", stars=3),
+]
+
+
+def test_negation_flips_polarity():
+    assert sentence_polarity("the screen is great".split()) == 1
+    assert sentence_polarity("the screen is not great".split()) == -1
+
+
+def test_category_adds_aspects_to_the_generic_lexicon():
+    generic = aspect_lexicon()
+    watch = aspect_lexicon("smartwatch")
+    assert "health tracking" not in generic and "health tracking" in watch
+    assert "strap" in watch["design and comfort"] and "strap" not in generic["design and comfort"]
+    assert aspect_lexicon("unknown") == generic
+
+
+def test_pros_and_cons_come_from_review_sentences():
+    summary, report = summarize_reviews(HITS, None, "the X1", "smartwatch")
+    assert report["reviews"] == 4 and report["average_stars"] == 3.5
+    assert [point["aspect"] for point in report["pros"][:2]] == ["display", "battery life"]
+    assert summary["pros"][0] == "The screen is bright and clear outdoors."
+    assert "price and value" in [point["aspect"] for point in report["cons"]]
+    assert all(point.endswith(".") for point in summary["pros"] + summary["cons"])
+
+
+def test_generic_lexicon_ignores_category_aspects():
+    _, report = summarize_reviews(HITS, None)
+    assert "health tracking" not in [point["aspect"] for point in report["pros"]]
+
+
+def test_zero_stars_is_a_rating():
+    _, _, stats = score_aspects([_hit("Terrible.", stars=0), _hit("Fine.", stars=None)])
+    assert stats["average_stars"] == 1.5
+
+
+def test_recommendation_without_profile_is_neutral():
+    pros = [{"aspect": "battery life"}]
+    cons = [{"aspect": "price and value"}]
+    text = build_recommendation(None, pros, cons, 4.0, "the X1")
+    assert text == ("Reviewers give the X1 4.0/5 stars, praising battery life; the most common criticism "
+                    "is price and value. Weigh those against what you need from it and what you want to spend.")
+
+
+def test_recommendation_follows_profile_fields():
+    pros = [{"aspect": "display"}]
+    cons = [{"aspect": "price and value"}]
+    budget = build_recommendation(
+        {"budget_conscious": True, "credit_limit": 500, "preferences": {"feature_priorities": ["battery_life"]}},
+        pros, cons, 0.0)
+    assert "0.0/5 stars" in budget and "$500 credit limit" in budget and "lower-priced alternatives" in budget
+    assert budget.endswith("Your priorities (battery life) were weighed against what reviewers report.")
+
+    relaxed = build_recommendation({"preferences": {"price_sensitivity": "low"}}, pros, cons, 4.5)
+    assert "Price matters less to you, so price and value is the main thing to check" in relaxed
+
+
+def test_summarize_points_uses_merged_points():
+    summary = summarize_points({"pros": [{"point": "Bright display", "mentions": 3}], "cons": []}, None)
+    assert summary["pros"] == ["Bright display"]
+    assert summary["cons"] == ["Reviewers did not report a consistent problem"]
+    assert "mixed ratings" in summary["personalized_recommendation"]
@@ -0,0 +1,38 @@
+import json
+import uuid
+from datetime import date, datetime
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import fastjson
+from fastjson import FastJSONProvider
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    return app
+
+
+VALUE = {"when": datetime(2024, 1, 2, 3, 4, 5), "day": date(2024, 1, 2), "id": uuid.UUID(int=1),
+         "name": "Zoë", "items": [1, 2.5, None, True]}
+
+
+def test_provider_encodes_like_flask(app):
+    with app.app_context():
+        assert json.loads(app.json.dumps(VALUE)) == json.loads(DefaultJSONProvider(app).dumps(VALUE))
+        body = app.json.response(VALUE).get_data()
+    assert json.loads(body)["when"] == "Tue, 02 Jan 2024 03:04:05 GMT"
+
+
+def test_dumps_matches_the_json_module():
+    expected = json.loads(json.dumps(VALUE, default=str))
+    assert json.loads(fastjson.dumps(VALUE)) == expected
+    assert json.loads(fastjson.dumps(VALUE))["when"] == "2024-01-02 03:04:05"
+
+
+def test_loads_accepts_bytes_and_str():
+    assert fastjson.loads(b'{"a": [1, "\\u00e9"]}') == fastjson.loads('{"a": [1, "\\u00e9"]}') == {"a": [1, "é"]}
@@ -0,0 +1,93 @@
+import json
+from unittest import mock
+
+import pytest
+
+from hybrid import HybridSearcher, linear_fuse, retriever_unsupported, rrf_fuse
+
+
+def _hits(*pairs):
+    return [{"_id": doc_id, "_score": score, "_source": {"title": doc_id}} for doc_id, score in pairs]
+
+
+def test_rrf_rewards_documents_found_by_both_lists():
+    lexical = _hits(("a", 9.0), ("b", 5.0), ("c", 1.0))
+    semantic = _hits(("c", 0.9), ("b", 0.8), ("d", 0.1))
+    fused = rrf_fuse([lexical, semantic], size=3, rank_constant=60)
+    assert [hit["_id"] for hit in fused] == ["c", "b", "a"]
+    assert fused[0]["_score"] == pytest.approx(1 / 63 + 1 / 61)
+    assert fused[1]["_score"] == pytest.approx(1 / 62 + 1 / 62)
+    assert fused[2]["_score"] == pytest.approx(1 / 61)
+    assert fused[1]["_source"] == {"title": "b"}
+
+
+def test_rrf_ignores_raw_scores():
+    fused = rrf_fuse([_hits(("a", 0.001), ("b", 1000.0))], size=2)
+    assert [hit["_id"] for hit in fused] == ["a", "b"]
+
+
+def test_linear_normalizes_each_list_before_weighting():
+    lexical = _hits(("a", 20.0), ("b", 10.0), ("c", 0.0))
+    semantic = _hits(("c", 0.9), ("b", 0.5), ("a", 0.1))
+    fused = linear_fuse([lexical, semantic], [0.25, 0.75], size=3)
+    scores = {hit["_id"]: hit["_score"] for hit in fused}
+    assert scores["a"] == pytest.approx(0.25)
+    assert scores["b"] == pytest.approx(0.25 * 0.5 + 0.75 * 0.5)
+    assert scores["c"] == pytest.approx(0.75)
+    assert [hit["_id"] for hit in fused] == ["c", "b", "a"]
+
+
+def test_linear_handles_empty_and_flat_lists():
+    fused = linear_fuse([[], _hits(("a", 3.0), ("b", 3.0))], [0.5, 0.5], size=5)
+    assert {hit["_id"]: hit["_score"] for hit in fused} == {"a": 0.5, "b": 0.5}
+
+
+def _error(error_type, reason, **extra):
+    return json.dumps({"error": dict({"type": error_type, "reason": reason}, **extra), "status": 400})
+
+
+@pytest.mark.parametrize("status_code, body", [
+    (400, _error("x_content_parse_exception", "[1:12] unknown retriever [rrf]")),
+    (400, _error("parsing_exception", "Unknown key for a START_OBJECT in [retriever].")),
+    (400, _error("search_phase_execution_exception", "all shards failed",
+                 root_cause=[{"type": "illegal_argument_exception", "reason": "unknown field [retriever]"}])),
+    (403, _error("security_exception", "current license is non-compliant for [rrf]")),
+])
+def test_retriever_unsupported_errors(status_code, body):
+    assert retriever_unsupported(status_code, body)
+
+
+@pytest.mark.parametrize("status_code, body", [
+    (400, _error("parsing_exception", "[multi_match] unknown token [START_ARRAY]")),
+    (400, _error("x_content_parse_exception", "unknown field [rank_constant]")),
+    (403, _error("security_exception", "action [indices:data/read/search] is unauthorized")),
+    (500, _error("x_content_parse_exception", "unknown retriever [rrf]")),
+    (400, "not json"),
+])
+def test_other_errors_are_not_retriever_support(status_code, body):
+    assert not retriever_unsupported(status_code, body)
+
+
+class _MsearchOnly:
+    """ES stub whose cluster has no retriever API"""
+
+    def __init__(self, lexical, semantic):
+        self.responses = [{"took": 3, "hits": {"hits": lexical}}, {"took": 5, "hits": {"hits": semantic}}]
+
+    def search(self, index, body):
+        return mock.Mock(status_code=400, text=json.dumps({"error": {"type": "parsing_exception",
+                                                                       "reason": "unknown field [retriever]"}}))
+
+    def msearch(self, index, bodies):
+        return mock.Mock(status_code=200)
+
+    def parse_json(self, response):
+        return {"responses": self.responses}
+
+
+def test_in_process_fusion_reports_every_candidate():
+    es = _MsearchOnly(_hits(("a", 3.0), ("b", 2.0)), _hits(("b", 0.9), ("c", 0.8), ("d", 0.7)))
+    _, es_data, engine = HybridSearcher(es).search("battery", size=2)
+    assert engine == "in_process"
+    assert len(es_data["hits"]["hits"]) == 2
+    assert es_data["hits"]["total"]["value"] == 4
@@ -0,0 +1,56 @@
+import incremental
+from incremental import DateCheckpoint
+
+
+def _hit(doc_id, date, seq_no):
+    return {"_id": doc_id, "_source": {"date": date}, "sort": [date, seq_no]}
+
+
+def test_empty_checkpoint_matches_everything():
+    assert DateCheckpoint().query() == {"match_all": {}}
+
+
+def test_advance_tracks_ids_on_the_latest_date():
+    checkpoint = DateCheckpoint()
+    for hit in [_hit("a", "2024-01-01", 1), _hit("b", "2024-01-02", 2), _hit("c", "2024-01-02", 5)]:
+        checkpoint.advance(hit)
+    assert checkpoint.date == "2024-01-02"
+    assert checkpoint.ids == {"b", "c"}
+    assert checkpoint.seq_no == 5
+    assert checkpoint.query() == {"bool": {
+        "filter": [{"range": {"date": {"gte": "2024-01-02"}}}],
+        "must_not": [{"ids": {"values": ["b", "c"]}}]
+    }}
+
+
+def test_advance_ignores_hits_without_a_date_or_older_than_the_checkpoint():
+    checkpoint = DateCheckpoint("2024-01-02", ["b"], 3)
+    checkpoint.advance({"_id": "x", "_source": {}})
+    checkpoint.advance(_hit("y", "2024-01-01", 9))
+    assert checkpoint.to_dict() == {"date": "2024-01-02", "ids": ["b"], "seq_no": 3, "capped": False}
+
+
+def test_id_list_is_capped_with_seq_no_watermark(monkeypatch):
+    monkeypatch.setattr(incremental, "MAX_IDS", 3)
+    checkpoint = DateCheckpoint()
+    for seq_no in range(5):
+        checkpoint.advance(_hit(f"r{seq_no}", "2024-01-02", seq_no))
+    assert checkpoint.capped and checkpoint.ids == set() and checkpoint.seq_no == 4
+    query = checkpoint.query()
+    assert query["bool"]["minimum_should_match"] == 1
+    assert {"range": {"date": {"gt": "2024-01-02"}}} in query["bool"]["should"]
+    assert {"bool": {"filter": [
+        {"term": {"date": "2024-01-02"}},
+        {"range": {"_seq_no": {"gt": 4}}}
+    ]}} in query["bool"]["should"]
+
+    # A new date starts an exact id list again
+    checkpoint.advance(_hit("n", "2024-01-03", 1))
+    assert not checkpoint.capped and checkpoint.ids == {"n"}
+
+
+def test_round_trip_through_dict():
+    checkpoint = DateCheckpoint("2024-01-02", ["b", "a"], 7, capped=False)
+    restored = DateCheckpoint.from_dict(checkpoint.to_dict())
+    assert restored.to_dict() == {"date": "2024-01-02", "ids": ["a", "b"], "seq_no": 7, "capped": False}
+    assert DateCheckpoint.from_dict(None).query() == {"match_all": {}}
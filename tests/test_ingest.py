@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+import fake_services
+from es_client import ESClient
+from ingest import BulkIngester, FileCheckpoint, IngestError, iter_records
+
+
+@pytest.fixture
+def cluster():
+    """The fake Elasticsearch; set `fail_bulk_after` to refuse every later _bulk request"""
+    fake = fake_services.FakeElasticsearch()
+    fake.bulk_requests = 0
+    fake.fail_bulk_after = None
+    handle = fake.handle
+
+    def failing(method, path, query_string, raw_body):
+        if path.endswith("_bulk"):
+            fake.bulk_requests += 1
+            if fake.fail_bulk_after is not None and fake.bulk_requests > fake.fail_bulk_after:
+                return 400, {"error": {"type": "illegal_argument_exception", "reason": "injected"}, "status": 400}
+        return handle(method, path, query_string, raw_body)
+
+    fake.handle = failing
+    server = fake_services.serve(fake)
+    yield fake, ESClient(f"http://127.0.0.1:{server.server_port}", "test")
+    server.shutdown()
+
+
+def _write_reviews(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({"date": f"2025-02-{i + 1:02d}", "username": f"user{i}", "stars": 4,
+                                "title": f"Review {i}", "review_text": "battery lasts two days"}) + "\n")
+
+
+def _loaded(fake):
+    return {doc_id for doc_id, doc in fake.docs["review_index"].items() if doc["_source"]["title"].startswith("Review ")}
+
+
+def test_rerun_resumes_from_the_checkpoint(cluster, tmp_path):
+    fake, es = cluster
+    records = str(tmp_path / "reviews.jsonl")
+    _write_reviews(records, 7)
+    checkpoint = FileCheckpoint(str(tmp_path / "checkpoint.json"), records, "review_index")
+
+    fake.fail_bulk_after = 2
+    report = BulkIngester(es, batch_docs=2, workers=1, max_retries=0).run(iter_records(records), checkpoint)
+    assert "error" in report and report["offset"] == 4
+    assert checkpoint.load() == 4
+    first_run = _loaded(fake)
+    assert len(first_run) == 4
+
+    fake.fail_bulk_after = None
+    requests_before = fake.bulk_requests
+    report = BulkIngester(es, batch_docs=2, workers=1, max_retries=0).run(iter_records(records), checkpoint)
+    assert "error" not in report
+    assert report["resumed_from"] == 4 and report["offset"] == 7 and report["docs_indexed"] == 3
+    # Only the remaining records were sent
+    assert fake.bulk_requests - requests_before == 2
+    assert first_run < _loaded(fake) and len(_loaded(fake)) == 7
+
+
+def test_replayed_records_keep_their_ids(cluster, tmp_path):
+    fake, es = cluster
+    records = str(tmp_path / "reviews.jsonl")
+    _write_reviews(records, 3)
+    BulkIngester(es, batch_docs=2, workers=2).run(iter_records(records))
+    BulkIngester(es, batch_docs=2, workers=2).run(iter_records(records))
+    assert len(_loaded(fake)) == 3
+
+
+def test_checkpoint_of_another_load_is_refused(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    FileCheckpoint(path, "reviews.jsonl", "review_index").save(10, {})
+    assert FileCheckpoint(path, "reviews.jsonl", "review_index").load() == 10
+    with pytest.raises(IngestError):
+        FileCheckpoint(path, "profiles.jsonl", "user_profile").load()
+
+
+def test_invalid_records_are_skipped_and_reported(cluster, tmp_path):
+    fake, es = cluster
+    records = str(tmp_path / "reviews.jsonl")
+    _write_reviews(records, 2)
+    with open(records, "a", encoding="utf-8") as f:
+        f.write("not json\n")
+        f.write(json.dumps({"title": "Review x", "review_text": "no date or user"}) + "\n")
+        f.write(json.dumps({"date": "2025-03-01", "username": "u", "title": "Review y",
+                            "review_text": "t", "colour": "red"}) + "\n")
+    report = BulkIngester(es, batch_docs=10, workers=1).run(iter_records(records))
+    assert report["docs_indexed"] == 2 and report["docs_invalid"] == 3
+    assert [error["record"] for error in report["errors"]] == [2, 3, 4]
+    assert len(_loaded(fake)) == 2
@@ -0,0 +1,81 @@
+import pytest
+
+from job_queue import JobQueue, QueueFull
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), max_queued=3)
+
+
+def test_claims_by_priority_then_age(queue):
+    low = queue.enqueue("agentic_summary", {"username": "a"}, "low")
+    first = queue.enqueue("agentic_summary", {"username": "b"})
+    second = queue.enqueue("agentic_summary", {"username": "c"})
+    assert queue.position(low) == 2
+    claimed = [queue.claim()["id"] for _ in range(3)]
+    assert claimed == [first, second, low]
+    assert queue.claim() is None
+
+
+def test_high_priority_jumps_the_queue(queue):
+    normal = queue.enqueue("agentic_summary", {})
+    high = queue.enqueue("agentic_summary", {}, "high")
+    job = queue.claim()
+    assert job["id"] == high and job["status"] == "running" and job["attempts"] == 1
+    assert job["priority"] == "high"
+    assert queue.position(normal) == 0
+
+
+def test_rejects_past_max_queued(queue):
+    for _ in range(3):
+        queue.enqueue("agentic_summary", {})
+    with pytest.raises(QueueFull):
+        queue.enqueue("agentic_summary", {})
+
+
+def test_finish_stores_the_result(queue):
+    job_id = queue.enqueue("agentic_summary", {"username": "a"})
+    queue.claim()
+    queue.finish(job_id, "succeeded", result={"pros": ["x"]})
+    job = queue.wait(job_id, timeout=1)
+    assert job["status"] == "succeeded" and job["result"] == {"pros": ["x"]}
+    assert job["payload"] == {"username": "a"}
+
+
+def test_cancel_queued_job_never_runs(queue):
+    job_id = queue.enqueue("agentic_summary", {})
+    assert queue.cancel(job_id)["status"] == "cancelled"
+    assert queue.claim() is None
+    assert queue.cancel("missing") is None
+
+
+def test_cancel_running_job_discards_its_result(queue):
+    job_id = queue.enqueue("agentic_summary", {})
+    queue.claim()
+    job = queue.cancel(job_id)
+    assert job["status"] == "running" and job["cancel_requested"]
+    queue.finish(job_id, "succeeded", result={"pros": ["x"]})
+    job = queue.get(job_id)
+    assert job["status"] == "cancelled" and job["result"] is None
+
+
+def test_maintain_requeues_stale_jobs_then_gives_up(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), stale_seconds=-1, max_attempts=2)
+    job_id = queue.enqueue("agentic_summary", {})
+    queue.claim()
+    assert queue.maintain() == 1
+    assert queue.get(job_id)["status"] == "queued"
+
+    assert queue.claim()["attempts"] == 2
+    assert queue.maintain() == 0
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and "worker stopped" in job["error"]
+
+
+def test_maintain_leaves_heartbeating_jobs_alone(queue):
+    job_id = queue.enqueue("agentic_summary", {})
+    queue.claim()
+    queue.heartbeat([job_id])
+    assert queue.maintain() == 0
+    assert queue.stats()["counts"]["running"] == 1
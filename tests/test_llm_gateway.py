@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from llm_gateway import GatewayRejected, LLMGateway
+
+
+def _wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_admits_within_capacity():
+    gateway = LLMGateway(requests_per_minute=600, tokens_per_minute=60000, max_in_flight=2)
+    permit = gateway.acquire(100, timeout=1, flow=("/semantic-search", "alice"))
+    permit.release(40)
+    stats = gateway.stats()
+    assert stats["admitted"] == 1 and stats["in_flight"] == 0 and stats["used_tokens"] == 40
+
+
+def test_rejects_when_the_queue_is_full():
+    gateway = LLMGateway(max_in_flight=1, max_queue=1)
+    held = gateway.acquire(10, timeout=1, flow=("/a", "u1"))
+    waiter = threading.Thread(target=lambda: gateway.acquire(10, 5, ("/a", "u2")).release())
+    waiter.start()
+    _wait_until(lambda: gateway._queued == 1)
+    with pytest.raises(GatewayRejected) as rejected:
+        gateway.acquire(10, timeout=1, flow=("/a", "u3"))
+    assert rejected.value.reason == "queue_full"
+    held.release()
+    waiter.join()
+    assert gateway.stats()["admitted"] == 2
+
+
+def test_rejects_upfront_when_rate_cannot_be_met_in_time():
+    # One request per second, bucket of one: the second call needs ~1s
+    gateway = LLMGateway(requests_per_minute=60, burst_seconds=1)
+    gateway.acquire(10, timeout=1, flow=("/a", "u1")).release()
+    with pytest.raises(GatewayRejected) as rejected:
+        gateway.acquire(10, timeout=0.1, flow=("/a", "u1"))
+    assert rejected.value.reason == "over_capacity"
+    assert rejected.value.retry_after > 0.1
+
+
+def test_queue_timeout_when_capacity_is_held():
+    gateway = LLMGateway(max_in_flight=1)
+    held = gateway.acquire(10, timeout=1, flow=("/a", "u1"))
+    with pytest.raises(GatewayRejected) as rejected:
+        gateway.acquire(10, timeout=0.05, flow=("/a", "u2"))
+    assert rejected.value.reason == "queue_timeout"
+    held.release()
+    assert gateway.stats()["queue_depth"] == 0
+
+
+def test_round_robin_across_users():
+    gateway = LLMGateway(max_in_flight=1)
+    held = gateway.acquire(10, timeout=1, flow=("/agentic-summary", "holder"))
+    order = []
+    lock = threading.Lock()
+
+    def call(user):
+        permit = gateway.acquire(10, timeout=5, flow=("/agentic-summary", user))
+        with lock:
+            order.append(user)
+        permit.release()
+
+    threads = []
+    # A queues three calls before B queues one; B must not wait behind all of A's
+    for user in ["a", "a", "a", "b"]:
+        thread = threading.Thread(target=call, args=(user,))
+        thread.start()
+        threads.append(thread)
+        _wait_until(lambda: gateway._queued == len(threads))
+    held.release()
+    for thread in threads:
+        thread.join()
+    assert order == ["a", "b", "a", "a"]
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from mapreduce import MapFailed, MapReduceSummarizer, iter_chunks, merge_locally
+from resilience import Deadline, current_deadline, deadline_scope
+
+
+def _hits(count):
+    return [{"_id": f"r{i}", "_source": {"title": f"Review {i}", "review_text": "Fine watch", "stars": 4}}
+            for i in range(count)]
+
+
+def _map_answer(chunk_size):
+    return json.dumps({
+        "pros": [{"point": "Bright display", "mentions": chunk_size, "reviews": [1, 2, 99]},
+                 "Comfortable band"],
+        "cons": [{"point": "  ", "mentions": 5}, {"point": "Short battery", "mentions": 0, "reviews": [2]}]
+    })
+
+
+def test_iter_chunks():
+    assert list(iter_chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_parse_partial_maps_review_numbers_to_ids():
+    summarizer = MapReduceSummarizer(lambda messages, **options: "")
+    partial = summarizer._parse_partial(_map_answer(2), _hits(2))
+    assert partial["pros"] == [
+        {"point": "Bright display", "mentions": 2, "evidence": ["r0", "r1"]},
+        {"point": "Comfortable band", "mentions": 1, "evidence": []}
+    ]
+    # Blank points are dropped and mentions are at least 1
+    assert partial["cons"] == [{"point": "Short battery", "mentions": 1, "evidence": ["r1"]}]
+
+
+def test_merge_locally_sums_matching_points():
+    merged = merge_locally([
+        {"pros": [{"point": "Bright display", "mentions": 2, "evidence": ["a"]}], "cons": []},
+        {"pros": [{"point": "bright  DISPLAY", "mentions": 3, "evidence": ["a", "b"]},
+                  {"point": "Light", "mentions": 4, "evidence": []}], "cons": []}
+    ], keep_points=8)
+    assert merged["pros"] == [
+        {"point": "Bright display", "mentions": 5, "evidence": ["a", "b"]},
+        {"point": "Light", "mentions": 4, "evidence": []}
+    ]
+    assert merged["cons"] == []
+
+
+def test_reduce_sums_mentions_of_cited_sources():
+    def complete(messages, **options):
+        assert "P1: Bright display (2 mentions)" in messages[1]["content"]
+        return json.dumps({
+            "pros": [{"point": "Great screen", "sources": ["P1", "P2", "P9"]}, {"point": "Unsourced", "sources": []}],
+            "cons": [{"point": "Battery", "sources": ["C4"]}]
+        })
+
+    summarizer = MapReduceSummarizer(complete, fan_in=2)
+    group = [
+        {"pros": [{"point": "Bright display", "mentions": 2, "evidence": ["a"]}],
+         "cons": [{"point": "Pricey", "mentions": 1, "evidence": []}]},
+        {"pros": [{"point": "Vivid screen", "mentions": 3, "evidence": ["b"]}],
+         "cons": [{"point": "Battery drains", "mentions": 4, "evidence": ["c"]}]}
+    ]
+    merged, rounds = summarizer.reduce(group)
+    assert rounds == 1
+    assert merged["pros"] == [{"point": "Great screen", "mentions": 5, "evidence": ["a", "b"]}]
+    assert merged["cons"] == [{"point": "Battery", "mentions": 4, "evidence": ["c"]}]
+
+
+def test_reduce_falls_back_to_local_merge_on_bad_answer():
+    summarizer = MapReduceSummarizer(lambda messages, **options: "not json", fan_in=2)
+    partial = {"pros": [{"point": "Light", "mentions": 1, "evidence": []}], "cons": []}
+    merged, _ = summarizer.reduce([partial, partial])
+    assert merged["pros"] == [{"point": "Light", "mentions": 2, "evidence": []}]
+
+
+def test_summarize_runs_chunks_under_the_callers_deadline():
+    deadlines = []
+
+    def complete(messages, **options):
+        deadlines.append(current_deadline())
+        if messages[0]["content"].startswith("You are an expert product analyst. Read"):
+            return _map_answer(1)
+        return json.dumps({"pros": [{"point": "Bright display", "sources": ["P1", "P3", "P5"]}], "cons": []})
+
+    summarizer = MapReduceSummarizer(complete, chunk_size=2, max_concurrency=2, fan_in=4)
+    deadline = Deadline(30)
+    with deadline_scope(deadline):
+        merged, stats = summarizer.summarize(iter(_hits(5)))
+    assert stats["reviews"] == 5 and stats["chunks"] == 3 and stats["failed_chunks"] == 0
+    assert stats["reduce_rounds"] == 1
+    assert merged["pros"][0] == {"point": "Bright display", "mentions": 3, "evidence": ["r0", "r1", "r2", "r3", "r4"]}
+    assert deadlines and all(d is deadline for d in deadlines)
+
+
+def test_summarize_fails_when_every_chunk_fails():
+    def complete(messages, **options):
+        raise RuntimeError("openai down")
+
+    summarizer = MapReduceSummarizer(complete, chunk_size=2)
+    with pytest.raises(MapFailed):
+        summarizer.summarize(_hits(3))
+    # An empty corpus is not a failure
+    merged, stats = summarizer.summarize([])
+    assert merged == {"pros": [], "cons": []} and stats["chunks"] == 0
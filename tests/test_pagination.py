@@ -0,0 +1,120 @@
+import base64
+from types import SimpleNamespace
+
+import pytest
+
+from pagination import MAX_PAGE_SIZE, CursorError, decode_cursor, encode_cursor, page_size_from, paged_search
+
+
+def test_cursor_round_trip():
+    token = encode_cursor("pit-1", ["2024-01-02", 7], q="battery", total=42)
+    assert decode_cursor(token) == {"pit": "pit-1", "after": ["2024-01-02", 7], "q": "battery", "total": 42}
+
+
+@pytest.mark.parametrize("token", [
+    "not base64!",
+    "WzFd",  # a JSON list, not an object
+    base64.urlsafe_b64encode(b'{"after": [1]}').decode(),
+    base64.urlsafe_b64encode(b'{"pit": "p", "after": "x"}').decode(),
+    base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+])
+def test_decode_cursor_rejects_garbage(token):
+    with pytest.raises(CursorError):
+        decode_cursor(token)
+
+
+def test_cursor_is_tied_to_its_endpoint():
+    token = encode_cursor("pit-1", [1], endpoint="/search-reviews")
+    assert decode_cursor(token, "/search-reviews")["pit"] == "pit-1"
+    with pytest.raises(CursorError, match="different endpoint"):
+        decode_cursor(token, "/keyword-search")
+    with pytest.raises(CursorError, match="different endpoint"):
+        decode_cursor(encode_cursor("pit-1", [1]), "/search-reviews")
+
+
+def test_continued_listing_keeps_its_page_size():
+    cursor = {"pit": "pit-1", "after": [1], "page_size": 3}
+    assert page_size_from({}, 20, cursor) == 3
+    assert page_size_from({"page_size": 3}, 20, cursor) == 3
+    with pytest.raises(CursorError, match="page_size 3"):
+        page_size_from({"page_size": 5}, 20, cursor)
+
+
+def test_page_size_is_clamped():
+    assert page_size_from({}, 20) == 20
+    assert page_size_from({"page_size": "5"}, 20) == 5
+    assert page_size_from({"page_size": 0}, 20) == 1
+    assert page_size_from({"page_size": 10 ** 6}, 20) == MAX_PAGE_SIZE
+    assert page_size_from({"page_size": "many"}, 20) == 20
+
+
+class FakeES:
+    """Records PIT and search calls; answers searches with `pages` in turn"""
+
+    def __init__(self, pages, status_code=200, error=None):
+        self.pages = list(pages)
+        self.status_code = status_code
+        self.error = error
+        self.opened = []
+        self.closed = []
+        self.bodies = []
+
+    def open_pit(self, index, keep_alive):
+        pit_id = f"pit-{len(self.opened)}"
+        self.opened.append(pit_id)
+        return pit_id
+
+    def close_pit(self, pit_id):
+        self.closed.append(pit_id)
+
+    def search(self, index, body):
+        self.bodies.append(body)
+        if self.error:
+            raise self.error
+        return SimpleNamespace(status_code=self.status_code, page=self.pages.pop(0) if self.pages else None)
+
+    def parse_json(self, response):
+        return response.page
+
+
+def _page(ids, total):
+    return {"hits": {"total": {"value": total}, "hits": [{"_id": i, "sort": [i]} for i in ids]}}
+
+
+def test_paged_search_walks_pages_and_closes_pit():
+    es = FakeES([_page([1, 2], 3), _page([3], 0)])
+    sort = [{"date": "desc"}]
+
+    _, data, token = paged_search(es, "review_index", {"match_all": {}}, sort, 2, q="x")
+    assert [h["_id"] for h in data["hits"]["hits"]] == [1, 2]
+    assert es.bodies[0]["sort"] == sort + [{"_shard_doc": "asc"}]
+    assert "search_after" not in es.bodies[0]
+    cursor = decode_cursor(token)
+    assert cursor == {"pit": "pit-0", "after": [2], "q": "x", "total": 3, "page_size": 2}
+    assert es.closed == []
+
+    _, data, token = paged_search(es, "review_index", {"match_all": {}}, sort, 2, cursor)
+    assert es.bodies[1]["search_after"] == [2]
+    assert es.bodies[1]["track_total_hits"] is False
+    # The total comes from the cursor, not the (uncounted) second page
+    assert data["hits"]["total"]["value"] == 3
+    assert token is None
+    assert es.opened == ["pit-0"] and es.closed == ["pit-0"]
+
+
+def test_paged_search_closes_new_pit_on_failure():
+    es = FakeES([], status_code=503)
+    response, data, token = paged_search(es, "review_index", {"match_all": {}}, [], 10)
+    assert response.status_code == 503 and data is None and token is None
+    assert es.closed == ["pit-0"]
+
+    es = FakeES([], error=RuntimeError("boom"))
+    with pytest.raises(RuntimeError):
+        paged_search(es, "review_index", {"match_all": {}}, [], 10)
+    assert es.closed == ["pit-0"]
+
+
+def test_paged_search_keeps_client_pit_on_failure():
+    es = FakeES([], status_code=503)
+    paged_search(es, "review_index", {"match_all": {}}, [], 10, {"pit": "theirs", "after": [1]})
+    assert es.opened == [] and es.closed == []
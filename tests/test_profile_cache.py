@@ -0,0 +1,87 @@
+import pytest
+
+import fake_services
+from es_client import ESClient
+from profile_cache import ProfileCache
+
+
+class InlineExecutor:
+    """Runs background refreshes at once, so tests can check their outcome"""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+@pytest.fixture
+def cluster():
+    fake = fake_services.FakeElasticsearch()
+    requests_seen = []
+    handle = fake.handle
+
+    def recording(method, path, query_string, raw_body):
+        requests_seen.append((method, path, query_string))
+        return handle(method, path, query_string, raw_body)
+
+    fake.handle = recording
+    server = fake_services.serve(fake)
+    yield fake, ESClient(f"http://127.0.0.1:{server.server_port}", "test"), requests_seen
+    server.shutdown()
+
+
+def test_fresh_profiles_are_served_from_memory(cluster):
+    _, es, seen = cluster
+    cache = ProfileCache(es, ttl_seconds=60)
+    first = cache.get("TechUser92")
+    assert first and cache.get("TechUser92") == first
+    assert len(seen) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_unknown_users_are_cached_as_misses(cluster):
+    _, es, seen = cluster
+    cache = ProfileCache(es, negative_ttl_seconds=60)
+    assert cache.get("nobody") is None and cache.get("nobody") is None
+    assert len(seen) == 1
+    assert cache.stats()["negative_hits"] == 1 and cache.stats()["negative_entries"] == 1
+
+
+def test_stale_entry_is_revalidated_without_downloading_it_again(cluster):
+    _, es, seen = cluster
+    cache = ProfileCache(es, ttl_seconds=0, stale_seconds=60, executor=InlineExecutor())
+    profile = cache.get("TechUser92")
+    seen.clear()
+    assert cache.get("TechUser92") == profile
+    # Only the version lookup went out
+    assert len(seen) == 1 and "_source=false" in seen[0][2]
+    assert cache.stats()["stale_hits"] == 1 and cache.stats()["revalidated_unchanged"] == 1
+
+
+def test_changed_profile_is_fetched_on_revalidation(cluster):
+    fake, es, _ = cluster
+    cache = ProfileCache(es, ttl_seconds=0, stale_seconds=60, executor=InlineExecutor())
+    old = cache.get("TechUser92")
+    fake._store("user_profile", "TechUser92", dict(old, price_sensitivity="very_high"))
+    # The stale copy answers this request; the refresh it triggers stores the new version
+    assert cache.get("TechUser92") == old
+    assert cache.stats()["revalidated_changed"] == 1
+    assert cache.get("TechUser92")["price_sensitivity"] == "very_high"
+
+
+def test_invalidate_forces_a_fetch(cluster):
+    _, es, seen = cluster
+    cache = ProfileCache(es, ttl_seconds=60)
+    cache.get("TechUser92")
+    cache.invalidate("TechUser92")
+    cache.get("TechUser92")
+    assert len(seen) == 2 and cache.stats()["invalidations"] == 1
+
+
+def test_get_many_loads_misses_with_one_mget(cluster):
+    _, es, seen = cluster
+    cache = ProfileCache(es, ttl_seconds=60)
+    cache.get("TechUser92")
+    seen.clear()
+    profiles = cache.get_many(["TechUser92", "Student2025", "nobody", "Student2025"])
+    assert set(profiles) == {"TechUser92", "Student2025", "nobody"}
+    assert profiles["nobody"] is None and profiles["Student2025"]
+    assert [path for _, path, _ in seen] == ["/user_profile/_mget"]
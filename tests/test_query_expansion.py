@@ -0,0 +1,86 @@
+import pytest
+
+import fake_services
+from es_client import ESClient
+from query_expansion import ElserExpander
+from result_cache import ResultCache, build_backend
+from singleflight import SingleFlight
+
+
+@pytest.fixture
+def cluster():
+    """The fake Elasticsearch; set `inference_down` to fail every _inference call"""
+    fake = fake_services.FakeElasticsearch()
+    fake.inferences = 0
+    fake.inference_down = False
+    handle = fake.handle
+
+    def counting(method, path, query_string, raw_body):
+        if path.startswith("/_inference"):
+            fake.inferences += 1
+            if fake.inference_down:
+                return 503, {"error": {"type": "status_exception", "reason": "injected"}, "status": 503}
+        return handle(method, path, query_string, raw_body)
+
+    fake.handle = counting
+    server = fake_services.serve(fake)
+    yield fake, ESClient(f"http://127.0.0.1:{server.server_port}", "test")
+    server.shutdown()
+
+
+def _expander(es, backend=None):
+    if backend is None:
+        backend = build_backend("memory", max_entries=10)
+    cache = ResultCache(backend, ttl_seconds=60, name="elser_expansion")
+    return ElserExpander(es, cache, SingleFlight("elser_expansion"))
+
+
+def test_each_normalized_query_is_expanded_once(cluster):
+    fake, es = cluster
+    expander = _expander(es)
+    query, report = expander.query("Battery Life")
+    assert report["expansion"] == "inference" and report["tokens"] > 0
+    assert query["sparse_vector"]["field"] == "review_text.semantic"
+    again, report = expander.query("  battery   life ")
+    assert report["expansion"] == "cache" and again == query
+    assert fake.inferences == 1
+    stats = expander.stats()
+    assert stats["inferences"] == 1 and stats["cache_hits"] == 1 and stats["cache"]["hits"] == 1
+
+
+def test_sqlite_cache_is_shared_between_processes(cluster, tmp_path):
+    fake, es = cluster
+    path = str(tmp_path / "cache.sqlite3")
+    first = _expander(es, build_backend("sqlite", path=path, table="elser_expansion"))
+    second = _expander(es, build_backend("sqlite", path=path, table="elser_expansion"))
+    assert first.query("battery life")[1]["expansion"] == "inference"
+    assert second.query("battery life")[1]["expansion"] == "cache"
+    assert fake.inferences == 1
+
+
+def test_failed_inference_falls_back_to_semantic_and_is_not_cached(cluster):
+    fake, es = cluster
+    expander = _expander(es)
+    fake.inference_down = True
+    query, report = expander.query("battery life")
+    assert report == {"expansion": "semantic"}
+    assert query == {"semantic": {"field": "review_text.semantic", "query": "battery life"}}
+    assert expander.stats()["errors"] == 1 and expander.last_error
+
+    fake.inference_down = False
+    assert expander.query("battery life")[1]["expansion"] == "inference"
+
+
+def test_disable_goes_back_to_semantic_queries(cluster):
+    fake, es = cluster
+    expander = _expander(es)
+    expander.disable("sparse_vector not supported on semantic_text")
+    assert expander.query("battery life")[1] == {"expansion": "semantic"}
+    assert fake.inferences == 0
+    assert expander.stats()["sparse_vector_supported"] is False
+
+
+def test_text_without_words_uses_semantic(cluster):
+    fake, es = cluster
+    assert _expander(es).query("  ")[1] == {"expansion": "semantic"}
+    assert fake.inferences == 0
@@ -0,0 +1,137 @@
+import time
+from unittest import mock
+
+import pytest
+import requests
+
+from es_client import ESClient
+from resilience import CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded, deadline_scope, deadline_timeout
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _fail():
+    raise RuntimeError("upstream down")
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("es", failure_threshold=2, reset_seconds=60)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            breaker.call(_fail)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "not called")
+    stats = breaker.stats()
+    assert stats["opened"] == 1 and stats["rejected"] == 1 and stats["failures"] == 2
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker("es", failure_threshold=2, reset_seconds=60)
+    with pytest.raises(RuntimeError):
+        breaker.call(_fail)
+    assert breaker.call(lambda: "ok") == "ok"
+    with pytest.raises(RuntimeError):
+        breaker.call(_fail)
+    assert breaker.state == "closed"
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = CircuitBreaker("es", failure_threshold=1, reset_seconds=0.05)
+    with pytest.raises(RuntimeError):
+        breaker.call(_fail)
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+
+    breaker.before_call()
+    # A second caller is turned away while the trial is in flight
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker("es", failure_threshold=1, reset_seconds=0.05)
+    with pytest.raises(RuntimeError):
+        breaker.call(_fail)
+    time.sleep(0.06)
+    with pytest.raises(RuntimeError):
+        breaker.call(_fail)
+    assert breaker.state == "open"
+    assert breaker.stats()["opened"] == 2
+
+
+def test_ignored_exceptions_do_not_count():
+    breaker = CircuitBreaker("es", failure_threshold=1, reset_seconds=60, ignored=(BadRequest,))
+
+    def bad_request():
+        raise BadRequest()
+
+    with pytest.raises(BadRequest):
+        breaker.call(bad_request)
+    assert breaker.state == "closed"
+
+
+def test_es_client_records_unexpected_transport_errors():
+    breaker = CircuitBreaker("es", failure_threshold=1, reset_seconds=0.05)
+    client = ESClient("http://es.invalid", "key", retries=2, breaker=breaker)
+    with mock.patch.object(client.session, "request", side_effect=requests.exceptions.ChunkedEncodingError()) as send:
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            client.request("GET", "review_index/_search")
+    # Not retried, but counted, so a half-open trial that fails this way reopens the breaker
+    assert send.call_count == 1
+    assert breaker.state == "open"
+
+
+def test_deadline_timeout_caps_by_remaining_time():
+    assert deadline_timeout(10, "test") == 10
+    with deadline_scope(Deadline(0.5)):
+        assert deadline_timeout(10, "test") <= 0.5
+        assert deadline_timeout(0.1, "test") == 0.1
+        assert 0 < deadline_timeout(None, "test") <= 0.5
+    with deadline_scope(Deadline(0.0)):
+        with pytest.raises(DeadlineExceeded):
+            deadline_timeout(10, "test")
+
+
+def _slow_response(delay, status=200):
+    def send(*args, **kwargs):
+        time.sleep(delay)
+        response = requests.Response()
+        response.status_code = status
+        return response
+    return send
+
+
+def test_hedge_asks_the_breaker_for_its_second_call():
+    breaker = CircuitBreaker("es", failure_threshold=5, reset_seconds=60)
+    client = ESClient("http://es.invalid", "key", breaker=breaker, hedge_after=0.01)
+    with mock.patch.object(client.session, "request", side_effect=_slow_response(0.05)) as send:
+        assert client.request("GET", "review_index/_search").status_code == 200
+        time.sleep(0.1)
+    assert send.call_count == 2
+    stats = breaker.stats()
+    assert stats["calls"] == 2 and stats["successes"] == 2
+
+
+def test_no_hedge_during_a_half_open_trial():
+    breaker = CircuitBreaker("es", failure_threshold=1, reset_seconds=0.05)
+    with pytest.raises(RuntimeError):
+        breaker.call(_fail)
+    time.sleep(0.06)
+    client = ESClient("http://es.invalid", "key", breaker=breaker, hedge_after=0.01)
+    with mock.patch.object(client.session, "request", side_effect=_slow_response(0.05)) as send:
+        assert client.request("GET", "review_index/_search").status_code == 200
+    assert send.call_count == 1
+    assert breaker.state == "closed"
+
+
+def test_open_pit_is_never_retried_or_hedged():
+    client = ESClient("http://es.invalid", "key", retries=2, hedge_after=0.01)
+    with mock.patch.object(client.session, "request", side_effect=_slow_response(0.05, status=503)) as send:
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.open_pit("review_index")
+    assert send.call_count == 1
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from result_cache import MemoryBackend, ResultCache, SQLiteBackend, build_backend, make_key, normalize_query
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend(max_entries=2)
+    # touch_interval=0 keeps LRU order exact for the eviction test
+    return SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries=2, touch_interval=0)
+
+
+def test_evicts_least_recently_used(backend):
+    far = time.time() + 60
+    backend.set("a", far, {"v": 1})
+    time.sleep(0.01)
+    backend.set("b", far, {"v": 2})
+    time.sleep(0.01)
+    assert backend.get("a") == (far, {"v": 1})
+    time.sleep(0.01)
+    assert backend.set("c", far, {"v": 3}) == 1
+    assert backend.get("b") is None
+    assert backend.get("a") is not None and backend.get("c") is not None
+    assert len(backend) == 2
+
+
+def test_ttl_expiry_counts_a_miss(backend):
+    cache = ResultCache(backend, ttl_seconds=60, name="test")
+    cache.set("fresh", {"answer": 1})
+    cache.set("stale", {"answer": 2}, ttl_seconds=0.05)
+    time.sleep(0.1)
+    assert cache.get("fresh") == {"answer": 1}
+    assert cache.get("stale") is None
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expired"]) == (1, 2, 1)
+    assert stats["hit_rate"] == pytest.approx(1 / 3, abs=1e-4)
+    assert stats["entries"] == 1
+
+
+def test_sqlite_only_writes_recency_when_stale(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), touch_interval=3600)
+    backend.set("a", time.time() + 60, "x")
+    before = backend._conn.total_changes
+    assert backend.get("a")[1] == "x"
+    assert backend._conn.total_changes == before
+
+    backend.touch_interval = 0
+    backend.get("a")
+    assert backend._conn.total_changes == before + 1
+
+
+def test_sqlite_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    SQLiteBackend(path).set("k", time.time() + 60, [1, 2])
+    assert SQLiteBackend(path).get("k")[1] == [1, 2]
+
+
+def test_keys():
+    assert normalize_query("  Battery LIFE?? ") == "battery life"
+    assert make_key("agentic", "alice", {"b": 1, "a": 2}) == make_key("agentic", "alice", {"a": 2, "b": 1})
+    assert make_key("agentic", "alice") != make_key("agentic", "bob")
+    with pytest.raises(ValueError):
+        build_backend("redis")
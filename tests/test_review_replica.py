@@ -0,0 +1,63 @@
+import pytest
+
+import fake_services
+from es_client import ESClient
+from review_replica import ReviewReplica, bounded_edit_distance
+
+
+@pytest.fixture
+def cluster():
+    """The fake Elasticsearch with two undated reviews and one timestamped review added"""
+    fake = fake_services.FakeElasticsearch()
+    fake._store("review_index", "undated_1", {"title": "No date", "review_text": "battery is fine"})
+    fake._store("review_index", "undated_2", {"title": "Also undated", "review_text": "display"})
+    fake._store("review_index", "timed", {"title": "Same day", "review_text": "battery life",
+                                          "date": "2025-01-15T10:00:00"})
+    server = fake_services.serve(fake)
+    es = ESClient(f"http://127.0.0.1:{server.server_port}", "test")
+    replica = ReviewReplica(es)
+    replica.sync()
+    yield fake, replica
+    server.shutdown()
+
+
+def _es_ids(fake, body):
+    status, data = fake.search("review_index", body)
+    assert status == 200
+    return [hit["_id"] for hit in data["hits"]["hits"]]
+
+
+def test_browse_matches_elasticsearch_date_order(cluster):
+    fake, replica = cluster
+    size = len(fake.docs["review_index"])
+    expected = _es_ids(fake, {"query": {"match_all": {}}, "size": size, "sort": [{"date": {"order": "desc"}}]})
+    browsed = [hit["_id"] for hit in replica.browse(size)["hits"]["hits"]]
+    assert browsed[:-2] == expected[:-2]
+    assert browsed[:2] == ["timed", "review_001"]
+    # Missing dates sort last, as in Elasticsearch
+    assert set(browsed[-2:]) == set(expected[-2:]) == {"undated_1", "undated_2"}
+
+
+def test_keyword_search_finds_what_elasticsearch_finds(cluster):
+    fake, replica = cluster
+    query = {"multi_match": {"query": "battery", "fields": ["title^2", "review_text"]}}
+    expected = _es_ids(fake, {"query": query, "size": 50})
+    found = replica.keyword_search("battery", size=50)
+    assert {hit["_id"] for hit in found["hits"]["hits"]} == set(expected)
+    assert found["hits"]["total"]["value"] == len(expected)
+
+
+def test_keyword_search_is_fuzzy_like_auto(cluster):
+    _, replica = cluster
+    exact = {hit["_id"] for hit in replica.keyword_search("battery", size=50)["hits"]["hits"]}
+    # One edit away: within AUTO fuzziness for a 7-letter term
+    typo = {hit["_id"] for hit in replica.keyword_search("batery", size=50)["hits"]["hits"]}
+    assert typo == exact
+    # Short terms (1-2 characters) must match exactly
+    assert replica.keyword_search("zz", size=50)["hits"]["hits"] == []
+
+
+def test_bounded_edit_distance():
+    assert bounded_edit_distance("battery", "batery", 2) == 1
+    assert bounded_edit_distance("battery", "bakery", 2) == 2
+    assert bounded_edit_distance("battery", "display", 2) > 2
@@ -0,0 +1,127 @@
+import threading
+
+import pytest
+
+from resilience import Deadline, DeadlineExceeded, deadline_scope
+from singleflight import SingleFlight, SingleFlightError
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow(value):
+        calls.append(value)
+        started.set()
+        release.wait(2)
+        return value * 2
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", slow, 21)))
+    leader.start()
+    started.wait(2)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", slow, 21))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flight.stats()["coalesced"] < 3:
+        pass
+    release.set()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert results == [42] * 4
+    assert calls == [21]
+    stats = flight.stats()
+    assert stats["executions"] == 1 and stats["coalesce_rate"] == 0.75 and stats["in_flight"] == 0
+
+
+def test_errors_are_shared_and_not_kept():
+    flight = SingleFlight("test")
+
+    def fail():
+        raise ValueError("nope")
+
+    with pytest.raises(ValueError):
+        flight.do("k", fail)
+    assert flight.do("k", lambda: "retried") == "retried"
+    assert flight.stats()["errors"] == 1
+
+
+def test_follower_gives_up_at_its_deadline():
+    flight = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    leader = threading.Thread(target=flight.do, args=("k", lambda: started.set() or release.wait(5)))
+    leader.start()
+    started.wait(2)
+    try:
+        with deadline_scope(Deadline(0.2)):
+            with pytest.raises(DeadlineExceeded):
+                flight.do("k", lambda: "not run")
+    finally:
+        release.set()
+        leader.join()
+    assert flight.stats()["wait_timeouts"] == 1
+
+
+def _run_with_followers(flight, fn, followers=2):
+    """Run fn as leader with `followers` callers joined; return what each follower raised"""
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def leader_fn():
+        started.set()
+        release.wait(2)
+        return fn()
+
+    def follow():
+        try:
+            flight.do("k", lambda: "not run")
+        except BaseException as e:
+            errors.append(e)
+
+    def lead():
+        try:
+            flight.do("k", leader_fn)
+        except BaseException:
+            pass
+
+    leader = threading.Thread(target=lead)
+    leader.start()
+    started.wait(2)
+    threads = [threading.Thread(target=follow) for _ in range(followers)]
+    for thread in threads:
+        thread.start()
+    while flight.stats()["coalesced"] < followers:
+        pass
+    release.set()
+    for thread in [leader] + threads:
+        thread.join()
+    return errors
+
+
+def test_followers_get_their_own_copy_of_the_error():
+    flight = SingleFlight("test")
+
+    def fail():
+        raise DeadlineExceeded("es:search")
+
+    errors = _run_with_followers(flight, fail)
+    assert len(errors) == 2 and errors[0] is not errors[1]
+    for error in errors:
+        assert isinstance(error, DeadlineExceeded) and error.stage == "es:search"
+        assert isinstance(error.__cause__, DeadlineExceeded)
+
+
+def test_leader_interrupt_fails_followers_instead_of_returning_none():
+    flight = SingleFlight("test")
+
+    def interrupted():
+        raise KeyboardInterrupt()
+
+    errors = _run_with_followers(flight, interrupted)
+    assert [type(error) for error in errors] == [SingleFlightError, SingleFlightError]
+    assert flight.stats()["errors"] == 1
@@ -0,0 +1,40 @@
+import json
+
+from streaming import JsonFieldStreamer
+
+
+ANSWER = {
+    "pros": ["Long \"battery\" life", "Light, compact"],
+    "cons": ["Pricey\nfor what it is"],
+    "personalized_recommendation": "Buy it — if you travel"
+}
+
+
+def _feed(text, chunk_size):
+    streamer = JsonFieldStreamer()
+    fields = []
+    for start in range(0, len(text), chunk_size):
+        fields.extend(streamer.feed(text[start:start + chunk_size]))
+    return streamer, fields
+
+
+def test_reports_fields_in_order_regardless_of_chunking():
+    text = json.dumps(ANSWER)
+    expected = [("pros", "Long \"battery\" life"), ("pros", "Light, compact"),
+                ("cons", "Pricey\nfor what it is"), ("personalized_recommendation", "Buy it — if you travel")]
+    for chunk_size in (1, 2, 3, 7, len(text)):
+        streamer, fields = _feed(text, chunk_size)
+        assert fields == expected
+        assert json.loads(streamer.text) == ANSWER
+
+
+def test_values_complete_only_on_their_closing_quote():
+    streamer = JsonFieldStreamer()
+    assert streamer.feed('{"pros": ["Goo') == []
+    assert streamer.feed('d"') == [("pros", "Good")]
+    assert streamer.feed('], "summary": "ok"}') == [("summary", "ok")]
+
+
+def test_ignores_non_string_values():
+    _, fields = _feed(json.dumps({"count": 3, "flags": [True, 1], "title": "x"}), 4)
+    assert fields == [("title", "x")]